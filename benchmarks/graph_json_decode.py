@@ -0,0 +1,95 @@
+"""Compare decode paths for owned-application pages.
+
+For each fixture size the same payload (full application objects, as
+returned without ``$select``) is decoded by:
+
+* ``json``      - ``json.loads`` of the whole body, then projection
+* ``orjson``    - ``orjson.loads`` of the whole body, then projection
+* ``streaming`` - ``PageDecoder`` fed in 16 KiB chunks, projecting while parsing
+
+and the mean time and peak traced memory are reported.
+
+Usage::
+
+    python benchmarks/graph_json_decode.py [--sizes 100 1000 10000] [--rounds 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "function_app"))
+
+from graph_payloads import make_application
+
+from core import json_codec
+from models.spn import SPN_GRAPH_FIELDS
+
+CHUNK_SIZE = 16 * 1024
+
+
+def project(page: dict) -> list[dict]:
+    return [{k: item[k] for k in SPN_GRAPH_FIELDS if k in item} for item in page["value"]]
+
+
+def decode_json(payload: bytes) -> list[dict]:
+    return project(json.loads(payload))
+
+
+def decode_orjson(payload: bytes) -> list[dict]:
+    return project(json_codec.orjson.loads(payload))
+
+
+def decode_streaming(payload: bytes) -> list[dict]:
+    decoder = json_codec.PageDecoder(SPN_GRAPH_FIELDS)
+    for i in range(0, len(payload), CHUNK_SIZE):
+        decoder.feed(payload[i : i + CHUNK_SIZE])
+    decoder.close()
+    return decoder.items
+
+
+def measure(decode: Callable[[bytes], list[dict]], payload: bytes, rounds: int) -> tuple[float, float]:
+    """Return ``(mean ms, peak MiB)`` for decoding *payload*."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        decode(payload)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    tracemalloc.start()
+    decode(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="items per fixture")
+    parser.add_argument("--rounds", type=int, default=5, help="timed repetitions per decoder (default: 5)")
+    args = parser.parse_args()
+
+    decoders: dict[str, Callable[[bytes], list[dict]]] = {"json": decode_json}
+    if json_codec.orjson is not None:
+        decoders["orjson"] = decode_orjson
+    if json_codec.STREAMING_AVAILABLE:
+        decoders["streaming"] = decode_streaming
+    missing = {"orjson", "streaming"} - decoders.keys()
+    if missing:
+        print(f"skipping (package not installed): {', '.join(sorted(missing))}")
+
+    print(f"{'items':>7}{'MiB in':>9}  {'decoder':<10}{'mean ms':>10}{'peak MiB':>10}")
+    for size in args.sizes:
+        payload = json.dumps({"value": [make_application(i) for i in range(size)]}).encode()
+        expected = decode_json(payload)
+        for name, decode in decoders.items():
+            assert decode(payload) == expected, name
+            elapsed_ms, peak = measure(decode, payload, args.rounds)
+            print(f"{size:>7}{len(payload) / 2**20:>9.1f}  {name:<10}{elapsed_ms:>10.1f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Compare Graph payload size and parse time with and without $select projections.
+
+Builds realistic application objects (certificates, API permissions, exposed
+scopes, app roles, redirect URIs) and measures a page of them as Graph would
+return it in full versus projected to ``SPN_GRAPH_FIELDS``.
+
+Usage::
+
+    python benchmarks/graph_payloads.py [--apps 100] [--rounds 200]
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "function_app"))
+
+from models.spn import SPN_GRAPH_FIELDS
+
+
+def _guid() -> str:
+    return str(uuid.uuid4())
+
+
+def make_application(index: int) -> dict:
+    """Return an application object shaped like a full ``GET /applications/{id}`` response."""
+    cert = base64.b64encode(os.urandom(1200)).decode()
+    return {
+        "id": _guid(),
+        "appId": _guid(),
+        "displayName": f"svc-payments-worker-{index:04d}",
+        "description": "Background worker for the payments platform",
+        "createdDateTime": "2025-03-14T09:26:53Z",
+        "deletedDateTime": None,
+        "publisherDomain": "contoso.onmicrosoft.com",
+        "signInAudience": "AzureADMyOrg",
+        "identifierUris": [f"api://{_guid()}"],
+        "tags": ["team:payments", "env:prod"],
+        "passwordCredentials": [
+            {
+                "keyId": _guid(),
+                "displayName": f"ci-secret-{i}",
+                "startDateTime": "2025-03-14T09:26:53Z",
+                "endDateTime": "2026-03-14T09:26:53Z",
+                "hint": "abc",
+                "secretText": None,
+                "customKeyIdentifier": None,
+            }
+            for i in range(2)
+        ],
+        "keyCredentials": [
+            {
+                "keyId": _guid(),
+                "type": "AsymmetricX509Cert",
+                "usage": "Verify",
+                "displayName": f"CN=worker-{index}",
+                "customKeyIdentifier": base64.b64encode(os.urandom(20)).decode(),
+                "startDateTime": "2025-03-14T09:26:53Z",
+                "endDateTime": "2027-03-14T09:26:53Z",
+                "key": cert,
+            }
+            for _ in range(2)
+        ],
+        "requiredResourceAccess": [
+            {
+                "resourceAppId": "00000003-0000-0000-c000-000000000000",
+                "resourceAccess": [{"id": _guid(), "type": "Scope"} for _ in range(12)],
+            },
+            {
+                "resourceAppId": _guid(),
+                "resourceAccess": [{"id": _guid(), "type": "Role"} for _ in range(4)],
+            },
+        ],
+        "api": {
+            "requestedAccessTokenVersion": 2,
+            "oauth2PermissionScopes": [
+                {
+                    "id": _guid(),
+                    "value": f"scope.{i}",
+                    "adminConsentDisplayName": f"Access scope {i}",
+                    "adminConsentDescription": "Allows the app to access the payments API on behalf of the user.",
+                    "userConsentDisplayName": f"Access scope {i}",
+                    "userConsentDescription": "Allows the app to access the payments API on your behalf.",
+                    "isEnabled": True,
+                    "type": "User",
+                }
+                for i in range(4)
+            ],
+            "preAuthorizedApplications": [],
+            "knownClientApplications": [],
+        },
+        "appRoles": [
+            {
+                "id": _guid(),
+                "value": f"Role.{i}",
+                "displayName": f"Role {i}",
+                "description": "Grants the role to daemon callers.",
+                "allowedMemberTypes": ["Application"],
+                "isEnabled": True,
+            }
+            for i in range(3)
+        ],
+        "web": {
+            "homePageUrl": None,
+            "logoutUrl": None,
+            "redirectUris": [f"https://worker-{index}.contoso.com/auth/callback/{i}" for i in range(5)],
+            "implicitGrantSettings": {"enableAccessTokenIssuance": False, "enableIdTokenIssuance": False},
+        },
+        "spa": {"redirectUris": []},
+        "publicClient": {"redirectUris": []},
+        "info": {"logoUrl": None, "marketingUrl": None, "privacyStatementUrl": None},
+        "optionalClaims": {"idToken": [], "accessToken": [{"name": "groups", "essential": False}], "saml2Token": []},
+        "parentalControlSettings": {"countriesBlockedForMinors": [], "legalAgeGroupRule": "Allow"},
+    }
+
+
+def measure(payload: bytes, rounds: int) -> float:
+    """Return the mean ``json.loads`` time in milliseconds."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        json.loads(payload)
+    return (time.perf_counter() - started) * 1000 / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", type=int, default=100, help="applications per page (default: 100)")
+    parser.add_argument("--rounds", type=int, default=200, help="parse repetitions (default: 200)")
+    args = parser.parse_args()
+
+    apps = [make_application(i) for i in range(args.apps)]
+    full = json.dumps({"value": apps}).encode()
+    projected = json.dumps({"value": [{k: a[k] for k in SPN_GRAPH_FIELDS if k in a} for a in apps]}).encode()
+
+    full_ms = measure(full, args.rounds)
+    projected_ms = measure(projected, args.rounds)
+
+    print(f"page of {args.apps} applications, {args.rounds} rounds")
+    print(f"{'':12}{'bytes':>12}{'parse ms':>12}")
+    print(f"{'full':12}{len(full):>12,}{full_ms:>12.3f}")
+    print(f"{'$select':12}{len(projected):>12,}{projected_ms:>12.3f}")
+    print(f"{'saved':12}{1 - len(projected) / len(full):>12.1%}{1 - projected_ms / full_ms:>12.1%}")
+
+
+if __name__ == "__main__":
+    main()
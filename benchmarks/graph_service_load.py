@@ -0,0 +1,87 @@
+"""Drive GraphService against the local Graph emulator and report latency and request counts.
+
+Simulates portal users concurrently listing their SPNs and opening one of
+them, with emulated Graph latency and optional throttling, and prints
+client-side latency percentiles next to the upstream request counts seen
+by the emulator and GraphService's own cache / rate-limiter counters.
+
+Usage::
+
+    python benchmarks/graph_service_load.py [--users 50] [--applications 5000] [--concurrency 20]
+        [--latency-ms 40] [--latency-sigma 0.5] [--throttle-rate 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from unittest.mock import AsyncMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "function_app"))
+
+from services.graph_service import GraphService
+from tests.graph_emulator import GraphEmulator, Latency
+
+
+async def run(args: argparse.Namespace) -> None:
+    emulator = GraphEmulator(
+        seed=args.seed,
+        latency=Latency(args.latency_ms, args.latency_sigma),
+        throttle_rate=args.throttle_rate,
+        retry_after_seconds=args.retry_after,
+    )
+    emulator.tenant.seed(
+        users=args.users,
+        applications=args.applications,
+        owners_per_application=args.owners_per_application,
+        rng=emulator.rng,
+    )
+    graph = GraphService()
+    graph.get_access_token = AsyncMock(return_value="emulator")  # type: ignore[method-assign]
+    graph._http_client = emulator.client()
+
+    users = list(emulator.tenant.users)
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def session(user: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            apps = await graph.list_owned_applications(user)
+            if apps:
+                await graph.get_application_with_owners(apps[0]["id"])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(users[i % len(users)]) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(f"sessions={len(latencies)} wall={elapsed:.2f}s")
+    print(f"session ms: p50={statistics.median(latencies) * 1000:.1f} p95={p95 * 1000:.1f}")
+    print("emulator:", json.dumps(emulator.stats(), indent=2))
+    print("graph_service:", json.dumps(graph.stats(), indent=2))
+    await graph.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--owners-per-application", type=int, default=2)
+    parser.add_argument("--sessions", type=int, default=200, help="list + open sessions to run")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
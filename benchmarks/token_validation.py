@@ -0,0 +1,128 @@
+"""Measure validate_token throughput on one core.
+
+Compares, for a realistic Entra JWKS (several RSA keys, the signing key
+last):
+
+* ``scan+convert`` - the previous per-request path: linear scan of the JWKS
+  and RSA key construction from ``n``/``e`` before verifying,
+* ``key map`` - full verification with the pre-materialised ``kid -> key``
+  map (``_verify_token``),
+* ``cached`` - ``validate_token`` with the verified-token cache warm.
+
+Usage::
+
+    python benchmarks/token_validation.py [--seconds 2] [--keys 6]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from unittest.mock import AsyncMock, patch
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "function_app"))
+
+from core import auth
+from core.config import settings
+
+TENANT_ID = "00000000-0000-0000-0000-000000000000"
+CLIENT_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _b64(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(value: str) -> int:
+    return int.from_bytes(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), "big")
+
+
+def make_jwks(count: int) -> tuple[rsa.RSAPrivateKey, dict]:
+    keys = []
+    private_key = None
+    for i in range(count):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        numbers = private_key.public_key().public_numbers()
+        keys.append({"kid": f"kid-{i}", "kty": "RSA", "use": "sig", "n": _b64(numbers.n), "e": _b64(numbers.e)})
+    assert private_key is not None
+    return private_key, {"keys": keys}
+
+
+def make_token(private_key: rsa.RSAPrivateKey, kid: str) -> str:
+    now = int(time.time())
+    claims = {
+        "oid": "00000000-0000-0000-0000-000000000001",
+        "aud": CLIENT_ID,
+        "iss": settings.ENTRA_ISSUER_TEMPLATE.format(tenant_id=TENANT_ID),
+        "nbf": now - 10,
+        "exp": now + 3600,
+        "name": "Bench User",
+        "preferred_username": "bench@example.com",
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def scan_and_convert(jwks: dict, token: str) -> dict:
+    kid = jwt.get_unverified_header(token)["kid"]
+    jwk = next(k for k in jwks["keys"] if k["kid"] == kid and k["kty"] == "RSA")
+    public_key = RSAPublicNumbers(_unb64(jwk["e"]), _unb64(jwk["n"])).public_key()
+    return jwt.decode(
+        token,
+        key=public_key,
+        algorithms=["RS256"],
+        audience=CLIENT_ID,
+        issuer=settings.ENTRA_ISSUER_TEMPLATE.format(tenant_id=TENANT_ID),
+    )
+
+
+async def measure(call: Callable[[], Awaitable[object]], seconds: float) -> float:
+    """Return calls per second of *call* over roughly *seconds*."""
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            await call()
+        count += 50
+    return count / (time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace) -> None:
+    settings.TENANT_ID = TENANT_ID
+    settings.CLIENT_ID = CLIENT_ID
+    private_key, jwks = make_jwks(args.keys)
+    token = make_token(private_key, f"kid-{args.keys - 1}")
+
+    async def legacy() -> dict:
+        return scan_and_convert(jwks, token)
+
+    with patch("core.auth._fetch_jwks", new_callable=AsyncMock, return_value=jwks):
+        auth._clear_caches()
+        results = {
+            "scan+convert": await measure(legacy, args.seconds),
+            "key map": await measure(lambda: auth._verify_token(token), args.seconds),
+            "cached": await measure(lambda: auth.validate_token(token), args.seconds),
+        }
+
+    print(f"{'path':<14}{'validations/s':>15}")
+    for name, rate in results.items():
+        print(f"{name:<14}{rate:>15,.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time per measured path (default: 2)")
+    parser.add_argument("--keys", type=int, default=6, help="RSA keys in the JWKS (default: 6)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
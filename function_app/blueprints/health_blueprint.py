@@ -2,6 +2,8 @@ import json
 
 import azure.functions as func
 
+from services.telemetry_service import service_stats
+
 health_bp = func.Blueprint()
 
 
@@ -13,3 +15,14 @@ async def health_check(req: func.HttpRequest) -> func.HttpResponse:
         status_code=200,
         mimetype="application/json",
     )
+
+
+# Counters of the instance that serves the call; protected by a function key
+@health_bp.function_name("Diagnostics")
+@health_bp.route(route="v1/diagnostics/metrics", methods=["GET"], auth_level=func.AuthLevel.FUNCTION)
+async def diagnostics(req: func.HttpRequest) -> func.HttpResponse:
+    return func.HttpResponse(
+        body=json.dumps(service_stats()),
+        status_code=200,
+        mimetype="application/json",
+    )
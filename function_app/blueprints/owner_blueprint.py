@@ -7,9 +7,12 @@ import azure.functions as func
 from core.decorators import require_auth, require_owner
 from core.error_handler import handle_errors
 from core.exceptions import CannotRemoveLastOwnerError, OwnerNotFoundError
+from core.request_context import request_context
 from core.request_helpers import json_response, parse_request_body
 from models.owner import AddOwnerRequest, OwnerListResponse, OwnerResponse
 from services.audit_service import ADD_OWNER, REMOVE_OWNER, audit_service
+from services.cosmos_service import cosmos_service
+from services.directory_mirror_service import directory_mirror_service
 from services.graph_service import graph_service
 
 logger = logging.getLogger(__name__)
@@ -17,6 +20,19 @@ logger = logging.getLogger(__name__)
 owner_bp = func.Blueprint()
 
 
+async def _service_principal_id(spn_id: str) -> str | None:
+    """Return the service principal object id from the Graph index, else the portal metadata.
+
+    ``None`` for SPNs created before the id was recorded; ``graph_service``
+    then resolves it through Graph.
+    """
+    sp_id = graph_service.known_service_principal_id(spn_id)
+    if sp_id is None:
+        metadata = await cosmos_service.get_spn_metadata(spn_id) or {}
+        sp_id = metadata.get("servicePrincipalId")
+    return sp_id
+
+
 # ------------------------------------------------------------------
 # GET /v1/spns/{spn_id}/owners
 # ------------------------------------------------------------------
@@ -34,7 +50,7 @@ owner_bp = func.Blueprint()
 async def list_owners(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
 
-    owners = await graph_service.list_owners(spn_id)
+    owners = await request_context().owners(spn_id, allow_stale=True)
     items = [
         OwnerResponse(
             id=o["id"],
@@ -65,20 +81,21 @@ async def list_owners(req: func.HttpRequest) -> func.HttpResponse:
 @require_owner
 async def add_owner(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
     body = parse_request_body(req, AddOwnerRequest)
 
     # Validate user exists
     user = await graph_service.get_user(body.user_id)
 
     # Add owner
-    await graph_service.add_owner(spn_id, body.user_id)
+    await graph_service.add_owner(spn_id, body.user_id, service_principal_id=await _service_principal_id(spn_id))
+    await directory_mirror_service.record_owner_added(spn_id, user)
 
     # Audit
     await audit_service.log(
         spn_id,
         ADD_OWNER,
-        user_context,
+        context.user,
         details={"userId": body.user_id, "displayName": user.get("displayName", "")},
     )
 
@@ -104,14 +121,14 @@ async def add_owner(req: func.HttpRequest) -> func.HttpResponse:
 )
 @handle_errors
 @require_auth
-@require_owner
+@require_owner(strict=True)
 async def remove_owner(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
     owner_id = req.route_params["owner_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
 
-    # List current owners
-    owners = await graph_service.list_owners(spn_id)
+    # Current owners from live Graph (already fetched by a strict @require_owner)
+    owners = await context.owners(spn_id, fresh=True)
 
     # Check last-owner protection
     if len(owners) <= 1:
@@ -123,9 +140,10 @@ async def remove_owner(req: func.HttpRequest) -> func.HttpResponse:
         raise OwnerNotFoundError(owner_id)
 
     # Remove owner
-    await graph_service.remove_owner(spn_id, owner_id)
+    await graph_service.remove_owner(spn_id, owner_id, service_principal_id=await _service_principal_id(spn_id))
+    await directory_mirror_service.record_owner_removed(spn_id, owner_id)
 
     # Audit
-    await audit_service.log(spn_id, REMOVE_OWNER, user_context, details={"ownerId": owner_id})
+    await audit_service.log(spn_id, REMOVE_OWNER, context.user, details={"ownerId": owner_id})
 
     return func.HttpResponse(status_code=204)
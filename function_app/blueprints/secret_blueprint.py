@@ -7,6 +7,7 @@ import azure.functions as func
 from core.decorators import require_auth, require_owner
 from core.error_handler import handle_errors
 from core.exceptions import MaxSecretsReachedError, SecretNotFoundError
+from core.request_context import request_context
 from core.request_helpers import json_response, parse_request_body
 from models.secret import CreateSecretRequest, SecretCreatedResponse, SecretListResponse
 from models.spn import SecretSummaryResponse
@@ -38,11 +39,11 @@ _MAX_SECRETS = 2
 @require_owner
 async def create_secret(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
     body = parse_request_body(req, CreateSecretRequest)
 
-    # Check max secrets
-    app = await graph_service.get_application(spn_id)
+    # Check max secrets against live Graph; another instance may have added one
+    app = await context.application(spn_id, fresh=True)
     existing_creds = app.get("passwordCredentials", [])
     if len(existing_creds) >= _MAX_SECRETS:
         raise MaxSecretsReachedError()
@@ -64,7 +65,7 @@ async def create_secret(req: func.HttpRequest) -> func.HttpResponse:
     await audit_service.log(
         spn_id,
         ADD_SECRET,
-        user_context,
+        context.user,
         details={"keyId": key_id, "displayName": body.display_name},
     )
 
@@ -96,7 +97,7 @@ async def create_secret(req: func.HttpRequest) -> func.HttpResponse:
 async def list_secrets(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
 
-    app = await graph_service.get_application(spn_id)
+    app = await request_context().application(spn_id, allow_stale=True)
     creds = app.get("passwordCredentials", [])
 
     items = [
@@ -126,14 +127,14 @@ async def list_secrets(req: func.HttpRequest) -> func.HttpResponse:
 )
 @handle_errors
 @require_auth
-@require_owner
+@require_owner(strict=True)
 async def delete_secret(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
     key_id = req.route_params["key_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
 
-    # Verify key_id exists
-    app = await graph_service.get_application(spn_id)
+    # Verify key_id exists in live Graph, not in a possibly outdated cache
+    app = await context.application(spn_id, fresh=True)
     existing_creds = app.get("passwordCredentials", [])
     if not any(c.get("keyId") == key_id for c in existing_creds):
         raise SecretNotFoundError(key_id)
@@ -147,6 +148,6 @@ async def delete_secret(req: func.HttpRequest) -> func.HttpResponse:
         await keyvault_service.delete_secret(kv_secret_name)
 
     # Audit
-    await audit_service.log(spn_id, DELETE_SECRET, user_context, details={"keyId": key_id})
+    await audit_service.log(spn_id, DELETE_SECRET, context.user, details={"keyId": key_id})
 
     return func.HttpResponse(status_code=204)
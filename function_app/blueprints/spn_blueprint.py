@@ -4,8 +4,10 @@ import logging
 
 import azure.functions as func
 
+from core.config import settings
 from core.decorators import require_auth, require_owner
 from core.error_handler import handle_errors
+from core.request_context import request_context
 from core.request_helpers import json_response, parse_request_body
 from models.spn import (
     CreateSpnRequest,
@@ -15,7 +17,8 @@ from models.spn import (
     UpdateSpnRequest,
 )
 from services.audit_service import CREATE_SPN, DELETE_SPN, UPDATE_SPN, audit_service
-from services.cosmos_service import cosmos_service
+from services.cosmos_service import cosmos_service, normalize_spn_name
+from services.directory_mirror_service import directory_mirror_service
 from services.graph_service import graph_service
 from services.keyvault_service import keyvault_service
 
@@ -57,42 +60,51 @@ def _build_spn_response(app: dict, owners: list[dict] | None = None) -> SpnRespo
 @handle_errors
 @require_auth
 async def create_spn(req: func.HttpRequest) -> func.HttpResponse:
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
     body = parse_request_body(req, CreateSpnRequest)
 
-    # Check for duplicate name
+    # Reserve the name (atomic; rejects duplicates and concurrent creates)
     from core.exceptions import DuplicateSpnNameError
 
-    if await graph_service.check_duplicate_name(body.display_name):
+    if not await cosmos_service.reserve_spn_name(body.display_name):
         raise DuplicateSpnNameError(body.display_name)
 
-    # Create application
-    app = await graph_service.create_application(
-        display_name=body.display_name,
-        description=body.description,
-        redirect_uris=body.redirect_uris,
-        tags=body.tags,
-    )
-    app_id = app["appId"]
-    app_object_id = app["id"]
-
-    # Create service principal (with cleanup on failure)
     try:
-        await graph_service.create_service_principal(app_id)
+        if settings.SPN_NAME_CHECK_GRAPH and await directory_mirror_service.check_duplicate_name(body.display_name):
+            raise DuplicateSpnNameError(body.display_name)
+
+        # Create application
+        app = await graph_service.create_application(
+            display_name=body.display_name,
+            description=body.description,
+            redirect_uris=body.redirect_uris,
+            tags=body.tags,
+        )
+        app_id = app["appId"]
+        app_object_id = app["id"]
+
+        # Create service principal and add caller as owner (with cleanup on failure)
+        try:
+            owners = await graph_service.provision_application(app_object_id, app_id, context.oid)
+        except Exception:
+            logger.exception("Failed to provision SP/owner for app %s; cleaning up app", app_object_id)
+            await graph_service.delete_application(app_object_id)
+            raise
     except Exception:
-        logger.exception("Failed to create SP for app %s; cleaning up app", app_object_id)
-        await graph_service.delete_application(app_object_id)
+        await cosmos_service.release_spn_name(body.display_name)
         raise
 
-    # Add caller as owner
-    await graph_service.add_owner(app_object_id, user_context["oid"])
+    await cosmos_service.assign_spn_name(body.display_name, app_object_id)
+    await directory_mirror_service.record_application(app, owners)
 
     # Save portal metadata
     await cosmos_service.upsert_spn_metadata(
         app_object_id,
         {
             "displayName": body.display_name,
-            "createdBy": user_context["oid"],
+            "createdBy": context.oid,
+            "appId": app_id,
+            "servicePrincipalId": graph_service.known_service_principal_id(app_object_id),
         },
     )
 
@@ -100,12 +112,10 @@ async def create_spn(req: func.HttpRequest) -> func.HttpResponse:
     await audit_service.log(
         app_object_id,
         CREATE_SPN,
-        user_context,
+        context.user,
         details={"displayName": body.display_name},
     )
 
-    # Re-fetch to get full object with owner
-    owners = await graph_service.list_owners(app_object_id)
     response = _build_spn_response(app, owners)
     return json_response(response, status_code=201)
 
@@ -120,19 +130,19 @@ async def create_spn(req: func.HttpRequest) -> func.HttpResponse:
 @handle_errors
 @require_auth
 async def list_spns(req: func.HttpRequest) -> func.HttpResponse:
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
+
+    # Consume Graph page by page (the next page is prefetched meanwhile) and
+    # keep only the response items, not the raw Graph objects.  The response
+    # carries no portal metadata, so Cosmos is not queried.
+    items: list[SpnResponse] = []
+    async for apps in directory_mirror_service.iter_owned_application_pages(
+        context.oid,
+        max_items=settings.SPN_LIST_MAX_ITEMS or None,
+        allow_stale=True,
+    ):
+        items.extend(_build_spn_response(a) for a in apps)
 
-    apps = await graph_service.list_owned_applications(user_context["oid"])
-    spn_ids = [a["id"] for a in apps]
-
-    # Enrich with Cosmos metadata (best-effort)
-    if spn_ids:
-        try:
-            await cosmos_service.list_spn_metadata_by_ids(spn_ids)
-        except Exception:
-            logger.warning("Failed to fetch Cosmos metadata for list endpoint")
-
-    items = [_build_spn_response(a) for a in apps]
     response = SpnListResponse(value=items, count=len(items))
     return json_response(response)
 
@@ -150,8 +160,7 @@ async def list_spns(req: func.HttpRequest) -> func.HttpResponse:
 async def get_spn(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
 
-    app = await graph_service.get_application(spn_id)
-    owners = await graph_service.list_owners(spn_id)
+    app, owners = await request_context().application_with_owners(spn_id, allow_stale=True)
     response = _build_spn_response(app, owners)
     return json_response(response)
 
@@ -168,17 +177,28 @@ async def get_spn(req: func.HttpRequest) -> func.HttpResponse:
 @require_owner
 async def update_spn(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
     body = parse_request_body(req, UpdateSpnRequest)
 
     from core.exceptions import DuplicateSpnNameError
 
-    # Check duplicate name if changing it
-    if body.display_name is not None and await graph_service.check_duplicate_name(body.display_name):
-        # Only raise if the duplicate is a different app
-        current_app = await graph_service.get_application(spn_id)
-        if current_app.get("displayName") != body.display_name:
+    # Reserve the new name if changing it (a no-op when this SPN already holds it).
+    # The current name is read first so a failed read cannot leave the new one locked.
+    previous_name: str | None = None
+    if body.display_name is not None:
+        current_name = (await context.application(spn_id)).get("displayName", "")
+        if not await cosmos_service.reserve_spn_name(body.display_name, spn_id):
             raise DuplicateSpnNameError(body.display_name)
+        if normalize_spn_name(current_name) != normalize_spn_name(body.display_name):
+            previous_name = current_name
+            try:
+                if settings.SPN_NAME_CHECK_GRAPH and await directory_mirror_service.check_duplicate_name(
+                    body.display_name
+                ):
+                    raise DuplicateSpnNameError(body.display_name)
+            except Exception:
+                await cosmos_service.release_spn_name(body.display_name, spn_id)
+                raise
 
     # Build update payload
     updates: dict = {}
@@ -196,7 +216,15 @@ async def update_spn(req: func.HttpRequest) -> func.HttpResponse:
 
         raise ValidationError("No fields to update.")
 
-    updated_app = await graph_service.update_application(spn_id, updates)
+    try:
+        updated_app = await graph_service.update_application(spn_id, updates)
+    except Exception:
+        if previous_name is not None and body.display_name is not None:
+            await cosmos_service.release_spn_name(body.display_name, spn_id)
+        raise
+    if previous_name is not None:
+        await cosmos_service.release_spn_name(previous_name, spn_id)
+    await directory_mirror_service.record_application(updated_app)
 
     # Update Cosmos metadata
     cosmos_updates = {}
@@ -206,9 +234,10 @@ async def update_spn(req: func.HttpRequest) -> func.HttpResponse:
         await cosmos_service.upsert_spn_metadata(spn_id, cosmos_updates)
 
     # Audit
-    await audit_service.log(spn_id, UPDATE_SPN, user_context, details=updates)
+    await audit_service.log(spn_id, UPDATE_SPN, context.user, details=updates)
 
-    owners = await graph_service.list_owners(spn_id)
+    # Owners are unchanged by the update; reuse the list @require_owner fetched
+    owners = await context.owners(spn_id)
     response = _build_spn_response(updated_app, owners)
     return json_response(response)
 
@@ -222,10 +251,10 @@ async def update_spn(req: func.HttpRequest) -> func.HttpResponse:
 @spn_bp.route(route="v1/spns/{spn_id}", methods=["DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
 @handle_errors
 @require_auth
-@require_owner
+@require_owner(strict=True)
 async def delete_spn(req: func.HttpRequest) -> func.HttpResponse:
     spn_id = req.route_params["spn_id"]
-    user_context: dict = req.user_context  # type: ignore[attr-defined]
+    context = request_context()
 
     # Cleanup KeyVault secrets for this SPN
     metadata = await cosmos_service.get_spn_metadata(spn_id)
@@ -239,11 +268,14 @@ async def delete_spn(req: func.HttpRequest) -> func.HttpResponse:
 
     # Delete the application (also deletes associated SP)
     await graph_service.delete_application(spn_id)
+    await directory_mirror_service.forget_application(spn_id)
 
-    # Delete Cosmos metadata
+    # Delete Cosmos metadata and free the name
     await cosmos_service.delete_spn_metadata(spn_id)
+    if metadata and metadata.get("displayName"):
+        await cosmos_service.release_spn_name(metadata["displayName"], spn_id)
 
     # Audit
-    await audit_service.log(spn_id, DELETE_SPN, user_context)
+    await audit_service.log(spn_id, DELETE_SPN, context.user)
 
     return func.HttpResponse(status_code=204)
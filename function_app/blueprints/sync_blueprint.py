@@ -0,0 +1,28 @@
+"""Timer-triggered maintenance of the directory mirror."""
+
+import logging
+
+import azure.functions as func
+
+from core.config import settings
+from services.directory_mirror_service import directory_mirror_service
+
+logger = logging.getLogger(__name__)
+
+sync_bp = func.Blueprint()
+
+
+# ------------------------------------------------------------------
+# Every 5 minutes — apply Graph delta changes to the mirror
+# ------------------------------------------------------------------
+
+
+@sync_bp.function_name("DirectorySync")
+@sync_bp.timer_trigger(schedule="0 */5 * * * *", arg_name="timer", run_on_startup=False, use_monitor=True)
+async def directory_sync(timer: func.TimerRequest) -> None:
+    if settings.DIRECTORY_MIRROR_MODE != "mirror":
+        logger.debug("Directory mirror disabled (mode=%s); skipping sync", settings.DIRECTORY_MIRROR_MODE)
+        return
+
+    counts = await directory_mirror_service.sync()
+    logger.info("Directory sync finished: %s", counts)
@@ -1,15 +1,18 @@
 """JWT token validation against Entra ID with JWKS caching and group membership checks."""
 
+import asyncio
+import hashlib
 import logging
 import time
 
-import httpx
 import jwt
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
 
+from core.cache import TTLCache
 from core.config import settings
 from core.exceptions import ForbiddenError, UnauthorizedError
+from core.host_cache import host_cache
+from core.resilience import Bulkhead
+from core.shared_cache import TwoLevelCache
 
 logger = logging.getLogger(__name__)
 
@@ -19,19 +22,98 @@ logger = logging.getLogger(__name__)
 _jwks_cache: dict | None = None
 _jwks_cache_timestamp: float = 0.0
 _JWKS_CACHE_TTL_SECONDS: float = 86400.0  # 24 hours
+# Refresh in the background once the JWKS is this close to expiry
+_JWKS_REFRESH_AHEAD_SECONDS: float = 3600.0
+# Unknown kids force at most one refresh per interval and are then
+# rejected without a refresh for a while
+_JWKS_MIN_REFRESH_INTERVAL_SECONDS: float = 60.0
+_UNKNOWN_KID_TTL_SECONDS: float = 300.0
+_jwks_refresh: asyncio.Task[dict] | None = None
+_jwks_refresh_started_at: float = float("-inf")
+_unknown_kids: TTLCache[str, bool] = TTLCache(1000, _UNKNOWN_KID_TTL_SECONDS)
+_jwks_stats = {"refreshes": 0, "backgroundRefreshes": 0, "refreshFailures": 0, "unknownKidRejections": 0}
+# kid -> ready-to-use public key, rebuilt on every JWKS refresh
+_signing_keys: dict[str, jwt.PyJWK] = {}
+_SIGNING_KEY_TYPES = frozenset({"RSA", "EC", "OKP"})
+_jwks_bulkhead = Bulkhead("jwks", settings.JWKS_MAX_CONCURRENCY, settings.JWKS_MAX_WAIT_SECONDS)
+# A cold worker takes the JWKS another worker on this host fetched within
+# this long.  Signing keys are never read from the cross-instance shared
+# cache: write access to that store must not amount to forging tokens.
+_JWKS_SHARED_TTL_SECONDS: float = 3600.0
 
 # ---------------------------------------------------------------------------
-# Group membership cache  (user_oid -> (is_member, expiry_timestamp))
+# Verified-token cache  (sha256(token) -> decoded claims, until exp - skew)
 # ---------------------------------------------------------------------------
-_group_membership_cache: dict[str, tuple[bool, float]] = {}
+_verified_tokens: TTLCache[bytes, dict] = TTLCache(settings.TOKEN_CACHE_MAX_ENTRIES, float("inf"))
+_verifications = 0
+_verification_seconds_total = 0.0
+
+# ---------------------------------------------------------------------------
+# Group membership cache  (user_oid -> is_member, LRU-bounded)
+# ---------------------------------------------------------------------------
+
+
+def _new_membership_cache() -> TTLCache[str, bool]:
+    return TTLCache(settings.GROUP_MEMBERSHIP_CACHE_MAX_ENTRIES, settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS)
+
+
+_group_membership_cache = _new_membership_cache()
+# Shared with the other instances; consulted before asking Graph
+_shared_membership: TwoLevelCache[bool] = TwoLevelCache(
+    "membership", _group_membership_cache, host=host_cache("membership")
+)
+# user_oid -> Graph check in flight, shared by all requests for that user
+_membership_checks: dict[str, asyncio.Task[bool]] = {}
+_membership_stats = {"checks": 0, "coalescedChecks": 0, "backgroundChecks": 0, "checkFailures": 0}
+# How require_auth decisions were made: from the token's groups claim, or
+# through check_group_membership because of overage or a missing claim
+_authorization_stats = {"fromClaim": 0, "overageFallbacks": 0, "missingClaimFallbacks": 0}
 
 
 def _clear_caches() -> None:
     """Reset all module-level caches. Useful for testing."""
-    global _jwks_cache, _jwks_cache_timestamp, _group_membership_cache
+    global _jwks_cache, _jwks_cache_timestamp, _group_membership_cache, _signing_keys
+    global _shared_membership
+    global _jwks_refresh, _jwks_refresh_started_at, _unknown_kids
+    global _verified_tokens, _verifications, _verification_seconds_total
     _jwks_cache = None
+    _signing_keys = {}
     _jwks_cache_timestamp = 0.0
-    _group_membership_cache.clear()
+    _jwks_refresh = None
+    _jwks_refresh_started_at = float("-inf")
+    _unknown_kids = TTLCache(1000, _UNKNOWN_KID_TTL_SECONDS)
+    for counter in _jwks_stats:
+        _jwks_stats[counter] = 0
+    _group_membership_cache = _new_membership_cache()
+    _shared_membership = TwoLevelCache("membership", _group_membership_cache, host=host_cache("membership"))
+    _membership_checks.clear()
+    for counter in _membership_stats:
+        _membership_stats[counter] = 0
+    for counter in _authorization_stats:
+        _authorization_stats[counter] = 0
+    _verified_tokens = TTLCache(settings.TOKEN_CACHE_MAX_ENTRIES, float("inf"))
+    _verifications = 0
+    _verification_seconds_total = 0.0
+
+
+def auth_stats() -> dict[str, dict[str, float]]:
+    """Return token, JWKS, group membership and authorisation counters."""
+    decisions = sum(_authorization_stats.values())
+    return {
+        "jwks": dict(_jwks_stats),
+        "groupMembershipCache": {**_shared_membership.stats(), **_membership_stats},
+        "groupAuthorization": {
+            **_authorization_stats,
+            "decisions": decisions,
+            "fromClaimRatio": _authorization_stats["fromClaim"] / decisions if decisions else 0.0,
+        },
+        "verifiedTokenCache": _verified_tokens.stats(),
+        "verification": {
+            "count": _verifications,
+            "secondsTotal": _verification_seconds_total,
+            "avgMs": _verification_seconds_total * 1000 / _verifications if _verifications else 0.0,
+        },
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -39,56 +121,147 @@ def _clear_caches() -> None:
 # ---------------------------------------------------------------------------
 
 
-def _base64url_decode(val: str) -> bytes:
-    """Decode a Base64url-encoded string (no padding)."""
-    remainder = len(val) % 4
-    if remainder:
-        val += "=" * (4 - remainder)
-    import base64
-
-    return base64.urlsafe_b64decode(val)
-
-
-def _jwk_to_public_key(jwk: dict):
-    """Convert a JWK dict (RSA) to a ``cryptography`` RSAPublicKey."""
-    n_bytes = _base64url_decode(jwk["n"])
-    e_bytes = _base64url_decode(jwk["e"])
-
-    n_int = int.from_bytes(n_bytes, byteorder="big")
-    e_int = int.from_bytes(e_bytes, byteorder="big")
+def _build_signing_keys(jwks: dict) -> dict[str, jwt.PyJWK]:
+    """Materialise the ``kid -> key`` map for the asymmetric signing keys in *jwks*.
 
-    return RSAPublicNumbers(e_int, n_int).public_key(default_backend())
+    Symmetric (``oct``) and encryption-only keys are skipped; so are keys
+    the installed ``cryptography`` cannot load.
+    """
+    keys: dict[str, jwt.PyJWK] = {}
+    for jwk in jwks.get("keys", []):
+        kid = jwk.get("kid")
+        if not kid or jwk.get("kty") not in _SIGNING_KEY_TYPES or jwk.get("use", "sig") != "sig":
+            continue
+        try:
+            keys[kid] = jwt.PyJWK(jwk)
+        except jwt.exceptions.PyJWTError:
+            logger.warning("Skipping unusable JWKS key %s (kty=%s)", kid, jwk.get("kty"))
+    return keys
 
 
 async def _fetch_jwks() -> dict:
     """Fetch the JWKS document from Entra ID."""
+    # Import here to avoid circular import at module load time
+    from services.graph_service import graph_service
+
     url = settings.ENTRA_JWKS_URI_TEMPLATE.format(tenant_id=settings.TENANT_ID)
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, timeout=10.0)
-        resp.raise_for_status()
-        return resp.json()
+    async with _jwks_bulkhead:
+        resp = await graph_service.get_http_client().get(url, timeout=10.0)
+    resp.raise_for_status()
+    return resp.json()
 
 
 async def _get_jwks(force_refresh: bool = False) -> dict:
-    """Return the cached JWKS, refreshing if stale or forced."""
-    global _jwks_cache, _jwks_cache_timestamp
-
-    now = time.monotonic()
-    if _jwks_cache is not None and not force_refresh and (now - _jwks_cache_timestamp) < _JWKS_CACHE_TTL_SECONDS:
-        return _jwks_cache
+    """Return the cached JWKS.
 
-    logger.info("Refreshing JWKS cache (force=%s)", force_refresh)
-    _jwks_cache = await _fetch_jwks()
-    _jwks_cache_timestamp = now
+    Only a cold cache, an expired one or *force_refresh* waits for a
+    download.  Within ``_JWKS_REFRESH_AHEAD_SECONDS`` of expiry the cached
+    JWKS is served while a background refresh runs.  Concurrent refreshes
+    share one download.
+    """
+    if _jwks_cache is None or force_refresh:
+        return await _refresh_jwks()
+    age = time.monotonic() - _jwks_cache_timestamp
+    if age >= _JWKS_CACHE_TTL_SECONDS:
+        return await _refresh_jwks()
+    if age >= _JWKS_CACHE_TTL_SECONDS - _JWKS_REFRESH_AHEAD_SECONDS and _jwks_refresh is None:
+        _jwks_stats["backgroundRefreshes"] += 1
+        _start_jwks_refresh()
     return _jwks_cache
 
 
-def _find_signing_key(jwks: dict, kid: str):
-    """Find the JWK matching the given ``kid`` and return a public key."""
-    for key in jwks.get("keys", []):
-        if key.get("kid") == kid and key.get("kty") == "RSA":
-            return _jwk_to_public_key(key)
-    return None
+async def _refresh_jwks() -> dict:
+    """Refresh the JWKS (joining a refresh already in flight) and return it."""
+    return await asyncio.shield(_start_jwks_refresh())
+
+
+def _start_jwks_refresh() -> asyncio.Task[dict]:
+    global _jwks_refresh, _jwks_refresh_started_at
+    if _jwks_refresh is None:
+        _jwks_refresh_started_at = time.monotonic()
+        _jwks_refresh = asyncio.get_running_loop().create_task(_load_jwks())
+        _jwks_refresh.add_done_callback(_on_jwks_refresh_done)
+    return _jwks_refresh
+
+
+def _on_jwks_refresh_done(task: asyncio.Task[dict]) -> None:
+    global _jwks_refresh
+    if _jwks_refresh is task:
+        _jwks_refresh = None
+    # Retrieve the exception so background failures are not reported as
+    # "never retrieved"; foreground callers see it through their await.
+    if not task.cancelled() and task.exception() is not None:
+        _jwks_stats["refreshFailures"] += 1
+        logger.warning("JWKS refresh failed: %s", task.exception())
+
+
+async def _load_jwks() -> dict:
+    global _jwks_cache, _jwks_cache_timestamp, _signing_keys
+    if _jwks_cache is None:
+        # Cold worker: reuse the keys another worker on this host fetched
+        # recently; one worker per host loads them
+        jwks = await host_cache("jwks").get_or_load("keys", _download_jwks)
+    else:
+        jwks, ttl = await _download_jwks()
+        host_cache("jwks").set("keys", jwks, ttl)
+    previous = _jwks_cache
+    _jwks_cache = jwks
+    _signing_keys = _build_signing_keys(jwks)
+    _jwks_cache_timestamp = time.monotonic()
+    _jwks_stats["refreshes"] += 1
+    _unknown_kids.clear()
+    if previous is not None and _kids(previous) != _kids(jwks):
+        # Keys were rotated: tokens signed by a withdrawn key must be re-verified
+        logger.info("JWKS keys changed; flushing %d verified tokens", len(_verified_tokens))
+        _verified_tokens.clear()
+    return jwks
+
+
+async def _download_jwks() -> tuple[dict, float]:
+    """Return the JWKS from Entra and how long to share it with the other workers on this host."""
+    logger.info("Refreshing JWKS cache")
+    return await _fetch_jwks(), _JWKS_SHARED_TTL_SECONDS
+
+
+def _kids(jwks: dict) -> set[str]:
+    return {key.get("kid") for key in jwks.get("keys", [])}
+
+
+def _find_signing_key(kid: str) -> jwt.PyJWK | None:
+    """Return the signing key for ``kid`` from the current JWKS, if any."""
+    return _signing_keys.get(kid)
+
+
+async def _resolve_signing_key(kid: str) -> jwt.PyJWK | None:
+    """Return the signing key for ``kid``, refreshing the JWKS once on a miss.
+
+    A miss may mean the keys were rotated, so it forces a refresh, but at
+    most one per ``_JWKS_MIN_REFRESH_INTERVAL_SECONDS``; a kid still unknown
+    afterwards is rejected without further refreshes for
+    ``_UNKNOWN_KID_TTL_SECONDS``.  Bursts of bogus kids therefore cost at
+    most one download.
+    """
+    await _get_jwks()
+    signing_key = _find_signing_key(kid)
+    if signing_key is not None:
+        return signing_key
+
+    if _unknown_kids.get(kid):
+        _jwks_stats["unknownKidRejections"] += 1
+        return None
+    if _jwks_refresh is None and time.monotonic() - _jwks_refresh_started_at < _JWKS_MIN_REFRESH_INTERVAL_SECONDS:
+        _jwks_stats["unknownKidRejections"] += 1
+        return None
+
+    try:
+        await _refresh_jwks()
+    except Exception:
+        logger.warning("JWKS refresh for unknown kid %s failed; using cached keys", kid)
+    signing_key = _find_signing_key(kid)
+    if signing_key is None:
+        _unknown_kids.set(kid, True)
+        _jwks_stats["unknownKidRejections"] += 1
+    return signing_key
 
 
 # ---------------------------------------------------------------------------
@@ -101,7 +274,35 @@ async def validate_token(token: str) -> dict:
 
     Returns the decoded claims dict on success.
     Raises ``UnauthorizedError`` on any validation failure.
+
+    Successfully validated tokens are cached by SHA-256 of the token until
+    ``exp`` minus ``TOKEN_CACHE_CLOCK_SKEW_SECONDS``, so repeat requests with
+    the same token skip header parsing and signature verification.  The
+    returned claims are shared between requests and must not be modified.
     """
+    token_hash = hashlib.sha256(token.encode()).digest()
+    cached = _verified_tokens.get(token_hash)
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    claims = await _verify_token(token)
+    _record_verification(time.perf_counter() - started)
+
+    ttl = claims["exp"] - time.time() - settings.TOKEN_CACHE_CLOCK_SKEW_SECONDS
+    if ttl > 0:
+        _verified_tokens.set(token_hash, claims, ttl_seconds=ttl)
+    return claims
+
+
+def _record_verification(seconds: float) -> None:
+    global _verifications, _verification_seconds_total
+    _verifications += 1
+    _verification_seconds_total += seconds
+
+
+async def _verify_token(token: str) -> dict:
+    """Parse and fully verify *token* (signature, audience, issuer, lifetime)."""
     try:
         # Decode header to get kid
         unverified_header = jwt.get_unverified_header(token)
@@ -112,16 +313,8 @@ async def validate_token(token: str) -> dict:
     if not kid:
         raise UnauthorizedError("Token header missing 'kid'.")
 
-    # Attempt to find signing key; refresh JWKS once on miss
-    jwks = await _get_jwks()
-    public_key = _find_signing_key(jwks, kid)
-
-    if public_key is None:
-        # Key rotation may have happened — force refresh once
-        jwks = await _get_jwks(force_refresh=True)
-        public_key = _find_signing_key(jwks, kid)
-
-    if public_key is None:
+    signing_key = await _resolve_signing_key(kid)
+    if signing_key is None:
         raise UnauthorizedError("Token signing key not found in JWKS.")
 
     expected_issuer = settings.ENTRA_ISSUER_TEMPLATE.format(tenant_id=settings.TENANT_ID)
@@ -129,8 +322,9 @@ async def validate_token(token: str) -> dict:
     try:
         claims = jwt.decode(
             token,
-            key=public_key,  # type: ignore[arg-type]  # PyJWT accepts RSA keys at runtime
-            algorithms=["RS256"],
+            key=signing_key.key,
+            # Only the key's own algorithm; never "none" or HMAC
+            algorithms=[signing_key.algorithm_name],
             audience=settings.CLIENT_ID,
             issuer=expected_issuer,
             options={
@@ -161,42 +355,98 @@ def extract_user_context(claims: dict) -> dict:
 
 
 # ---------------------------------------------------------------------------
-# Group membership check (via Graph API)
+# Group membership check (groups claim, else via Graph API)
 # ---------------------------------------------------------------------------
 
 
+async def is_authorized_member(claims: dict) -> bool:
+    """Check whether the caller of a validated token is in the allowed group.
+
+    Uses the token's ``groups`` claim when it is present and complete, so
+    most requests need no Graph call.  Tokens with group overage
+    (``_claim_names`` / ``hasgroups``) and tokens without the claim (e.g.
+    guests, or when ``AUTH_USE_GROUPS_CLAIM`` is off) go through
+    ``check_group_membership``.
+    """
+    group_id = settings.ALLOWED_GROUP_ID
+    groups = claims.get("groups")
+    overage = "groups" in claims.get("_claim_names", {}) or bool(claims.get("hasgroups"))
+    if settings.AUTH_USE_GROUPS_CLAIM and group_id and isinstance(groups, list) and not overage:
+        _authorization_stats["fromClaim"] += 1
+        return group_id in groups
+
+    _authorization_stats["overageFallbacks" if overage else "missingClaimFallbacks"] += 1
+    return await check_group_membership(claims["oid"])
+
+
 async def check_group_membership(user_oid: str) -> bool:
     """Check whether *user_oid* is a member of the allowed Entra ID group.
 
-    Results are cached for ``GROUP_MEMBERSHIP_CACHE_TTL_SECONDS``.
+    Memberships are cached for ``GROUP_MEMBERSHIP_CACHE_TTL_SECONDS`` and
+    non-memberships for ``GROUP_MEMBERSHIP_NEGATIVE_TTL_SECONDS``.  Once a
+    decision expires it is still returned for up to
+    ``GROUP_MEMBERSHIP_STALE_SECONDS`` while it is re-checked in the
+    background; older or missing decisions wait for Graph.  Concurrent
+    requests for the same user share one Graph call.
     """
-    now = time.time()
-
-    # Check cache
     cached = _group_membership_cache.get(user_oid)
     if cached is not None:
-        is_member, expiry = cached
-        if now < expiry:
-            return is_member
+        return cached
 
     group_id = settings.ALLOWED_GROUP_ID
     if not group_id:
         logger.warning("ALLOWED_GROUP_ID is not configured; denying access by default.")
         return False
 
-    # Import here to avoid circular import at module load time
-    from services.graph_service import graph_service
+    entry = _group_membership_cache.peek(user_oid)
+    if entry is not None:
+        lifetime = entry.expires_at - entry.stored_at
+        stale = _group_membership_cache.get_stale(user_oid, lifetime + settings.GROUP_MEMBERSHIP_STALE_SECONDS)
+        if stale is not None:
+            if user_oid not in _membership_checks:
+                _membership_stats["backgroundChecks"] += 1
+                _start_membership_check(user_oid, group_id)
+            return stale[0]
 
     try:
-        matched_ids = await graph_service.check_member_groups(user_oid, [group_id])
-        is_member = group_id in matched_ids
+        return await asyncio.shield(_start_membership_check(user_oid, group_id))
     except Exception as exc:
-        logger.exception("Failed to check group membership for user %s", user_oid)
-        # On failure, don't cache, and deny access
+        # Not cached; deny access
         raise ForbiddenError(message="Unable to verify group membership.") from exc
 
-    # Cache the result
-    ttl = settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS
-    _group_membership_cache[user_oid] = (is_member, now + ttl)
 
+def _start_membership_check(user_oid: str, group_id: str) -> asyncio.Task[bool]:
+    task = _membership_checks.get(user_oid)
+    if task is not None:
+        _membership_stats["coalescedChecks"] += 1
+        return task
+    _membership_stats["checks"] += 1
+    task = asyncio.get_running_loop().create_task(_load_group_membership(user_oid, group_id))
+    _membership_checks[user_oid] = task
+    task.add_done_callback(lambda t: _on_membership_check_done(user_oid, t))
+    return task
+
+
+def _on_membership_check_done(user_oid: str, task: asyncio.Task[bool]) -> None:
+    if _membership_checks.get(user_oid) is task:
+        del _membership_checks[user_oid]
+    # Retrieve the exception here so a background check nobody awaits is
+    # still logged once; foreground callers see it through their await.
+    if not task.cancelled() and task.exception() is not None:
+        _membership_stats["checkFailures"] += 1
+        logger.error("Failed to check group membership for user %s", user_oid, exc_info=task.exception())
+
+
+async def _load_group_membership(user_oid: str, group_id: str) -> bool:
+    # Import here to avoid circular import at module load time
+    from services.graph_service import graph_service
+
+    shared = await _shared_membership.get_shared(user_oid)
+    if shared is not None:
+        return shared
+
+    matched_ids = await graph_service.check_member_groups(user_oid, [group_id])
+    is_member = group_id in matched_ids
+    ttl = settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS if is_member else settings.GROUP_MEMBERSHIP_NEGATIVE_TTL_SECONDS
+    await _shared_membership.set(user_oid, is_member, ttl_seconds=ttl)
     return is_member
@@ -0,0 +1,139 @@
+"""Bounded in-process caches shared by services and auth."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class CacheEntry(Generic[V]):
+    value: V
+    expires_at: float
+    etag: str | None = None
+    stored_at: float = 0.0
+
+
+class TTLCache(Generic[K, V]):
+    """Size-bounded LRU cache whose entries expire after a TTL.
+
+    Expired entries are not served by ``get`` but are kept (until evicted)
+    so callers can revalidate them, e.g. with ``If-None-Match`` using the
+    stored ``etag``.  A cache built with ``maxsize <= 0`` or
+    ``ttl_seconds <= 0`` is disabled: it stores nothing and always misses.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[K, CacheEntry[V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_seconds > 0
+
+    def get(self, key: K) -> V | None:
+        """Return the fresh value for *key*, or ``None`` on a miss."""
+        entry = self._entries.get(key)
+        if entry is None or self._clock() >= entry.expires_at:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key: K) -> CacheEntry[V] | None:
+        """Return the entry for *key*, even if expired, without counting a hit."""
+        return self._entries.get(key)
+
+    def set(self, key: K, value: V, *, ttl_seconds: float | None = None, etag: str | None = None) -> None:
+        """Store *value*, evicting the least recently used entry if full."""
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = self._clock()
+        self._entries[key] = CacheEntry(value, now + ttl, etag, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def touch(self, key: K, ttl_seconds: float | None = None) -> None:
+        """Extend the lifetime of an existing entry (e.g. after a 304)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.stored_at = self._clock()
+            entry.expires_at = entry.stored_at + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+            self._entries.move_to_end(key)
+
+    def get_stale(self, key: K, max_age_seconds: float) -> tuple[V, float] | None:
+        """Return ``(value, age)`` for *key*, even if expired, while younger than *max_age_seconds*.
+
+        For stale-if-error serving when the origin is unavailable.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = self._clock() - entry.stored_at
+        if age > max_age_seconds:
+            return None
+        self.stale_hits += 1
+        return entry.value, age
+
+    def invalidate(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def __iter__(self) -> Iterator[K]:
+        """Iterate over a snapshot of the keys, including expired entries."""
+        return iter(list(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss/eviction counters and the hit ratio."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "staleHits": self.stale_hits,
+            "size": len(self._entries),
+            "hitRatio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Stale responses
+# ---------------------------------------------------------------------------
+
+_stale_age: ContextVar[float | None] = ContextVar("stale_age", default=None)
+
+
+def mark_stale(age_seconds: float) -> None:
+    """Record that the current request is being answered with stale data."""
+    current = _stale_age.get()
+    _stale_age.set(age_seconds if current is None else max(current, age_seconds))
+
+
+def stale_age() -> float | None:
+    """Return the age of the oldest stale data served in the current request, if any."""
+    return _stale_age.get()
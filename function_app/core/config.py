@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 
 class Settings:
@@ -11,11 +12,125 @@ class Settings:
     KEYVAULT_URI: str = os.environ.get("KEYVAULT_URI", "")
     APPINSIGHTS_CONNECTION: str = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING", "")
 
-    GRAPH_API_BASE: str = "https://graph.microsoft.com/v1.0"
+    # Point at a local emulator (tests/graph_emulator.py) for load testing
+    GRAPH_API_BASE: str = os.environ.get("GRAPH_API_BASE", "https://graph.microsoft.com/v1.0").rstrip("/")
     ENTRA_JWKS_URI_TEMPLATE: str = "https://login.microsoftonline.com/{tenant_id}/discovery/v2.0/keys"
     ENTRA_ISSUER_TEMPLATE: str = "https://login.microsoftonline.com/{tenant_id}/v2.0"
 
-    GROUP_MEMBERSHIP_CACHE_TTL_SECONDS: int = 300  # 5 minutes
+    # Group membership decisions per user.  Denials expire sooner so newly
+    # added members get in quickly; an expired decision is still served for
+    # up to the stale window while it is re-checked in the background.
+    GROUP_MEMBERSHIP_CACHE_MAX_ENTRIES: int = int(os.environ.get("GROUP_MEMBERSHIP_CACHE_MAX_ENTRIES", "10000"))
+    GROUP_MEMBERSHIP_CACHE_TTL_SECONDS: float = float(os.environ.get("GROUP_MEMBERSHIP_CACHE_TTL_SECONDS", "300"))
+    GROUP_MEMBERSHIP_NEGATIVE_TTL_SECONDS: float = float(os.environ.get("GROUP_MEMBERSHIP_NEGATIVE_TTL_SECONDS", "60"))
+    GROUP_MEMBERSHIP_STALE_SECONDS: float = float(os.environ.get("GROUP_MEMBERSHIP_STALE_SECONDS", "300"))
+    # Authorise from the access token's "groups" claim when it is complete
+    # (app registration groupMembershipClaims = SecurityGroup); overage and
+    # claim-less tokens fall back to Graph.  The claim reflects membership
+    # when the token was issued.
+    AUTH_USE_GROUPS_CLAIM: bool = os.environ.get("AUTH_USE_GROUPS_CLAIM", "true").lower() == "true"
+
+    # Owned-application listing: Graph page size and optional cap (0 = no cap)
+    GRAPH_PAGE_SIZE: int = int(os.environ.get("GRAPH_PAGE_SIZE", "100"))
+    SPN_LIST_MAX_ITEMS: int = int(os.environ.get("SPN_LIST_MAX_ITEMS", "0"))
+    # Decode owned-application pages incrementally, keeping only rendered
+    # fields (needs the optional ijson package)
+    GRAPH_STREAMING_DECODE: bool = os.environ.get("GRAPH_STREAMING_DECODE", "false").lower() == "true"
+
+    # Verified access tokens are cached (by hash) until exp minus the skew margin
+    TOKEN_CACHE_MAX_ENTRIES: int = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+    TOKEN_CACHE_CLOCK_SKEW_SECONDS: float = float(os.environ.get("TOKEN_CACHE_CLOCK_SKEW_SECONDS", "60"))
+
+    # Shared L2 behind the in-process group membership and ownership caches
+    # (core/shared_cache.py): "none", "cosmos" (container shared-cache) or
+    # "redis" (redis.asyncio URL, e.g. rediss://:key@host:6380/0).
+    # L2 calls taking longer than the timeout count as misses.
+    SHARED_CACHE_BACKEND: str = os.environ.get("SHARED_CACHE_BACKEND", "none").lower()
+    SHARED_CACHE_REDIS_URL: str = os.environ.get("SHARED_CACHE_REDIS_URL", "")
+    SHARED_CACHE_TIMEOUT_SECONDS: float = float(os.environ.get("SHARED_CACHE_TIMEOUT_SECONDS", "0.5"))
+
+    # Host cache: memory-mapped slot tables in HOST_CACHE_DIR shared by the
+    # Functions worker processes on one machine (on by default when
+    # FUNCTIONS_WORKER_PROCESS_COUNT > 1).  A worker waits up to
+    # HOST_CACHE_LEAD_WAIT_SECONDS for another worker's refresh of an entry.
+    HOST_CACHE_ENABLED: bool = (
+        os.environ.get(
+            "HOST_CACHE_ENABLED", "true" if int(os.environ.get("FUNCTIONS_WORKER_PROCESS_COUNT", "1")) > 1 else "false"
+        ).lower()
+        == "true"
+    )
+    HOST_CACHE_DIR: str = os.environ.get("HOST_CACHE_DIR", tempfile.gettempdir())
+    HOST_CACHE_LEAD_WAIT_SECONDS: float = float(os.environ.get("HOST_CACHE_LEAD_WAIT_SECONDS", "5.0"))
+    HOST_CACHE_MEMBERSHIP_SLOTS: int = int(os.environ.get("HOST_CACHE_MEMBERSHIP_SLOTS", "16384"))
+
+    # Shared token cache: refresh this long before expiry
+    TOKEN_REFRESH_MARGIN_SECONDS: int = int(os.environ.get("TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+
+    # Graph retry policy and adaptive client-side rate limit
+    GRAPH_MAX_RETRIES: int = int(os.environ.get("GRAPH_MAX_RETRIES", "3"))
+    GRAPH_RETRY_BASE_DELAY_SECONDS: float = float(os.environ.get("GRAPH_RETRY_BASE_DELAY_SECONDS", "0.5"))
+    GRAPH_RETRY_MAX_DELAY_SECONDS: float = float(os.environ.get("GRAPH_RETRY_MAX_DELAY_SECONDS", "8"))
+    GRAPH_RETRY_AFTER_MAX_SECONDS: float = float(os.environ.get("GRAPH_RETRY_AFTER_MAX_SECONDS", "30"))
+    GRAPH_RATE_LIMIT_PER_SECOND: float = float(os.environ.get("GRAPH_RATE_LIMIT_PER_SECOND", "50"))
+    GRAPH_RATE_LIMIT_BURST: int = int(os.environ.get("GRAPH_RATE_LIMIT_BURST", "50"))
+
+    # Per-endpoint-class circuit breaker for Graph, and how old last-known-good
+    # cached data may be when served while a read fails (stale-if-error)
+    GRAPH_BREAKER_FAILURE_RATE: float = float(os.environ.get("GRAPH_BREAKER_FAILURE_RATE", "0.5"))
+    GRAPH_BREAKER_MIN_CALLS: int = int(os.environ.get("GRAPH_BREAKER_MIN_CALLS", "10"))
+    GRAPH_BREAKER_WINDOW_SECONDS: float = float(os.environ.get("GRAPH_BREAKER_WINDOW_SECONDS", "30"))
+    GRAPH_BREAKER_OPEN_SECONDS: float = float(os.environ.get("GRAPH_BREAKER_OPEN_SECONDS", "15"))
+    GRAPH_STALE_IF_ERROR_SECONDS: float = float(os.environ.get("GRAPH_STALE_IF_ERROR_SECONDS", "3600"))
+
+    # Per-dependency concurrency limits (bulkheads).  A call that finds all
+    # slots taken waits at most *_MAX_WAIT_SECONDS, then fails with 503
+    # DEPENDENCY_BUSY; 0 disables the limit.
+    GRAPH_MAX_CONCURRENCY: int = int(os.environ.get("GRAPH_MAX_CONCURRENCY", "50"))
+    GRAPH_MAX_WAIT_SECONDS: float = float(os.environ.get("GRAPH_MAX_WAIT_SECONDS", "5"))
+    COSMOS_MAX_CONCURRENCY: int = int(os.environ.get("COSMOS_MAX_CONCURRENCY", "50"))
+    COSMOS_MAX_WAIT_SECONDS: float = float(os.environ.get("COSMOS_MAX_WAIT_SECONDS", "5"))
+    KEYVAULT_MAX_CONCURRENCY: int = int(os.environ.get("KEYVAULT_MAX_CONCURRENCY", "10"))
+    KEYVAULT_MAX_WAIT_SECONDS: float = float(os.environ.get("KEYVAULT_MAX_WAIT_SECONDS", "5"))
+    JWKS_MAX_CONCURRENCY: int = int(os.environ.get("JWKS_MAX_CONCURRENCY", "2"))
+    JWKS_MAX_WAIT_SECONDS: float = float(os.environ.get("JWKS_MAX_WAIT_SECONDS", "10"))
+
+    # Read-through cache for Graph application objects and owner lists.
+    # Per instance only: keep owner TTLs short, they back ownership checks.
+    GRAPH_CACHE_ENABLED: bool = os.environ.get("GRAPH_CACHE_ENABLED", "true").lower() == "true"
+    GRAPH_CACHE_MAX_ENTRIES: int = int(os.environ.get("GRAPH_CACHE_MAX_ENTRIES", "1000"))
+    GRAPH_APP_CACHE_TTL_SECONDS: float = float(os.environ.get("GRAPH_APP_CACHE_TTL_SECONDS", "60"))
+    GRAPH_OWNER_CACHE_TTL_SECONDS: float = float(os.environ.get("GRAPH_OWNER_CACHE_TTL_SECONDS", "30"))
+    # Member-id sets used when group membership cannot be probed directly;
+    # refreshed from /groups/delta once older than the TTL.
+    GRAPH_GROUP_MEMBERS_TTL_SECONDS: float = float(os.environ.get("GRAPH_GROUP_MEMBERS_TTL_SECONDS", "300"))
+
+    # Display names are reserved atomically in Cosmos. Keep the extra Graph
+    # (or mirror) duplicate check on until names of applications created
+    # before the reservation store have been reserved.
+    SPN_NAME_CHECK_GRAPH: bool = os.environ.get("SPN_NAME_CHECK_GRAPH", "true").lower() == "true"
+
+    # Directory mirror: "live" always asks Graph; "mirror" answers owned-app
+    # listings, duplicate-name and ownership checks from the delta-synced
+    # Cosmos mirror while its last sync is recent enough.
+    DIRECTORY_MIRROR_MODE: str = os.environ.get("DIRECTORY_MIRROR_MODE", "live").lower()
+    DIRECTORY_MIRROR_MAX_STALENESS_SECONDS: float = float(
+        os.environ.get("DIRECTORY_MIRROR_MAX_STALENESS_SECONDS", "900")
+    )
+    DIRECTORY_MIRROR_OWNER_REFRESH_BATCH: int = int(os.environ.get("DIRECTORY_MIRROR_OWNER_REFRESH_BATCH", "200"))
+    # Per-user ownership index kept by the mirror (container spn-ownership,
+    # partitioned by user): ownership checks become point reads and owned-app
+    # listings single-partition queries.  Needs DIRECTORY_MIRROR_MODE=mirror.
+    OWNERSHIP_INDEX_ENABLED: bool = os.environ.get("OWNERSHIP_INDEX_ENABLED", "false").lower() == "true"
+    # Destructive endpoints (delete SPN / owner / secret) always confirm
+    # ownership against live Graph instead of the mirror or index
+    OWNERSHIP_STRICT_DESTRUCTIVE: bool = os.environ.get("OWNERSHIP_STRICT_DESTRUCTIVE", "true").lower() == "true"
+
+    # Shared outbound HTTP client (Graph + JWKS)
+    HTTP2_ENABLED: bool = os.environ.get("HTTP2_ENABLED", "true").lower() == "true"
+    HTTP_MAX_CONNECTIONS: int = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+    HTTP_TIMEOUT_SECONDS: float = float(os.environ.get("HTTP_TIMEOUT_SECONDS", "30"))
 
 
 settings = Settings()
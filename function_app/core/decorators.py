@@ -7,8 +7,10 @@ from typing import Any
 
 import azure.functions as func
 
-from core.auth import check_group_membership, extract_user_context, validate_token
+from core.auth import extract_user_context, is_authorized_member, validate_token
+from core.config import settings
 from core.exceptions import ForbiddenError, NotOwnerError, UnauthorizedError
+from core.request_context import RequestContext, request_context, use_request_context
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +25,8 @@ def require_auth(
 ) -> Callable[..., Coroutine[Any, Any, func.HttpResponse]]:
     """Decorator that validates the bearer token and checks group membership.
 
-    On success the decorated function's ``req`` argument is augmented with a
-    ``user_context`` attribute containing::
+    On success the decorated function runs with a ``RequestContext`` bound
+    (see ``core.request_context.request_context()``) whose ``user`` is::
 
         {
             "oid": "<object-id>",
@@ -47,12 +49,13 @@ def require_auth(
         bypass_oid = os.environ.get("LOCAL_AUTH_BYPASS", "")
         if bypass_oid:
             logger.warning("LOCAL_AUTH_BYPASS active — skipping auth for oid=%s", bypass_oid)
-            req.user_context = {  # type: ignore[attr-defined]
+            bypass_user = {
                 "oid": bypass_oid,
                 "displayName": "Local Dev User",
                 "email": "localdev@example.com",
             }
-            return await fn(req)
+            with use_request_context(RequestContext(bypass_user)):
+                return await fn(req)
 
         # --- Extract bearer token ---
         auth_header = req.headers.get("Authorization", "")
@@ -70,22 +73,18 @@ def require_auth(
         user_context = extract_user_context(claims)
 
         # --- Check group membership ---
-        is_member = await check_group_membership(user_context["oid"])
+        is_member = await is_authorized_member(claims)
         if not is_member:
             raise ForbiddenError(message="You are not a member of the authorized group.")
 
-        # Attach user_context to the request object.
-        # Azure Functions' HttpRequest does not prevent setting arbitrary
-        # attributes, so monkey-patching is the simplest approach.
-        req.user_context = user_context  # type: ignore[attr-defined]
-
         logger.info(
             "Authenticated user: oid=%s name=%s",
             user_context["oid"],
             user_context["displayName"],
         )
 
-        return await fn(req)
+        with use_request_context(RequestContext(user_context)):
+            return await fn(req)
 
     return wrapper
 
@@ -96,12 +95,22 @@ def require_auth(
 
 
 def require_owner(
-    fn: Callable[..., Coroutine[Any, Any, func.HttpResponse]],
-) -> Callable[..., Coroutine[Any, Any, func.HttpResponse]]:
+    fn: Callable[..., Coroutine[Any, Any, func.HttpResponse]] | None = None,
+    *,
+    strict: bool = False,
+) -> Any:
     """Decorator that verifies the authenticated user owns the target SPN.
 
-    **Must** be applied *after* ``@require_auth`` so that ``req.user_context``
+    **Must** be applied *after* ``@require_auth`` so that the request context
     is available.  The SPN is identified by the ``spn_id`` route parameter.
+    A live owner list fetched for the check is memoised in the context for
+    the handler.  Positive decisions are cached, across instances when a
+    shared cache is configured, in ``graph_service.ownership_decisions``.
+
+    Use ``@require_owner(strict=True)`` on destructive endpoints: with
+    ``OWNERSHIP_STRICT_DESTRUCTIVE`` the check then always goes to live
+    Graph, never to a cached decision, the directory mirror or the
+    ownership index.
 
     Example stacking order::
 
@@ -114,33 +123,33 @@ def require_owner(
     Raises:
         NotOwnerError: if the user is not listed as an owner of the SPN.
     """
+    if fn is None:
+        return functools.partial(require_owner, strict=strict)
 
     @functools.wraps(fn)
     async def wrapper(req: func.HttpRequest) -> func.HttpResponse:
-        user_context: dict = getattr(req, "user_context", None)  # type: ignore[assignment]
-        if user_context is None:
-            raise UnauthorizedError("Authentication context missing — apply @require_auth first.")
+        context = request_context()
 
         spn_id = req.route_params.get("spn_id")
         if not spn_id:
             raise UnauthorizedError("Missing spn_id route parameter.")
 
-        user_oid = user_context["oid"]
+        user_oid = context.oid
 
         # Import here to avoid circular import at module load time
+        from services.directory_mirror_service import directory_mirror_service
         from services.graph_service import graph_service
 
-        owners = await graph_service.list_owners(spn_id)
-        owner_oids = {owner.get("id") for owner in owners}
-
-        if user_oid not in owner_oids:
-            logger.warning(
-                "User %s is not an owner of SPN %s. Owners: %s",
-                user_oid,
-                spn_id,
-                owner_oids,
-            )
-            raise NotOwnerError()
+        strict_check = strict and settings.OWNERSHIP_STRICT_DESTRUCTIVE
+        decisions = graph_service.ownership_decisions
+        decision_key = f"{spn_id}:{user_oid}"
+        if strict_check or not await decisions.get(decision_key):
+            if not await directory_mirror_service.is_owner(
+                spn_id, user_oid, load_owners=context.owners, strict=strict_check
+            ):
+                logger.warning("User %s is not an owner of SPN %s.", user_oid, spn_id)
+                raise NotOwnerError()
+            await decisions.set(decision_key, True)
 
         return await fn(req)
 
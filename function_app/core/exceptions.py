@@ -65,5 +65,23 @@ class OwnerNotFoundError(PortalError):
 
 
 class GraphApiError(PortalError):
-    def __init__(self, message: str = "Microsoft Graph API returned an error."):
+    def __init__(self, message: str = "Microsoft Graph API returned an error.", upstream_status: int | None = None):
         super().__init__("GRAPH_API_ERROR", message, 502)
+        self.upstream_status = upstream_status
+
+
+class GraphUnavailableError(GraphApiError):
+    def __init__(self, message: str = "Microsoft Graph is temporarily unavailable. Please retry shortly."):
+        super().__init__(message)
+        self.code = "GRAPH_UNAVAILABLE"
+        self.status_code = 503
+
+
+class DependencyBusyError(PortalError):
+    def __init__(self, dependency: str):
+        super().__init__(
+            "DEPENDENCY_BUSY",
+            "The service is busy. Please retry shortly.",
+            503,
+        )
+        self.dependency = dependency
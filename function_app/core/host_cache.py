@@ -0,0 +1,301 @@
+"""Host cache: memory-mapped slot tables shared by the worker processes on one machine.
+
+With ``FUNCTIONS_WORKER_PROCESS_COUNT > 1`` every Python worker would
+otherwise download the JWKS, check group membership and acquire Graph
+tokens on its own.  A ``HostCache`` is a file in ``HOST_CACHE_DIR`` mapped
+into every worker: a fixed number of fixed-size slots, each holding one
+JSON value with an absolute expiry.
+
+* Keys map to a slot by hash (direct-mapped; a colliding key simply
+  replaces the previous one).
+* Reads take no lock.  Each slot carries a sequence number that is odd
+  while a write is in progress (a seqlock); a reader retries or misses
+  when it changes under it.
+* Writes to a slot are serialised across processes with a non-blocking
+  ``fcntl`` record lock on the slot's bytes; a busy slot skips the write.
+* ``get_or_load`` makes one worker per host the refresher of a key: it
+  holds a lock on a byte past the end of the file while loading, and the
+  other workers poll the slot until it is filled.  Record locks are
+  released by the kernel if the worker dies.
+
+Record locks are per process, so callers single-flight within a process
+themselves (as ``core.auth`` and ``TokenService`` already do).  The cache
+is disabled where ``fcntl`` is unavailable or the file cannot be opened.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from core import json_codec
+from core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the host cache is disabled there
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# Slot header: sequence number, expiry (epoch seconds), payload length, key digest
+_HEADER = struct.Struct("<QdI16s")
+_SEQ = struct.Struct("<Q")
+_READ_ATTEMPTS = 3
+_POLL_SECONDS = 0.02
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+class HostCache:
+    """A table of *slots* slots of *slot_bytes* bytes in ``{HOST_CACHE_DIR}/spn-portal-{name}-...``.
+
+    Values are JSON-serialisable; a value whose encoding does not fit in a
+    slot is not cached.  The file name includes the geometry, so workers
+    configured differently never share a layout.
+    """
+
+    def __init__(self, name: str, slots: int, slot_bytes: int, directory: str | None = None) -> None:
+        self.name = name
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.path = os.path.join(directory or settings.HOST_CACHE_DIR, f"spn-portal-{name}-{slots}x{slot_bytes}.cache")
+        self._size = slots * slot_bytes
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._failed = False
+        self.hits = 0
+        self.misses = 0
+        self.torn_reads = 0
+        self.writes = 0
+        self.write_conflicts = 0
+        self.oversize = 0
+        self.leads = 0
+        self.follows = 0
+
+    # ------------------------------------------------------------------
+    # Mapping
+    # ------------------------------------------------------------------
+
+    def _mapped(self) -> mmap.mmap | None:
+        if self._map is not None or self._failed:
+            return self._map
+        if fcntl is None or self.slots <= 0 or self.slot_bytes <= _HEADER.size:
+            self._failed = True
+            return None
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                info = os.fstat(fd)
+                if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                    raise PermissionError(f"{self.path} is not private to this user")
+                if info.st_size < self._size:
+                    # Growing with zeros is idempotent: every worker may do it
+                    os.ftruncate(fd, self._size)
+                self._map = mmap.mmap(fd, self._size)
+            except BaseException:
+                os.close(fd)
+                raise
+        except OSError as exc:
+            logger.warning("Host cache %s disabled: %s", self.name, exc)
+            self._failed = True
+            return None
+        self._fd = fd
+        return self._map
+
+    @property
+    def enabled(self) -> bool:
+        return settings.HOST_CACHE_ENABLED and self._mapped() is not None
+
+    def close(self) -> None:
+        """Unmap the table (its contents stay in the file for the other workers)."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _offset(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], "little") % self.slots * self.slot_bytes
+
+    def _try_lock(self, start: int, length: int) -> bool:
+        assert fcntl is not None and self._fd is not None
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, length, start)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(self, start: int, length: int) -> None:
+        assert fcntl is not None and self._fd is not None
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    # ------------------------------------------------------------------
+    # Reads and writes
+    # ------------------------------------------------------------------
+
+    def get(self, key: str) -> Any | None:
+        """Return the unexpired value for *key*, or ``None``."""
+        if not settings.HOST_CACHE_ENABLED:
+            return None
+        table = self._mapped()
+        if table is None:
+            return None
+        digest = _digest(key)
+        offset = self._offset(digest)
+        for _ in range(_READ_ATTEMPTS):
+            seq, expires_at, length, slot_digest = _HEADER.unpack_from(table, offset)
+            if seq & 1:
+                self.torn_reads += 1
+                continue
+            if slot_digest != digest or expires_at <= time.time() or length > self.slot_bytes - _HEADER.size:
+                break
+            payload = table[offset + _HEADER.size : offset + _HEADER.size + length]
+            if _SEQ.unpack_from(table, offset)[0] != seq:
+                self.torn_reads += 1
+                continue
+            self.hits += 1
+            return json_codec.loads(payload)
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Store *value* for *ttl_seconds*; ``False`` if it was not written.
+
+        Skipped when the slot is being written by another worker or the
+        encoded value does not fit.
+        """
+        if not settings.HOST_CACHE_ENABLED or ttl_seconds <= 0:
+            return False
+        return self._write(key, json.dumps(value, separators=(",", ":")).encode(), time.time() + ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        """Expire *key* for every worker on the host."""
+        if settings.HOST_CACHE_ENABLED:
+            self._write(key, b"", 0.0, only_if_present=True)
+
+    def _write(self, key: str, payload: bytes, expires_at: float, *, only_if_present: bool = False) -> bool:
+        table = self._mapped()
+        if table is None:
+            return False
+        if len(payload) > self.slot_bytes - _HEADER.size:
+            self.oversize += 1
+            return False
+        digest = _digest(key)
+        offset = self._offset(digest)
+        if not self._try_lock(offset, self.slot_bytes):
+            self.write_conflicts += 1
+            return False
+        try:
+            seq, _, _, slot_digest = _HEADER.unpack_from(table, offset)
+            if only_if_present and slot_digest != digest:
+                return False
+            # An odd sequence number left by a worker that died mid-write is reused
+            begin = seq if seq & 1 else seq + 1
+            _SEQ.pack_into(table, offset, begin)
+            table[offset + _HEADER.size : offset + _HEADER.size + len(payload)] = payload
+            _HEADER.pack_into(table, offset, begin, expires_at, len(payload), digest)
+            _SEQ.pack_into(table, offset, begin + 1)
+            self.writes += 1
+            return True
+        finally:
+            self._unlock(offset, self.slot_bytes)
+
+    async def get_or_load(self, key: str, load: Callable[[], Awaitable[tuple[Any, float]]]) -> Any:
+        """Return *key* from the table, loading it in at most one worker per host.
+
+        *load* returns ``(value, ttl_seconds)``.  The worker that takes the
+        key's refresh lock calls it and stores the result; the others poll
+        the slot for up to ``HOST_CACHE_LEAD_WAIT_SECONDS`` and then load
+        for themselves.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        if not self.enabled:
+            value, _ = await load()
+            return value
+
+        # Refresh locks live past the end of the file, one byte per slot
+        lead = self._size + self._offset(_digest(key)) // self.slot_bytes
+        deadline = time.monotonic() + settings.HOST_CACHE_LEAD_WAIT_SECONDS
+        followed = False
+        while True:
+            if self._try_lock(lead, 1):
+                try:
+                    # The previous refresher may have finished meanwhile
+                    value = self.get(key)
+                    if value is not None:
+                        return value
+                    self.leads += 1
+                    value, ttl = await load()
+                    self.set(key, value, ttl)
+                    return value
+                finally:
+                    self._unlock(lead, 1)
+            if not followed:
+                followed = True
+                self.follows += 1
+            if time.monotonic() >= deadline:
+                value, ttl = await load()
+                self.set(key, value, ttl)
+                return value
+            await asyncio.sleep(_POLL_SECONDS)
+            value = self.get(key)
+            if value is not None:
+                return value
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss, write and refresh-coordination counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tornReads": self.torn_reads,
+            "writes": self.writes,
+            "writeConflicts": self.write_conflicts,
+            "oversize": self.oversize,
+            "leads": self.leads,
+            "follows": self.follows,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Tables
+# ---------------------------------------------------------------------------
+
+_tables: dict[str, HostCache] = {}
+
+
+def _geometry(name: str) -> tuple[int, int]:
+    if name == "jwks":
+        # One Entra JWKS with x5c certificate chains
+        return 1, 64 * 1024
+    if name == "tokens":
+        # Access tokens per scope set
+        return 16, 8 * 1024
+    if name == "membership":
+        # A boolean decision per user
+        return settings.HOST_CACHE_MEMBERSHIP_SLOTS, 128
+    raise KeyError(name)
+
+
+def host_cache(name: str) -> HostCache:
+    """Return the host cache table *name* (``jwks``, ``membership`` or ``tokens``)."""
+    table = _tables.get(name)
+    if table is None:
+        table = _tables[name] = HostCache(name, *_geometry(name))
+    return table
+
+
+def host_cache_stats() -> dict[str, dict[str, float]]:
+    """Return the counters of every table opened by this worker."""
+    return {name: table.stats() for name, table in _tables.items()}
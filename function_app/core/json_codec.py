@@ -0,0 +1,89 @@
+"""JSON decoding for downstream responses.
+
+``loads`` uses ``orjson`` when it is installed and falls back to the
+standard library.  ``PageDecoder`` decodes a Graph collection page
+incrementally with ``ijson`` (when installed), keeping only the requested
+fields of each ``value[]`` item, so large pages never exist as full
+Python objects.
+"""
+
+import json
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import ijson
+except ImportError:  # optional; streaming decode is disabled without it
+    ijson = None  # type: ignore[assignment]
+
+BACKEND = "orjson" if orjson is not None else "json"
+STREAMING_AVAILABLE = ijson is not None
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse a JSON document with the fastest available backend."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class PageDecoder:
+    """Incrementally decode a Graph collection page.
+
+    Feed raw body chunks with ``feed`` as they arrive and call ``close`` at
+    the end.  Items of the top-level ``value`` array are collected in
+    ``items`` with only *fields* kept; everything else inside an item is
+    skipped without being built.  Top-level ``@odata.*`` annotations (e.g.
+    ``@odata.nextLink``) are collected in ``annotations``.
+    """
+
+    def __init__(self, fields: Iterable[str]) -> None:
+        if ijson is None:
+            raise RuntimeError("Streaming JSON decode requires the 'ijson' package.")
+        self._fields = frozenset(fields)
+        self._events = ijson.sendable_list()
+        self._coro = ijson.parse_coro(self._events, use_float=True)
+        self._builder: Any = None
+        self._keep = False
+        self.items: list[dict] = []
+        self.annotations: dict[str, Any] = {}
+
+    def feed(self, chunk: bytes) -> None:
+        self._coro.send(chunk)
+        self._drain()
+
+    def close(self) -> None:
+        self._coro.close()
+        self._drain()
+
+    def page(self) -> dict:
+        """Return the decoded page in the shape of a ``resp.json()`` result."""
+        return {"value": self.items, **self.annotations}
+
+    def _drain(self) -> None:
+        assert ijson is not None  # checked in __init__
+        for prefix, event, value in self._events:
+            builder: Any = self._builder
+            if prefix == "value.item":
+                if event == "start_map":
+                    builder = self._builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                elif event == "end_map":
+                    builder.event(event, value)
+                    self.items.append(builder.value)
+                    self._builder = None
+                elif event == "map_key":
+                    self._keep = value in self._fields
+                    if self._keep:
+                        builder.event(event, value)
+            elif builder is not None:
+                if self._keep:
+                    builder.event(event, value)
+            elif prefix.startswith("@odata.") and event in ("string", "number"):
+                self.annotations[prefix] = value
+        del self._events[:]
@@ -0,0 +1,128 @@
+"""Per-request context: the authenticated user and a memo of downstream reads."""
+
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+from core.exceptions import UnauthorizedError
+
+T = TypeVar("T")
+
+
+class RequestContext:
+    """State for one HTTP invocation, set by ``@require_auth``.
+
+    ``user`` is the ``user_context`` dict (``oid``, ``displayName``,
+    ``email``).  ``owners`` and ``application`` memoise the Graph reads that
+    decorators and handlers both need, so each is fetched at most once per
+    request; ``memo_hits`` counts the downstream calls saved that way.
+    Reads made with ``allow_stale`` (for rendering only) are memoised apart:
+    they may reuse a strict read, never the other way round.
+    Writes made by the handler are not reflected: re-read through
+    ``graph_service`` after a mutation if the new state is needed.
+    """
+
+    def __init__(self, user: dict) -> None:
+        self.user = user
+        self.memo_hits = 0
+        self._memo: dict[tuple, Any] = {}
+
+    @property
+    def oid(self) -> str:
+        return self.user["oid"]
+
+    async def memoize(self, key: tuple, load: Callable[[], Awaitable[T]]) -> T:
+        """Return the memoised result for *key*, calling *load* on first use."""
+        if key in self._memo:
+            self.memo_hits += 1
+            return self._memo[key]
+        value = await load()
+        self._memo[key] = value
+        return value
+
+    async def _memoize_read(self, key: tuple, load: Callable[[], Awaitable[T]], allow_stale: bool) -> T:
+        if allow_stale and key in self._memo:
+            self.memo_hits += 1
+            return self._memo[key]
+        return await self.memoize((*key, "stale") if allow_stale else key, load)
+
+    async def owners(self, spn_id: str, *, fresh: bool = False, allow_stale: bool = False) -> list[dict]:
+        """Owners of the application *spn_id* (``graph_service.list_owners``).
+
+        With *fresh* the service cache is bypassed; the live list is read
+        once per request (a strict ``@require_owner`` check and the handler
+        share it) and replaces the memoised one.
+        """
+        # Import here to avoid circular import at module load time
+        from services.graph_service import graph_service
+
+        if fresh:
+            owners = await self.memoize(
+                ("owners", spn_id, "fresh"), lambda: graph_service.list_owners(spn_id, fresh=True)
+            )
+            self._memo[("owners", spn_id)] = owners
+            return owners
+        return await self._memoize_read(
+            ("owners", spn_id), lambda: graph_service.list_owners(spn_id, allow_stale=allow_stale), allow_stale
+        )
+
+    async def application(self, spn_id: str, *, fresh: bool = False, allow_stale: bool = False) -> dict:
+        """The application *spn_id* (``graph_service.get_application``).
+
+        With *fresh* the memo and the service cache are bypassed; the fresh
+        copy then replaces the memoised one.
+        """
+        # Import here to avoid circular import at module load time
+        from services.graph_service import graph_service
+
+        if fresh:
+            app = await graph_service.get_application(spn_id, fresh=True)
+            self._memo[("application", spn_id)] = app
+            return app
+        return await self._memoize_read(
+            ("application", spn_id),
+            lambda: graph_service.get_application(spn_id, allow_stale=allow_stale),
+            allow_stale,
+        )
+
+    async def application_with_owners(self, spn_id: str, *, allow_stale: bool = False) -> tuple[dict, list[dict]]:
+        """The application and its owners, in one ``$batch`` unless one is already memoised."""
+        # Import here to avoid circular import at module load time
+        from services.graph_service import graph_service
+
+        suffix = ("stale",) if allow_stale else ()
+        keys = [("owners", spn_id), ("application", spn_id)]
+        if any(key in self._memo or (*key, *suffix) in self._memo for key in keys):
+            return (
+                await self.application(spn_id, allow_stale=allow_stale),
+                await self.owners(spn_id, allow_stale=allow_stale),
+            )
+        app, owners = await graph_service.get_application_with_owners(spn_id, allow_stale=allow_stale)
+        self._memo[("application", spn_id, *suffix)] = app
+        self._memo[("owners", spn_id, *suffix)] = owners
+        return app, owners
+
+
+_current: ContextVar[RequestContext | None] = ContextVar("request_context", default=None)
+
+
+def request_context() -> RequestContext:
+    """Return the context of the current request.
+
+    Raises ``UnauthorizedError`` outside a ``@require_auth`` endpoint.
+    """
+    context = _current.get()
+    if context is None:
+        raise UnauthorizedError("Authentication context missing — apply @require_auth first.")
+    return context
+
+
+@contextmanager
+def use_request_context(context: RequestContext) -> Iterator[RequestContext]:
+    """Make *context* the current request context for the enclosed block."""
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
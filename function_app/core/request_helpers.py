@@ -8,12 +8,15 @@ import azure.functions as func
 from pydantic import BaseModel
 from pydantic import ValidationError as PydanticValidationError
 
+from core.cache import stale_age
 from core.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T", bound=BaseModel)
 
+STALE_HEADER = "X-Data-Stale-Seconds"
+
 
 def parse_request_body(req: func.HttpRequest, model_class: type[T]) -> T:
     """Parse the request body as JSON and validate against a Pydantic model.
@@ -45,11 +48,15 @@ def json_response(
     """Serialize *data* to a JSON ``HttpResponse``.
 
     Accepts a Pydantic model (serialized with aliases) or a plain dict/list.
+    Responses built from last-known-good data (served while Graph is
+    unavailable) carry ``X-Data-Stale-Seconds`` with the age of that data.
     """
     body = data.model_dump(mode="json", by_alias=True) if isinstance(data, BaseModel) else data
 
+    age = stale_age()
     return func.HttpResponse(
         body=json.dumps(body),
         status_code=status_code,
         mimetype="application/json",
+        headers={STALE_HEADER: str(int(age))} if age is not None else None,
     )
@@ -0,0 +1,352 @@
+"""Retry, client-side rate-limiting, circuit-breaking and bulkhead primitives for downstream calls."""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import Callable
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+
+from core.exceptions import DependencyBusyError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+# ---------------------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------------------
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a ``Retry-After`` header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decide whether and how long to wait before retrying a failed call.
+
+    ``Retry-After`` is honoured when present (up to ``max_retry_after``);
+    otherwise the delay is "full jitter" exponential backoff:
+    ``uniform(0, min(max_delay, base_delay * 2**attempt))``.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0,
+    ) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """Jittered exponential backoff for the given zero-based *attempt*."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+    def delay_for(self, attempt: int, retry_after: str | None = None) -> float | None:
+        """Return the delay before retry number *attempt*, or ``None`` to give up."""
+        if attempt >= self.max_retries:
+            return None
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            if server_delay > self.max_retry_after:
+                return None
+            return server_delay
+        return self.backoff(attempt)
+
+
+# ---------------------------------------------------------------------------
+# Adaptive token bucket
+# ---------------------------------------------------------------------------
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate adapts to observed throttling (AIMD).
+
+    Every call takes one token.  A throttled response halves the rate (down
+    to ``min_rate``) and, when the server sent ``Retry-After``, pauses the
+    bucket until then; each successful response adds ``increase_step``
+    back, up to ``max_rate``.  The app therefore slows down as soon as the
+    downstream starts throttling and creeps back up once it stops.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        burst: int | None = None,
+        min_rate: float = 1.0,
+        increase_step: float = 0.5,
+    ) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.increase_step = increase_step
+        self.capacity = float(burst if burst is not None else max(1, int(max_rate)))
+        self.rate = max_rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.throttled_count = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = (1 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+        if waited:
+            self.wait_count += 1
+            self.wait_seconds_total += waited
+
+    def on_success(self) -> None:
+        """Additive increase after a non-throttled response."""
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttled(self, retry_after: float | None = None) -> None:
+        """Multiplicative decrease after a throttled response."""
+        self.throttled_count += 1
+        self._refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        logger.warning("Downstream throttling observed; rate limit lowered to %.1f req/s", self.rate)
+
+    def stats(self) -> dict[str, float]:
+        """Return the current rate and throttling/wait counters."""
+        return {
+            "rate": self.rate,
+            "throttled": self.throttled_count,
+            "waits": self.wait_count,
+            "waitSecondsTotal": self.wait_seconds_total,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+
+class CircuitBreaker:
+    """Fail fast while a downstream is unhealthy.
+
+    Closed: calls flow and outcomes are recorded over a rolling
+    ``window_seconds``; once at least ``min_calls`` were seen and the failure
+    ratio reaches ``failure_rate`` the breaker opens.  Open: calls are
+    rejected for ``open_seconds``.  Half-open: one probe call is let through
+    (another one after ``open_seconds`` if it never reports back); its
+    success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 30.0,
+        open_seconds: float = 15.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_started_at: float | None = None
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.open_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Return ``True`` if a call may be attempted now."""
+        state = self.state
+        if state == "closed":
+            return True
+        now = self._clock()
+        if state == "half_open" and (
+            self._probe_started_at is None or now - self._probe_started_at >= self.open_seconds
+        ):
+            self._probe_started_at = now
+            return True
+        self.rejected_count += 1
+        return False
+
+    def record_success(self) -> None:
+        state = self.state
+        if state == "half_open":
+            logger.info("Circuit %s closed after a successful probe", self.name)
+            self._reset()
+        elif state == "closed":
+            self._record(False)
+
+    def record_failure(self) -> None:
+        state = self.state
+        if state == "half_open":
+            self._open()
+        elif state == "closed":
+            self._record(True)
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._open()
+
+    def _record(self, failed: bool) -> None:
+        now = self._clock()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+            _, old_failed = self._outcomes.popleft()
+            self._failures -= old_failed
+
+    def _open(self) -> None:
+        self._opened_at = self._clock()
+        self._probe_started_at = None
+        self._outcomes.clear()
+        self._failures = 0
+        self.opened_count += 1
+        logger.warning("Circuit %s opened; failing fast for %.0fs", self.name, self.open_seconds)
+
+    def _reset(self) -> None:
+        self._opened_at = None
+        self._probe_started_at = None
+        self._outcomes.clear()
+        self._failures = 0
+
+    def stats(self) -> dict[str, float | str]:
+        """Return the current state and open/reject counters."""
+        return {
+            "state": self.state,
+            "opened": self.opened_count,
+            "rejected": self.rejected_count,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Bulkhead
+# ---------------------------------------------------------------------------
+
+
+class Bulkhead:
+    """Cap the number of concurrent calls to one downstream.
+
+    Used as ``async with bulkhead:`` around each call.  When all
+    ``max_concurrent`` slots are taken, callers queue for at most
+    ``max_wait_seconds`` and then fail with ``DependencyBusyError``, so a
+    slow dependency cannot pile up coroutines that starve the others.  A
+    bulkhead built with ``max_concurrent <= 0`` is disabled.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_wait_seconds: float) -> None:
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquired_count = 0
+        self.queued_count = 0
+        self.rejected_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    async def __aenter__(self) -> "Bulkhead":
+        if not self.enabled:
+            return self
+        if self._semaphore.locked():
+            await self._wait_for_slot()
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.acquired_count += 1
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self.enabled:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def _wait_for_slot(self) -> None:
+        self.waiting += 1
+        self.queued_count += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected_count += 1
+            logger.warning("Bulkhead %s full; rejected after waiting %.1fs", self.name, self.max_wait_seconds)
+            raise DependencyBusyError(self.name) from None
+        finally:
+            self.waiting -= 1
+            waited = time.monotonic() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self) -> dict[str, float]:
+        """Return current occupancy/queue depth and wait counters."""
+        return {
+            "maxConcurrent": self.max_concurrent,
+            "active": self.active,
+            "waiting": self.waiting,
+            "maxWaiting": self.max_waiting,
+            "acquired": self.acquired_count,
+            "queued": self.queued_count,
+            "rejected": self.rejected_count,
+            "waitSecondsTotal": self.wait_seconds_total,
+            "waitSecondsMax": self.wait_seconds_max,
+        }
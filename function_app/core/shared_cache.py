@@ -0,0 +1,344 @@
+"""Two-level caching: an in-process ``TTLCache`` (L1) in front of a cache shared by all instances (L2).
+
+Scale-out instances and worker processes each start with an empty L1; the
+shared L2 lets them pick up membership and ownership decisions
+another instance already made instead of asking Entra / Graph again.
+Worker processes on the same machine can additionally share a
+``core.host_cache`` table in between.
+
+Backends (``SHARED_CACHE_BACKEND``):
+
+* ``"none"`` - L1 only (default),
+* ``"cosmos"`` - documents in the ``shared-cache`` container, expired by
+  Cosmos per-item TTL,
+* ``"redis"`` - a Redis server (``SHARED_CACHE_REDIS_URL``, ``rediss://``
+  for TLS) through ``redis.asyncio``; invalidations are broadcast over
+  pub/sub so other instances drop their L1 copy at once.
+
+Without broadcast (Cosmos) an invalidated entry can survive in other
+instances' L1 until it expires, so keep the TTLs of namespaces that are
+invalidated short.  L2 is best-effort: errors and timeouts count as a
+miss and never fail the request.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Callable
+from typing import Any, Generic, Protocol, TypeVar
+
+import redis.asyncio as redis
+
+from core.cache import TTLCache
+from core.config import settings
+from core.host_cache import HostCache
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+_INVALIDATION_CHANNEL = "spn-portal:cache-invalidation"
+
+
+class SharedCacheBackend(Protocol):
+    """Storage for L2 entries; values are JSON-serialisable."""
+
+    supports_broadcast: bool
+
+    async def get(self, key: str) -> Any | None: ...
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+    async def publish(self, message: str) -> None: ...
+
+    def subscribe(self, callback: Callable[[str], None]) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+# ---------------------------------------------------------------------------
+# Cosmos DB backend
+# ---------------------------------------------------------------------------
+
+
+class CosmosSharedCache:
+    """L2 in the Cosmos ``shared-cache`` container (no invalidation broadcast)."""
+
+    supports_broadcast = False
+
+    @staticmethod
+    def _id(key: str) -> str:
+        # Hashed so any key is a valid Cosmos id
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    async def get(self, key: str) -> Any | None:
+        # Import here to avoid circular import at module load time
+        from services.cosmos_service import cosmos_service
+
+        item = await cosmos_service.get_shared_cache_item(self._id(key))
+        if item is None or item.get("expiresAt", 0) <= time.time():
+            return None
+        return item["value"]
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        from services.cosmos_service import cosmos_service
+
+        await cosmos_service.upsert_shared_cache_item(
+            {"id": self._id(key), "key": key, "value": value, "expiresAt": time.time() + ttl_seconds},
+            ttl_seconds,
+        )
+
+    async def delete(self, key: str) -> None:
+        from services.cosmos_service import cosmos_service
+
+        await cosmos_service.delete_shared_cache_item(self._id(key))
+
+    async def publish(self, message: str) -> None:
+        return None
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        return None
+
+    async def aclose(self) -> None:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Redis-protocol backend
+# ---------------------------------------------------------------------------
+
+
+class RedisSharedCache:
+    """L2 on Redis through ``redis.asyncio``, with pub/sub invalidation broadcast.
+
+    Commands share the client's connection pool, which reconnects on
+    failure; a listener task, started on the first ``subscribe``, receives
+    invalidations on its own pub/sub connection and resubscribes after a
+    short back-off when it drops.
+    """
+
+    supports_broadcast = True
+
+    def __init__(self, url: str) -> None:
+        # RESP2: newer redis-py defaults to RESP3, whose HELLO older servers do not know
+        self._client = redis.Redis.from_url(url, protocol=2)
+        self._callbacks: list[Callable[[str], None]] = []
+        self._listener: asyncio.Task[None] | None = None
+
+    async def get(self, key: str) -> Any | None:
+        raw = await self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        await self._client.set(key, json.dumps(value), px=max(1, int(ttl_seconds * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def publish(self, message: str) -> None:
+        await self._client.publish(_INVALIDATION_CHANNEL, message)
+
+    def subscribe(self, callback: Callable[[str], None]) -> None:
+        self._callbacks.append(callback)
+        if self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(_INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        data = message["data"]
+                        for callback in self._callbacks:
+                            callback(data.decode() if isinstance(data, bytes) else data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Shared cache invalidation listener disconnected: %s", exc)
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(1.0)
+
+    async def aclose(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        await self._client.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Backend selection
+# ---------------------------------------------------------------------------
+
+_backend: SharedCacheBackend | None = None
+# SHARED_CACHE_BACKEND value that could not be used; not tried again
+_rejected_kind: str | None = None
+
+
+def shared_cache_backend() -> SharedCacheBackend | None:
+    """Return the configured L2 backend (created on first use), or ``None``.
+
+    A misconfigured backend (unknown kind, bad ``SHARED_CACHE_REDIS_URL``)
+    is logged once and leaves the caches L1-only instead of failing requests.
+    """
+    global _backend, _rejected_kind
+    kind = settings.SHARED_CACHE_BACKEND
+    if _backend is None and kind not in ("none", _rejected_kind):
+        try:
+            if kind == "cosmos":
+                _backend = CosmosSharedCache()
+            elif kind == "redis":
+                _backend = RedisSharedCache(settings.SHARED_CACHE_REDIS_URL)
+            else:
+                raise ValueError("unknown backend")
+        except Exception as exc:
+            _rejected_kind = kind
+            logger.error("Cannot use SHARED_CACHE_BACKEND %r (%s); using in-process caches only", kind, exc)
+    return _backend
+
+
+# ---------------------------------------------------------------------------
+# Two-level cache
+# ---------------------------------------------------------------------------
+
+
+class TwoLevelCache(Generic[V]):
+    """An L1 ``TTLCache`` backed by the shared L2 under *namespace*.
+
+    With *host*, a ``HostCache`` table shared by the worker processes on
+    this machine sits between L1 and L2.
+
+    ``get`` tries L1, then the host table and L2 (copying a hit into the
+    faster levels for the rest of its lifetime); ``set`` writes all levels;
+    ``invalidate`` drops the key from both and broadcasts it so other
+    instances drop their L1 copy.  Callers that manage L1 themselves (e.g.
+    to serve stale entries) use ``l1`` directly and ``get_shared`` to
+    consult only L2.
+
+    *backend* defaults to ``shared_cache_backend()``, resolved on first
+    use.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        l1: TTLCache[str, V],
+        backend: SharedCacheBackend | None = None,
+        host: HostCache | None = None,
+    ) -> None:
+        self.namespace = namespace
+        self.l1 = l1
+        self.host = host
+        self._backend = backend
+        self._subscribed = False
+        self.host_hits = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+
+    @property
+    def backend(self) -> SharedCacheBackend | None:
+        return self._backend if self._backend is not None else shared_cache_backend()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _call(self, operation: str, call: Callable[[SharedCacheBackend], Any]) -> Any:
+        backend = self.backend
+        if backend is None:
+            return None
+        if not self._subscribed and backend.supports_broadcast:
+            self._subscribed = True
+            backend.subscribe(self._on_invalidation)
+        try:
+            return await asyncio.wait_for(call(backend), settings.SHARED_CACHE_TIMEOUT_SECONDS)
+        except Exception as exc:
+            self.l2_errors += 1
+            logger.warning("Shared cache %s of %s failed: %s", operation, self.namespace, exc or type(exc).__name__)
+            return None
+
+    async def get(self, key: str) -> V | None:
+        """Return the value for *key* from L1, else from L2, or ``None``."""
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        return await self.get_shared(key)
+
+    async def get_shared(self, key: str) -> V | None:
+        """Return the value for *key* from the host table or L2, skipping L1."""
+        if not self.l1.enabled:
+            return None
+        if self.host is not None:
+            entry = self.host.get(key)
+            if entry is not None:
+                self.host_hits += 1
+                self.l1.set(key, entry["value"], ttl_seconds=entry["expiresAt"] - time.time())
+                return entry["value"]
+        if self.backend is None:
+            return None
+        shared: dict | None = await self._call("read", lambda b: b.get(self._key(key)))
+        ttl = shared["expiresAt"] - time.time() if shared is not None else 0
+        if shared is None or ttl <= 0:
+            self.l2_misses += 1
+            return None
+        self.l2_hits += 1
+        self.l1.set(key, shared["value"], ttl_seconds=ttl)
+        if self.host is not None:
+            self.host.set(key, shared, ttl)
+        return shared["value"]
+
+    async def set(self, key: str, value: V, *, ttl_seconds: float | None = None) -> None:
+        """Store *value* in L1 and L2 (neither when L1 is disabled)."""
+        if not self.l1.enabled:
+            return
+        ttl = self.l1.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.l1.set(key, value, ttl_seconds=ttl)
+        entry = {"value": value, "expiresAt": time.time() + ttl}
+        if self.host is not None:
+            self.host.set(key, entry, ttl)
+        await self._call("write", lambda b: b.set(self._key(key), entry, ttl))
+
+    async def invalidate(self, key: str) -> None:
+        """Drop *key* here, on this host and in L2, and tell the other instances to drop it."""
+        self.l1.invalidate(key)
+        if self.host is not None:
+            self.host.delete(key)
+        backend = self.backend
+        if backend is None:
+            return
+        await self._call("delete", lambda b: b.delete(self._key(key)))
+        if backend.supports_broadcast:
+            self.invalidations_sent += 1
+            await self._call("broadcast", lambda b: b.publish(self._key(key)))
+
+    def _on_invalidation(self, message: str) -> None:
+        namespace, _, key = message.partition(":")
+        if namespace != self.namespace:
+            return
+        self.invalidations_received += 1
+        self.l1.invalidate(key)
+        if self.host is not None:
+            self.host.delete(key)
+
+    def stats(self) -> dict[str, float]:
+        """Return L1 counters plus host, L2 hit/miss/error and invalidation counters."""
+        return {
+            **self.l1.stats(),
+            "hostHits": self.host_hits,
+            "l2Hits": self.l2_hits,
+            "l2Misses": self.l2_misses,
+            "l2Errors": self.l2_errors,
+            "invalidationsSent": self.invalidations_sent,
+            "invalidationsReceived": self.invalidations_received,
+        }
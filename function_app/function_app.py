@@ -4,6 +4,10 @@ from blueprints.health_blueprint import health_bp
 from blueprints.owner_blueprint import owner_bp
 from blueprints.secret_blueprint import secret_bp
 from blueprints.spn_blueprint import spn_bp
+from blueprints.sync_blueprint import sync_bp
+from services.telemetry_service import telemetry_service
+
+telemetry_service.configure()
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
@@ -11,3 +15,4 @@ app.register_functions(health_bp)
 app.register_functions(spn_bp)
 app.register_functions(secret_bp)
 app.register_functions(owner_bp)
+app.register_functions(sync_bp)
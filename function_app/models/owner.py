@@ -2,6 +2,9 @@
 
 from pydantic import BaseModel, ConfigDict, Field
 
+# Directory object properties read to build an OwnerResponse ($select projection)
+OWNER_GRAPH_SELECT = "id,displayName,mail,userPrincipalName"
+
 
 class AddOwnerRequest(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
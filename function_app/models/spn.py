@@ -2,6 +2,14 @@
 
 from pydantic import BaseModel, ConfigDict, Field
 
+# Graph application properties read to build an SpnResponse; requested with
+# $select so Graph omits keyCredentials, requiredResourceAccess, api, web, ...
+SPN_GRAPH_FIELDS = ("id", "appId", "displayName", "description", "createdDateTime", "passwordCredentials", "tags")
+SPN_GRAPH_SELECT = ",".join(SPN_GRAPH_FIELDS)
+
+# Service principal properties the portal reads
+SERVICE_PRINCIPAL_GRAPH_SELECT = "id,appId,displayName"
+
 
 class CreateSpnRequest(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
@@ -1,40 +1,84 @@
 """Cosmos DB service for portal metadata and audit events."""
 
+import hashlib
 import logging
+import math
+import time
+import unicodedata
+from collections.abc import AsyncIterator
 from typing import Any
 
+from azure.core import MatchConditions
 from azure.cosmos.aio import ContainerProxy, CosmosClient
-from azure.identity.aio import DefaultAzureCredential
+from azure.cosmos.exceptions import (
+    CosmosAccessConditionFailedError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
 
 from core.config import settings
+from core.resilience import Bulkhead
+from services.token_service import token_service
 
 logger = logging.getLogger(__name__)
 
 _SPN_METADATA_CONTAINER = "spn-metadata"
 _AUDIT_EVENTS_CONTAINER = "audit-events"
+_DIRECTORY_MIRROR_CONTAINER = "directory-mirror"
+_SPN_NAMES_CONTAINER = "spn-names"
+_OWNERSHIP_CONTAINER = "spn-ownership"
+_SHARED_CACHE_CONTAINER = "shared-cache"
+
+# A reservation never bound to an SPN (the create crashed half-way) can be
+# taken over after this long
+_PENDING_RESERVATION_SECONDS = 600
+
+# Mirror document holding the Graph delta link (partition key == id)
+_SYNC_STATE_ID = "_sync_state"
+
+
+def normalize_spn_name(display_name: str) -> str:
+    """Normalise a display name for uniqueness checks (Unicode NFKC, trimmed, case-folded)."""
+    return unicodedata.normalize("NFKC", display_name).strip().casefold()
+
+
+def _name_key(display_name: str) -> str:
+    # Hashed so any character (quotes, '/', '#', ...) is a valid Cosmos id
+    return hashlib.sha256(normalize_spn_name(display_name).encode()).hexdigest()
 
 
 class CosmosService:
-    """Async Cosmos DB client with lazy initialization."""
+    """Async Cosmos DB client with lazy initialization.
+
+    Every container call holds a slot of the Cosmos bulkhead; a query holds
+    it until its results are collected (per page for paged iteration).
+    """
 
     def __init__(self) -> None:
         self._client: CosmosClient | None = None
-        self._credential: DefaultAzureCredential | None = None
         self._spn_container: ContainerProxy | None = None
         self._audit_container: ContainerProxy | None = None
+        self._mirror_container: ContainerProxy | None = None
+        self._names_container: ContainerProxy | None = None
+        self._ownership_container: ContainerProxy | None = None
+        self._shared_cache_container: ContainerProxy | None = None
+        self._bulkhead = Bulkhead("cosmos", settings.COSMOS_MAX_CONCURRENCY, settings.COSMOS_MAX_WAIT_SECONDS)
 
     async def _ensure_initialized(self) -> None:
         if self._client is not None:
             return
 
-        self._credential = DefaultAzureCredential()
         self._client = CosmosClient(
             url=settings.COSMOS_ENDPOINT,
-            credential=self._credential,
+            credential=token_service,
         )
         database = self._client.get_database_client(settings.COSMOS_DATABASE)
         self._spn_container = database.get_container_client(_SPN_METADATA_CONTAINER)
         self._audit_container = database.get_container_client(_AUDIT_EVENTS_CONTAINER)
+        self._mirror_container = database.get_container_client(_DIRECTORY_MIRROR_CONTAINER)
+        self._names_container = database.get_container_client(_SPN_NAMES_CONTAINER)
+        self._ownership_container = database.get_container_client(_OWNERSHIP_CONTAINER)
+        self._shared_cache_container = database.get_container_client(_SHARED_CACHE_CONTAINER)
 
     # ------------------------------------------------------------------
     # SPN metadata (partition key: /spnId)
@@ -50,25 +94,51 @@ class CosmosService:
         assert self._audit_container is not None
         return self._audit_container
 
+    async def _mirror(self) -> ContainerProxy:
+        await self._ensure_initialized()
+        assert self._mirror_container is not None
+        return self._mirror_container
+
+    async def _names(self) -> ContainerProxy:
+        await self._ensure_initialized()
+        assert self._names_container is not None
+        return self._names_container
+
+    async def _ownership(self) -> ContainerProxy:
+        await self._ensure_initialized()
+        assert self._ownership_container is not None
+        return self._ownership_container
+
+    async def _shared_cache(self) -> ContainerProxy:
+        await self._ensure_initialized()
+        assert self._shared_cache_container is not None
+        return self._shared_cache_container
+
     async def upsert_spn_metadata(self, spn_id: str, metadata: dict) -> dict:
         """Create or update portal metadata for an SPN."""
         item = {**metadata, "id": spn_id, "spnId": spn_id}
-        return await (await self._spn()).upsert_item(item)
+        container = await self._spn()
+        async with self._bulkhead:
+            return await container.upsert_item(item)
 
     async def get_spn_metadata(self, spn_id: str) -> dict | None:
         """Get metadata for an SPN. Returns None if not found."""
-        try:
-            return await (await self._spn()).read_item(item=spn_id, partition_key=spn_id)
-        except Exception:
-            logger.debug("SPN metadata not found for %s", spn_id)
-            return None
+        container = await self._spn()
+        async with self._bulkhead:
+            try:
+                return await container.read_item(item=spn_id, partition_key=spn_id)
+            except Exception:
+                logger.debug("SPN metadata not found for %s", spn_id)
+                return None
 
     async def delete_spn_metadata(self, spn_id: str) -> None:
         """Delete metadata for an SPN."""
-        try:
-            await (await self._spn()).delete_item(item=spn_id, partition_key=spn_id)
-        except Exception:
-            logger.debug("SPN metadata not found for deletion: %s", spn_id)
+        container = await self._spn()
+        async with self._bulkhead:
+            try:
+                await container.delete_item(item=spn_id, partition_key=spn_id)
+            except Exception:
+                logger.debug("SPN metadata not found for deletion: %s", spn_id)
 
     async def list_spn_metadata_by_ids(self, spn_ids: list[str]) -> dict[str, dict]:
         """Batch fetch metadata for multiple SPNs. Returns a dict keyed by spnId."""
@@ -79,13 +149,15 @@ class CosmosService:
         params: list[dict[str, Any]] = [{"name": f"@id{i}", "value": sid} for i, sid in enumerate(spn_ids)]
         query = f"SELECT * FROM c WHERE c.spnId IN ({placeholders})"
 
+        container = await self._spn()
         results: dict[str, dict] = {}
-        async for item in (await self._spn()).query_items(
-            query=query,
-            parameters=params,
-            enable_cross_partition_query=True,
-        ):
-            results[item["spnId"]] = item
+        async with self._bulkhead:
+            async for item in container.query_items(
+                query=query,
+                parameters=params,
+                enable_cross_partition_query=True,
+            ):
+                results[item["spnId"]] = item
         return results
 
     # ------------------------------------------------------------------
@@ -94,7 +166,9 @@ class CosmosService:
 
     async def create_audit_event(self, event: dict) -> dict:
         """Write an audit record."""
-        return await (await self._audit()).create_item(event)
+        container = await self._audit()
+        async with self._bulkhead:
+            return await container.create_item(event)
 
     async def list_audit_events(self, spn_id: str, limit: int = 50) -> list[dict]:
         """List recent audit events for an SPN, newest first."""
@@ -103,13 +177,15 @@ class CosmosService:
             {"name": "@spnId", "value": spn_id},
             {"name": "@limit", "value": limit},
         ]
+        container = await self._audit()
         results: list[dict] = []
-        async for item in (await self._audit()).query_items(
-            query=query,
-            parameters=params,
-            partition_key=spn_id,
-        ):
-            results.append(item)
+        async with self._bulkhead:
+            async for item in container.query_items(
+                query=query,
+                parameters=params,
+                partition_key=spn_id,
+            ):
+                results.append(item)
         return results
 
     # ------------------------------------------------------------------
@@ -122,7 +198,9 @@ class CosmosService:
         mappings = metadata.get("keyvaultMappings", {})
         mappings[key_id] = kv_secret_name
         metadata["keyvaultMappings"] = mappings
-        await (await self._spn()).upsert_item(metadata)
+        container = await self._spn()
+        async with self._bulkhead:
+            await container.upsert_item(metadata)
 
     async def remove_keyvault_mapping(self, spn_id: str, key_id: str) -> str | None:
         """Remove a KeyVault mapping and return the secret name, or None."""
@@ -133,8 +211,301 @@ class CosmosService:
         kv_secret_name = mappings.pop(key_id, None)
         if kv_secret_name is not None:
             metadata["keyvaultMappings"] = mappings
-            await (await self._spn()).upsert_item(metadata)
+            container = await self._spn()
+            async with self._bulkhead:
+                await container.upsert_item(metadata)
         return kv_secret_name
 
+    # ------------------------------------------------------------------
+    # SPN name reservations (partition key: /id)
+    # ------------------------------------------------------------------
+
+    async def reserve_spn_name(self, display_name: str, spn_id: str | None = None) -> bool:
+        """Atomically reserve *display_name* for *spn_id*.
+
+        Pass ``spn_id=None`` before the application exists and bind it with
+        ``assign_spn_name`` afterwards.  Returns ``False`` if the name is held
+        by another SPN or by a pending reservation.
+        """
+        container = await self._names()
+        key = _name_key(display_name)
+        item = {
+            "id": key,
+            "name": normalize_spn_name(display_name),
+            "displayName": display_name,
+            "spnId": spn_id,
+            "reservedAt": time.time(),
+        }
+        for _ in range(2):
+            try:
+                async with self._bulkhead:
+                    await container.create_item(item)
+                return True
+            except CosmosResourceExistsError:
+                pass
+            try:
+                async with self._bulkhead:
+                    existing = await container.read_item(item=key, partition_key=key)
+            except CosmosResourceNotFoundError:
+                continue  # released in between; try again
+            if spn_id is not None and existing.get("spnId") == spn_id:
+                return True
+            if (
+                existing.get("spnId") is None
+                and existing.get("reservedAt", 0) < time.time() - _PENDING_RESERVATION_SECONDS
+            ):
+                try:
+                    async with self._bulkhead:
+                        await container.replace_item(
+                            item=key,
+                            body=item,
+                            etag=existing["_etag"],
+                            match_condition=MatchConditions.IfNotModified,
+                        )
+                    return True
+                except CosmosAccessConditionFailedError:
+                    return False
+            return False
+        return False
+
+    async def assign_spn_name(self, display_name: str, spn_id: str) -> None:
+        """Bind a pending reservation to the SPN created for it."""
+        key = _name_key(display_name)
+        container = await self._names()
+        async with self._bulkhead:
+            await container.upsert_item(
+                {
+                    "id": key,
+                    "name": normalize_spn_name(display_name),
+                    "displayName": display_name,
+                    "spnId": spn_id,
+                    "reservedAt": time.time(),
+                }
+            )
+
+    async def release_spn_name(self, display_name: str, spn_id: str | None = None) -> None:
+        """Release *display_name* if it is held by *spn_id* (or pending when ``None``)."""
+        container = await self._names()
+        key = _name_key(display_name)
+        try:
+            async with self._bulkhead:
+                existing = await container.read_item(item=key, partition_key=key)
+            if existing.get("spnId") == spn_id:
+                async with self._bulkhead:
+                    await container.delete_item(
+                        item=key,
+                        partition_key=key,
+                        etag=existing["_etag"],
+                        match_condition=MatchConditions.IfNotModified,
+                    )
+        except (CosmosResourceNotFoundError, CosmosAccessConditionFailedError):
+            logger.debug("SPN name reservation for %r already released or taken over", display_name)
+
+    # ------------------------------------------------------------------
+    # Directory mirror (partition key: /spnId)
+    # ------------------------------------------------------------------
+
+    async def upsert_directory_application(self, document: dict) -> None:
+        """Create or replace the mirror document of an application."""
+        item = {**document, "id": document["id"], "spnId": document["id"], "type": "application"}
+        container = await self._mirror()
+        async with self._bulkhead:
+            await container.upsert_item(item)
+
+    async def get_directory_application(self, spn_id: str) -> dict | None:
+        """Get the mirror document of an application. Returns None if not found."""
+        container = await self._mirror()
+        async with self._bulkhead:
+            try:
+                return await container.read_item(item=spn_id, partition_key=spn_id)
+            except Exception:
+                logger.debug("Directory mirror document not found for %s", spn_id)
+                return None
+
+    async def delete_directory_application(self, spn_id: str) -> None:
+        """Delete the mirror document of an application."""
+        container = await self._mirror()
+        async with self._bulkhead:
+            try:
+                await container.delete_item(item=spn_id, partition_key=spn_id)
+            except Exception:
+                logger.debug("Directory mirror document not found for deletion: %s", spn_id)
+
+    async def iter_directory_applications_by_owner(
+        self, user_oid: str, page_size: int = 100
+    ) -> AsyncIterator[list[dict]]:
+        """Yield pages of mirrored applications owned by *user_oid*."""
+        query = "SELECT * FROM c WHERE c.type = 'application' AND ARRAY_CONTAINS(c.ownerIds, @oid)"
+        params: list[dict[str, Any]] = [{"name": "@oid", "value": user_oid}]
+        pages = (
+            (await self._mirror())
+            .query_items(
+                query=query,
+                parameters=params,
+                max_item_count=page_size,
+            )
+            .by_page()
+        )
+        while True:
+            async with self._bulkhead:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    return
+                items = [item async for item in page]
+            yield items
+
+    async def find_directory_application_by_name(self, display_name: str) -> dict | None:
+        """Find a mirrored application by display name, compared with ``normalize_spn_name``."""
+        query = "SELECT TOP 1 c.id FROM c WHERE c.type = 'application' AND c.displayNameLower = @name"
+        params: list[dict[str, Any]] = [{"name": "@name", "value": normalize_spn_name(display_name)}]
+        container = await self._mirror()
+        async with self._bulkhead:
+            async for item in container.query_items(
+                query=query,
+                parameters=params,
+                enable_cross_partition_query=True,
+            ):
+                return item
+        return None
+
+    async def list_directory_applications_with_stale_owners(self, cutoff: float, limit: int) -> list[str]:
+        """Return ids of mirrored applications whose owners were synced before *cutoff*."""
+        query = (
+            "SELECT TOP @limit c.id FROM c "
+            "WHERE c.type = 'application' AND c.ownersSyncedAt < @cutoff ORDER BY c.ownersSyncedAt"
+        )
+        params: list[dict[str, Any]] = [
+            {"name": "@limit", "value": limit},
+            {"name": "@cutoff", "value": cutoff},
+        ]
+        container = await self._mirror()
+        async with self._bulkhead:
+            return [
+                item["id"]
+                async for item in container.query_items(
+                    query=query,
+                    parameters=params,
+                    enable_cross_partition_query=True,
+                )
+            ]
+
+    async def list_directory_application_ids(self, modified_before: float) -> list[str]:
+        """Return ids of mirrored applications last written before *modified_before* (epoch seconds)."""
+        query = "SELECT c.id FROM c WHERE c.type = 'application' AND c._ts < @before"
+        params: list[dict[str, Any]] = [{"name": "@before", "value": math.floor(modified_before)}]
+        container = await self._mirror()
+        async with self._bulkhead:
+            return [
+                item["id"]
+                async for item in container.query_items(
+                    query=query,
+                    parameters=params,
+                    enable_cross_partition_query=True,
+                )
+            ]
+
+    async def get_directory_sync_state(self) -> dict | None:
+        """Get the directory sync state (delta link, last sync time)."""
+        container = await self._mirror()
+        async with self._bulkhead:
+            try:
+                return await container.read_item(item=_SYNC_STATE_ID, partition_key=_SYNC_STATE_ID)
+            except Exception:
+                logger.debug("Directory sync state not found")
+                return None
+
+    async def save_directory_sync_state(self, state: dict) -> None:
+        """Persist the directory sync state."""
+        item = {**state, "id": _SYNC_STATE_ID, "spnId": _SYNC_STATE_ID, "type": "syncState"}
+        container = await self._mirror()
+        async with self._bulkhead:
+            await container.upsert_item(item)
+
+    # ------------------------------------------------------------------
+    # Ownership index (partition key: /userOid, id: spnId)
+    # ------------------------------------------------------------------
+
+    async def upsert_ownership(self, user_oid: str, document: dict) -> None:
+        """Create or replace the index entry recording that *user_oid* owns ``document["id"]``."""
+        item = {**document, "id": document["id"], "spnId": document["id"], "userOid": user_oid}
+        container = await self._ownership()
+        async with self._bulkhead:
+            await container.upsert_item(item)
+
+    async def get_ownership(self, user_oid: str, spn_id: str) -> dict | None:
+        """Point-read the index entry for (*user_oid*, *spn_id*). Returns None if not found."""
+        container = await self._ownership()
+        async with self._bulkhead:
+            try:
+                return await container.read_item(item=spn_id, partition_key=user_oid)
+            except CosmosResourceNotFoundError:
+                return None
+
+    async def delete_ownership(self, user_oid: str, spn_id: str) -> None:
+        """Delete the index entry for (*user_oid*, *spn_id*), if any."""
+        container = await self._ownership()
+        async with self._bulkhead:
+            try:
+                await container.delete_item(item=spn_id, partition_key=user_oid)
+            except CosmosResourceNotFoundError:
+                logger.debug("Ownership entry not found for deletion: %s/%s", user_oid, spn_id)
+
+    async def iter_owned_applications(self, user_oid: str, page_size: int = 100) -> AsyncIterator[list[dict]]:
+        """Yield pages of index entries of *user_oid* (a single-partition query)."""
+        pages = (
+            (await self._ownership())
+            .query_items(
+                query="SELECT * FROM c",
+                partition_key=user_oid,
+                max_item_count=page_size,
+            )
+            .by_page()
+        )
+        while True:
+            async with self._bulkhead:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    return
+                items = [item async for item in page]
+            yield items
+
+    # ------------------------------------------------------------------
+    # Shared cache entries (partition key: /id, expired by per-item TTL)
+    # ------------------------------------------------------------------
+
+    async def get_shared_cache_item(self, item_id: str) -> dict | None:
+        """Point-read a shared cache entry. Returns None if not found."""
+        container = await self._shared_cache()
+        async with self._bulkhead:
+            try:
+                return await container.read_item(item=item_id, partition_key=item_id)
+            except CosmosResourceNotFoundError:
+                return None
+
+    async def upsert_shared_cache_item(self, item: dict, ttl_seconds: float) -> None:
+        """Write a shared cache entry that Cosmos deletes after *ttl_seconds*."""
+        container = await self._shared_cache()
+        async with self._bulkhead:
+            await container.upsert_item({**item, "ttl": max(1, math.ceil(ttl_seconds))})
+
+    async def delete_shared_cache_item(self, item_id: str) -> None:
+        """Delete a shared cache entry, if any."""
+        container = await self._shared_cache()
+        async with self._bulkhead:
+            try:
+                await container.delete_item(item=item_id, partition_key=item_id)
+            except CosmosResourceNotFoundError:
+                logger.debug("Shared cache entry not found for deletion: %s", item_id)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Return bulkhead counters."""
+        return {"bulkhead": self._bulkhead.stats()}
+
 
 cosmos_service = CosmosService()
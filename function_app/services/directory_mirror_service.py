@@ -0,0 +1,388 @@
+"""Local mirror of app registrations and their owners, synced from Graph delta queries."""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from core.config import settings
+from models.spn import SPN_GRAPH_FIELDS
+from services.cosmos_service import cosmos_service, normalize_spn_name
+
+logger = logging.getLogger(__name__)
+
+# How long a read of the sync state is trusted before re-reading it from Cosmos
+_STATE_RECHECK_SECONDS = 30.0
+
+# Document fields that come from the owner read rather than the application
+_OWNER_FIELDS = ("owners", "ownerIds", "ownersSyncedAt")
+
+
+def _owner_summary(owner: dict) -> dict:
+    return {
+        "id": owner.get("id"),
+        "displayName": owner.get("displayName"),
+        "mail": owner.get("mail"),
+        "userPrincipalName": owner.get("userPrincipalName"),
+    }
+
+
+class DirectoryMirrorService:
+    """Incremental Cosmos mirror of applications and owners.
+
+    ``sync`` (run by the ``DirectorySync`` timer) applies
+    ``/applications/delta`` changes, refreshes owners of changed apps and of
+    apps whose owner list is older than the staleness window, and persists
+    the delta link.  A full resync (first run, expired delta link) also
+    deletes the mirror documents of applications it no longer saw.  The read methods answer from the mirror when
+    ``DIRECTORY_MIRROR_MODE`` is ``"mirror"`` and the last sync is within
+    ``DIRECTORY_MIRROR_MAX_STALENESS_SECONDS``; otherwise, or when the
+    mirror has no answer, they fall back to live Graph.  Portal writes are
+    applied to the mirror immediately (best-effort) in mirror mode.
+
+    With ``OWNERSHIP_INDEX_ENABLED`` every mirror write also maintains one
+    ownership index entry per (owner, application), partitioned by owner.
+    The first sync after enabling it is a full resync that builds the
+    index; until then reads keep using the mirror documents.
+    """
+
+    def __init__(self) -> None:
+        self._last_synced_at: float | None = None
+        self._index_built = False
+        self._state_checked_at = 0.0
+        self._sync_lock = asyncio.Lock()
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    async def sync(self) -> dict[str, int]:
+        """Apply pending Graph changes to the mirror. Returns change counters."""
+        # Import here to avoid circular import at module load time
+        from services.graph_service import DeltaTokenExpiredError
+
+        async with self._sync_lock:
+            state = await cosmos_service.get_directory_sync_state() or {}
+            delta_link = state.get("deltaLink")
+            if settings.OWNERSHIP_INDEX_ENABLED and not state.get("ownershipIndexBuilt"):
+                logger.info("Building the ownership index with a full directory resync")
+                delta_link = None
+            try:
+                counts = await self._apply_delta(delta_link)
+            except DeltaTokenExpiredError:
+                logger.warning("Directory delta link expired; running a full resync")
+                counts = await self._apply_delta(None)
+            counts["ownersRefreshed"] = await self._refresh_stale_owners()
+            return counts
+
+    async def _apply_delta(self, delta_link: str | None) -> dict[str, int]:
+        from services.graph_service import graph_service
+
+        changed = 0
+        removed = 0
+        new_delta_link: str | None = None
+        # A full resync reports only existing apps; anything else mirrored
+        # before it started was deleted meanwhile
+        started_at = time.time()
+        seen: set[str] = set()
+
+        async for changes, page_delta_link in graph_service.iter_application_delta(delta_link):
+            upserts: list[dict] = []
+            for item in changes:
+                if "@removed" in item:
+                    await self._delete(item["id"])
+                    removed += 1
+                else:
+                    upserts.append(item)
+                    seen.add(item["id"])
+
+            if upserts:
+                owners = await graph_service.list_owners_bulk([a["id"] for a in upserts])
+                for app in upserts:
+                    app_owners = owners.get(app["id"])
+                    # Incremental rounds may only carry the changed properties;
+                    # the index also needs the previous owners to drop entries,
+                    # and an app whose owner read failed keeps its stored owners
+                    existing = (
+                        await cosmos_service.get_directory_application(app["id"])
+                        if delta_link or settings.OWNERSHIP_INDEX_ENABLED or app_owners is None
+                        else None
+                    )
+                    base = existing if delta_link else None
+                    if base is None and existing is not None and app_owners is None:
+                        base = {k: existing[k] for k in _OWNER_FIELDS if k in existing}
+                    document = self._to_document(app, app_owners, base)
+                    # Without a new owner list there is nothing to diff the index against
+                    await self._store(document, existing if app_owners is not None else None)
+                changed += len(upserts)
+
+            new_delta_link = page_delta_link or new_delta_link
+
+        if delta_link is None:
+            for spn_id in await cosmos_service.list_directory_application_ids(started_at):
+                if spn_id not in seen:
+                    await self._delete(spn_id)
+                    removed += 1
+
+        synced_at = time.time()
+        await cosmos_service.save_directory_sync_state(
+            {
+                "deltaLink": new_delta_link,
+                "lastSyncedAt": synced_at,
+                "ownershipIndexBuilt": settings.OWNERSHIP_INDEX_ENABLED,
+            }
+        )
+        self._last_synced_at = synced_at
+        self._index_built = settings.OWNERSHIP_INDEX_ENABLED
+        self._state_checked_at = time.monotonic()
+        logger.info("Directory mirror synced: changed=%d removed=%d", changed, removed)
+        return {"changed": changed, "removed": removed}
+
+    async def _refresh_stale_owners(self) -> int:
+        """Re-read owners of mirrored apps whose owner list is outside the staleness window.
+
+        Application delta does not reliably report owner-only changes, so
+        owner lists are refreshed on a rolling basis instead.  Applications
+        Graph no longer knows are dropped from the mirror, so they cannot hold
+        the oldest slots forever.
+        """
+        from services.graph_service import graph_service
+
+        cutoff = time.time() - settings.DIRECTORY_MIRROR_MAX_STALENESS_SECONDS
+        stale_ids = await cosmos_service.list_directory_applications_with_stale_owners(
+            cutoff, settings.DIRECTORY_MIRROR_OWNER_REFRESH_BATCH
+        )
+        if not stale_ids:
+            return 0
+
+        refreshed = 0
+        owners = await graph_service.list_owners_bulk(stale_ids)
+        for spn_id, app_owners in owners.items():
+            if app_owners is None:
+                logger.info("Application %s no longer exists; removing it from the directory mirror", spn_id)
+                await self._delete(spn_id)
+                continue
+            document = await cosmos_service.get_directory_application(spn_id)
+            if document is not None:
+                await self._store(self._with_owners(document, app_owners), document)
+                refreshed += 1
+        return refreshed
+
+    @classmethod
+    def _to_document(cls, app: dict, owners: list[dict] | None, existing: dict | None) -> dict:
+        document = dict(existing or {})
+        document.update({k: app[k] for k in SPN_GRAPH_FIELDS if k in app})
+        document["displayNameLower"] = normalize_spn_name(document.get("displayName") or "")
+        if owners is not None:
+            document = cls._with_owners(document, owners)
+        document.setdefault("owners", [])
+        document.setdefault("ownerIds", [])
+        document.setdefault("ownersSyncedAt", 0)
+        return document
+
+    @staticmethod
+    def _with_owners(document: dict, owners: list[dict]) -> dict:
+        return {
+            **document,
+            "owners": [_owner_summary(o) for o in owners],
+            "ownerIds": [o.get("id") for o in owners],
+            "ownersSyncedAt": time.time(),
+        }
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    async def is_fresh(self) -> bool:
+        """Return ``True`` if reads should be answered from the mirror."""
+        if settings.DIRECTORY_MIRROR_MODE != "mirror":
+            return False
+
+        now = time.monotonic()
+        if self._last_synced_at is None or now - self._state_checked_at > _STATE_RECHECK_SECONDS:
+            # Another instance may have synced since we last looked
+            try:
+                state = await cosmos_service.get_directory_sync_state() or {}
+            except Exception:
+                logger.warning("Failed to read directory sync state; using live Graph")
+                return False
+            self._last_synced_at = state.get("lastSyncedAt")
+            self._index_built = bool(state.get("ownershipIndexBuilt"))
+            self._state_checked_at = now
+
+        if self._last_synced_at is None:
+            return False
+        return time.time() - self._last_synced_at <= settings.DIRECTORY_MIRROR_MAX_STALENESS_SECONDS
+
+    # ------------------------------------------------------------------
+    # Reads (mirror first, live Graph fallback)
+    # ------------------------------------------------------------------
+
+    async def iter_owned_application_pages(
+        self,
+        user_oid: str,
+        *,
+        max_items: int | None = None,
+        allow_stale: bool = False,
+    ) -> AsyncIterator[list[dict]]:
+        """Yield pages of applications owned by *user_oid*.
+
+        *allow_stale* is passed to the live Graph fallback.
+        """
+        from services.graph_service import graph_service
+
+        if await self.is_fresh():
+            yielded = 0
+            try:
+                pages = (
+                    cosmos_service.iter_owned_applications(user_oid, settings.GRAPH_PAGE_SIZE)
+                    if self._use_index()
+                    else cosmos_service.iter_directory_applications_by_owner(user_oid, settings.GRAPH_PAGE_SIZE)
+                )
+                async for page in pages:
+                    if max_items is not None:
+                        page = page[: max_items - yielded]
+                    yielded += len(page)
+                    yield page
+                    if max_items is not None and yielded >= max_items:
+                        break
+                return
+            except Exception:
+                if yielded:
+                    raise
+                logger.warning("Directory mirror query failed; listing owned applications from Graph")
+
+        async for page in graph_service.iter_owned_application_pages(
+            user_oid, max_items=max_items, allow_stale=allow_stale
+        ):
+            yield page
+
+    async def check_duplicate_name(self, display_name: str) -> bool:
+        """Return ``True`` if an application with *display_name* already exists."""
+        from services.graph_service import graph_service
+
+        if await self.is_fresh():
+            try:
+                return await cosmos_service.find_directory_application_by_name(display_name) is not None
+            except Exception:
+                logger.warning("Directory mirror query failed; checking duplicate name against Graph")
+        return await graph_service.check_duplicate_name(display_name)
+
+    async def is_owner(
+        self,
+        spn_id: str,
+        user_oid: str,
+        load_owners: Callable[..., Awaitable[list[dict]]] | None = None,
+        *,
+        strict: bool = False,
+    ) -> bool:
+        """Return ``True`` if *user_oid* owns the application *spn_id*.
+
+        The mirror (a point read of the ownership index entry when the index
+        is built, else of the application document) is only trusted for a
+        positive answer backed by a recent owner refresh; anything else, and
+        every *strict* check, is confirmed against Graph, through
+        *load_owners* when given (e.g. a request-scoped memo), called as
+        ``load_owners(spn_id, fresh=strict)``: a *strict* check reads the
+        owners with ``fresh=True``, bypassing every cache.
+        """
+        from services.graph_service import graph_service
+
+        if not strict and await self.is_fresh():
+            if self._use_index():
+                document = await cosmos_service.get_ownership(user_oid, spn_id)
+                owner_ids = [user_oid] if document else []
+            else:
+                document = await cosmos_service.get_directory_application(spn_id)
+                owner_ids = document.get("ownerIds", []) if document else []
+            cutoff = time.time() - settings.DIRECTORY_MIRROR_MAX_STALENESS_SECONDS
+            if document and document.get("ownersSyncedAt", 0) >= cutoff and user_oid in owner_ids:
+                return True
+
+        owners = await (load_owners or graph_service.list_owners)(spn_id, fresh=strict)
+        return user_oid in {owner.get("id") for owner in owners}
+
+    def _use_index(self) -> bool:
+        return settings.OWNERSHIP_INDEX_ENABLED and self._index_built
+
+    # ------------------------------------------------------------------
+    # Write-through (best-effort, mirror mode only)
+    # ------------------------------------------------------------------
+
+    async def record_application(self, app: dict, owners: list[dict] | None = None) -> None:
+        """Store a created or updated application in the mirror."""
+        if settings.DIRECTORY_MIRROR_MODE != "mirror":
+            return
+        try:
+            existing = await cosmos_service.get_directory_application(app["id"])
+            await self._store(self._to_document(app, owners, existing), existing)
+        except Exception:
+            logger.warning("Failed to record application %s in directory mirror", app.get("id"))
+
+    async def forget_application(self, spn_id: str) -> None:
+        """Remove a deleted application from the mirror."""
+        if settings.DIRECTORY_MIRROR_MODE != "mirror":
+            return
+        try:
+            await self._delete(spn_id)
+        except Exception:
+            logger.warning("Failed to remove application %s from directory mirror", spn_id)
+
+    async def record_owner_added(self, spn_id: str, owner: dict) -> None:
+        """Add an owner to the mirrored owner list of an application."""
+        await self._update_owners(
+            spn_id, lambda owners: [*(o for o in owners if o.get("id") != owner.get("id")), owner]
+        )
+
+    async def record_owner_removed(self, spn_id: str, owner_id: str) -> None:
+        """Remove an owner from the mirrored owner list of an application."""
+        await self._update_owners(spn_id, lambda owners: [o for o in owners if o.get("id") != owner_id])
+
+    async def _update_owners(self, spn_id: str, change: Callable[[list[dict]], list[dict]]) -> None:
+        if settings.DIRECTORY_MIRROR_MODE != "mirror":
+            return
+        try:
+            document = await cosmos_service.get_directory_application(spn_id)
+            if document is not None:
+                owners = change(document.get("owners", []))
+                await self._store(
+                    {
+                        **document,
+                        "owners": [_owner_summary(o) for o in owners],
+                        "ownerIds": [o.get("id") for o in owners],
+                    },
+                    document,
+                )
+        except Exception:
+            logger.warning("Failed to record owner change of %s in directory mirror", spn_id)
+
+    # ------------------------------------------------------------------
+    # Storage (mirror document + ownership index entries)
+    # ------------------------------------------------------------------
+
+    async def _store(self, document: dict, previous: dict | None) -> None:
+        """Upsert the mirror *document* and bring its ownership index entries in line.
+
+        *previous* is the stored document being replaced, if any; index
+        entries of owners it lists but *document* does not are deleted.
+        """
+        await cosmos_service.upsert_directory_application(document)
+        if not settings.OWNERSHIP_INDEX_ENABLED:
+            return
+        entry = {k: document[k] for k in (*SPN_GRAPH_FIELDS, "ownersSyncedAt") if k in document}
+        owner_ids = set(document.get("ownerIds", []))
+        for user_oid in owner_ids:
+            await cosmos_service.upsert_ownership(user_oid, entry)
+        for user_oid in set((previous or {}).get("ownerIds", [])) - owner_ids:
+            await cosmos_service.delete_ownership(user_oid, document["id"])
+
+    async def _delete(self, spn_id: str) -> None:
+        """Delete the mirror document of *spn_id* and its ownership index entries."""
+        if settings.OWNERSHIP_INDEX_ENABLED:
+            previous = await cosmos_service.get_directory_application(spn_id)
+            for user_oid in (previous or {}).get("ownerIds", []):
+                await cosmos_service.delete_ownership(user_oid, spn_id)
+        await cosmos_service.delete_directory_application(spn_id)
+
+
+directory_mirror_service = DirectoryMirrorService()
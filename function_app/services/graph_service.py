@@ -1,36 +1,162 @@
 """Microsoft Graph API service for all SPN-related operations."""
 
+import asyncio
+import contextlib
+import json
 import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
 from datetime import datetime, timedelta, timezone
+from typing import Any, TypedDict, TypeVar
 
 import httpx
-from azure.identity import DefaultAzureCredential
 
+from core import json_codec
+from core.cache import TTLCache, mark_stale
 from core.config import settings
-from core.exceptions import GraphApiError, SpnNotFoundError
+from core.exceptions import DependencyBusyError, GraphApiError, GraphUnavailableError, SpnNotFoundError
+from core.resilience import (
+    IDEMPOTENT_METHODS,
+    RETRYABLE_STATUS,
+    AdaptiveRateLimiter,
+    Bulkhead,
+    CircuitBreaker,
+    RetryPolicy,
+    parse_retry_after,
+)
+from core.shared_cache import TwoLevelCache
+from models.owner import OWNER_GRAPH_SELECT
+from models.spn import SERVICE_PRINCIPAL_GRAPH_SELECT, SPN_GRAPH_FIELDS, SPN_GRAPH_SELECT
+from services.token_service import token_service
 
 logger = logging.getLogger(__name__)
 
 _GRAPH_SCOPE = "https://graph.microsoft.com/.default"
 
+# Graph rejects JSON batches with more than 20 sub-requests
+_BATCH_MAX_REQUESTS = 20
+
+T = TypeVar("T")
+
+
+def _json(resp: httpx.Response) -> Any:
+    """Parse a response body, treating an empty body as ``{}``."""
+    return json_codec.loads(resp.content) if resp.content else {}
+
+
+class DeltaTokenExpiredError(Exception):
+    """Raised when Graph rejects a stored delta link and a full resync is needed."""
+
+
+class GraphServiceStats(TypedDict):
+    """Counters returned by ``GraphService.stats``."""
+
+    coalescing: dict[str, float]
+    applicationCache: dict[str, float]
+    ownerCache: dict[str, float]
+    ownershipDecisions: dict[str, float]
+    groupMemberCache: dict[str, float]
+    rateLimiter: dict[str, float]
+    circuitBreakers: dict[str, dict[str, float | str]]
+    bulkhead: dict[str, float]
+
 
 class GraphService:
     """Thin async wrapper around the Microsoft Graph REST API.
 
-    Uses ``DefaultAzureCredential`` (client-credentials flow) to obtain
-    tokens and ``httpx.AsyncClient`` for all HTTP calls.
+    Obtains tokens from the shared ``token_service`` cache and uses a single
+    pooled ``httpx.AsyncClient`` (keep-alive, HTTP/2) for all HTTP calls.
+    The client is created lazily on first use and lives for the lifetime of
+    the service instance.
     """
 
     def __init__(self) -> None:
-        self._credential = DefaultAzureCredential()
+        self._http_client: httpx.AsyncClient | None = None
+        self._retry_policy = RetryPolicy(
+            max_retries=settings.GRAPH_MAX_RETRIES,
+            base_delay=settings.GRAPH_RETRY_BASE_DELAY_SECONDS,
+            max_delay=settings.GRAPH_RETRY_MAX_DELAY_SECONDS,
+            max_retry_after=settings.GRAPH_RETRY_AFTER_MAX_SECONDS,
+        )
+        self._rate_limiter = AdaptiveRateLimiter(
+            max_rate=settings.GRAPH_RATE_LIMIT_PER_SECOND,
+            burst=settings.GRAPH_RATE_LIMIT_BURST,
+        )
+        self._bulkhead = Bulkhead("graph", settings.GRAPH_MAX_CONCURRENCY, settings.GRAPH_MAX_WAIT_SECONDS)
+        # One circuit breaker per endpoint class (first path segment)
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._inflight_reads: dict[tuple, asyncio.Future[Any]] = {}
+        # Read-through caches keyed by application object id
+        self._app_cache: TTLCache[str, dict] = TTLCache(
+            settings.GRAPH_CACHE_MAX_ENTRIES if settings.GRAPH_CACHE_ENABLED else 0,
+            settings.GRAPH_APP_CACHE_TTL_SECONDS,
+        )
+        self._owner_cache: TTLCache[str, dict] = TTLCache(
+            settings.GRAPH_CACHE_MAX_ENTRIES if settings.GRAPH_CACHE_ENABLED else 0,
+            settings.GRAPH_OWNER_CACHE_TTL_SECONDS,
+        )
+        # Last complete owned-application listing per user, kept for stale-if-error
+        self._owned_apps_cache: TTLCache[str, list[dict]] = TTLCache(
+            settings.GRAPH_CACHE_MAX_ENTRIES if settings.GRAPH_CACHE_ENABLED else 0,
+            settings.GRAPH_APP_CACHE_TTL_SECONDS,
+        )
+        # Group id -> (member ids, delta link) for the membership fallback
+        self._group_members: TTLCache[str, tuple[frozenset[str], str | None]] = TTLCache(
+            settings.GRAPH_CACHE_MAX_ENTRIES if settings.GRAPH_CACHE_ENABLED else 0,
+            settings.GRAPH_GROUP_MEMBERS_TTL_SECONDS,
+        )
+        # "{app object id}:{user oid}" -> True for confirmed owners, shared
+        # with the other instances; dropped everywhere by remove_owner
+        self.ownership_decisions: TwoLevelCache[bool] = TwoLevelCache(
+            "ownership",
+            TTLCache(
+                settings.GRAPH_CACHE_MAX_ENTRIES if settings.GRAPH_CACHE_ENABLED else 0,
+                settings.GRAPH_OWNER_CACHE_TTL_SECONDS,
+            ),
+        )
+        self._upstream_reads = 0
+        self._coalesced_reads = 0
+        # Bumped by every write; a read that started before a write must not
+        # put what it fetched into the caches
+        self._write_generation = 0
+        # Application object id -> service principal object id; never changes
+        # once the service principal exists
+        self._sp_ids: dict[str, str] = {}
+
+    # ------------------------------------------------------------------
+    # HTTP client lifecycle
+    # ------------------------------------------------------------------
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled HTTP client, creating it on first use.
+
+        Also used by ``core.auth`` for the JWKS fetch so that every outbound
+        call reuses the same connection pool.
+        """
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                http2=settings.HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=settings.HTTP_TIMEOUT_SECONDS,
+            )
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and release pooled connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
 
     # ------------------------------------------------------------------
     # Authentication
     # ------------------------------------------------------------------
 
-    def get_access_token(self) -> str:
-        """Obtain an access token for Microsoft Graph using the default credential."""
-        token = self._credential.get_token(_GRAPH_SCOPE)
+    async def get_access_token(self) -> str:
+        """Obtain an access token for Microsoft Graph from the shared token cache."""
+        token = await token_service.get_token(_GRAPH_SCOPE)
         return token.token
 
     # ------------------------------------------------------------------
@@ -45,59 +171,430 @@ class GraphService:
         json: dict | list | None = None,
         params: dict | None = None,
         expected_status: set[int] | None = None,
+        idempotent: bool | None = None,
+        headers: dict[str, str] | None = None,
+        stream: bool = False,
     ) -> httpx.Response:
         """Execute an authenticated request against the Graph API.
 
+        *path* is either relative to ``GRAPH_API_BASE`` or an absolute URL
+        (e.g. an ``@odata.nextLink``).
+
+        Every attempt first takes a token from the adaptive rate limiter,
+        and holds a slot of the Graph bulkhead while it is in flight (not
+        during backoff); a slot that cannot be had in time is reported as
+        ``GraphUnavailableError``.
+        Throttled (429) and transient (5xx, transport) failures are retried
+        with ``Retry-After`` / jittered backoff, but only for idempotent
+        calls: safe HTTP methods by default, or any call made with
+        ``idempotent=True`` (e.g. read-only POSTs).  A ``DELETE`` resent
+        after a 5xx or transport error treats ``404`` as success: the
+        earlier attempt may have deleted the resource and lost the response.
+
+        With *stream* the body of a successful response is left unread; the
+        caller consumes it (``aiter_bytes``) and must close the response.
+
         Raises ``GraphApiError`` for unexpected non-2xx responses.
         """
-        url = f"{settings.GRAPH_API_BASE}{path}"
-        access_token = self.get_access_token()
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-        }
+        url = path if path.startswith(("http://", "https://")) else f"{settings.GRAPH_API_BASE}{path}"
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        breaker = self._breaker_for(url)
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.request(
-                method,
-                url,
-                headers=headers,
-                json=json,
-                params=params,
-                timeout=30.0,
-            )
+        attempt = 0
+        # Set once an attempt may have reached Graph without us seeing the result
+        maybe_applied = False
+        while True:
+            if not breaker.allow():
+                raise GraphUnavailableError()
+            await self._rate_limiter.acquire()
+            access_token = await self.get_access_token()
+            request_headers = {
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json",
+                **(headers or {}),
+            }
 
-        if expected_status is not None:
-            if resp.status_code not in expected_status:
-                await self._raise_graph_error(resp)
-            return resp
+            try:
+                client = self.get_http_client()
+                request = client.build_request(method, url, headers=request_headers, json=json, params=params)
+                async with self._bulkhead:
+                    resp = await client.send(request, stream=stream)
+            except DependencyBusyError as exc:
+                raise GraphUnavailableError() from exc
+            except httpx.TransportError as exc:
+                breaker.record_failure()
+                delay = self._retry_policy.delay_for(attempt) if idempotent else None
+                if delay is None:
+                    logger.error("Graph %s %s failed: %s", method, path, exc)
+                    raise GraphUnavailableError() from exc
+                logger.warning("Graph %s %s failed (%s); retrying in %.2fs", method, path, exc, delay)
+                maybe_applied = True
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            retry_after = resp.headers.get("Retry-After")
+            if resp.status_code == 429:
+                self._rate_limiter.on_throttled(parse_retry_after(retry_after))
+            else:
+                self._rate_limiter.on_success()
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            elif resp.status_code != 429:
+                breaker.record_success()
 
-        if resp.is_success:
+            if idempotent and resp.status_code in RETRYABLE_STATUS:
+                delay = self._retry_policy.delay_for(attempt, retry_after)
+                if delay is not None:
+                    logger.warning("Graph %s %s returned %d; retrying in %.2fs", method, path, resp.status_code, delay)
+                    if stream:
+                        await resp.aclose()
+                    maybe_applied = maybe_applied or resp.status_code >= 500
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+            break
+
+        ok = resp.status_code in expected_status if expected_status is not None else resp.is_success
+        if not ok and maybe_applied and method.upper() == "DELETE" and resp.status_code == 404:
+            logger.info("Graph DELETE %s returned 404 after a retry; treating it as deleted", path)
+            ok = True
+        if ok:
             return resp
 
+        if stream:
+            await resp.aread()
+            await resp.aclose()
         await self._raise_graph_error(resp)
         # unreachable, but keeps type checkers happy
         return resp  # pragma: no cover
 
+    async def _get_json(
+        self,
+        path: str,
+        *,
+        params: dict | None = None,
+        expected_status: set[int] | None = None,
+    ) -> tuple[int, dict]:
+        """GET *path* and return ``(status_code, parsed body)``.
+
+        Identical concurrent reads (same path, params and expected statuses)
+        share one upstream call and its parsed body, which callers must treat
+        as read-only.
+        """
+        key = ("GET", path, tuple(sorted((params or {}).items())), frozenset(expected_status or ()))
+
+        async def fetch() -> tuple[int, dict]:
+            resp = await self._request("GET", path, params=params, expected_status=expected_status)
+            return resp.status_code, _json(resp)
+
+        return await self._coalesce(key, fetch)
+
+    async def _coalesce(self, key: tuple, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run *fetch* once for all concurrent callers using the same *key*."""
+        future = self._inflight_reads.get(key)
+        if future is None:
+            self._upstream_reads += 1
+            future = asyncio.ensure_future(fetch())
+            self._inflight_reads[key] = future
+            future.add_done_callback(lambda f: self._on_read_done(key, f))
+        else:
+            self._coalesced_reads += 1
+        return await asyncio.shield(future)
+
+    def _on_read_done(self, key: tuple, future: asyncio.Future[Any]) -> None:
+        if self._inflight_reads.get(key) is future:
+            del self._inflight_reads[key]
+        # Waiters see the error through their await; retrieve it here too so
+        # a read abandoned by every caller does not log "never retrieved".
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> GraphServiceStats:
+        """Return coalescing, cache, rate-limiter, breaker and bulkhead counters."""
+        return {
+            "coalescing": {
+                "upstreamReads": self._upstream_reads,
+                "coalescedReads": self._coalesced_reads,
+            },
+            "applicationCache": self._app_cache.stats(),
+            "ownerCache": self._owner_cache.stats(),
+            "ownershipDecisions": self.ownership_decisions.stats(),
+            "groupMemberCache": self._group_members.stats(),
+            "rateLimiter": self._rate_limiter.stats(),
+            "circuitBreakers": {name: breaker.stats() for name, breaker in self._breakers.items()},
+            "bulkhead": self._bulkhead.stats(),
+        }
+
+    def _breaker_for(self, url: str) -> CircuitBreaker:
+        """Return the circuit breaker for *url*'s endpoint class, e.g. ``applications``."""
+        base = settings.GRAPH_API_BASE
+        path = url[len(base) :] if url.startswith(base) else httpx.URL(url).path
+        endpoint = path.lstrip("/").split("/", 1)[0].split("?", 1)[0].split("(", 1)[0] or "root"
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            breaker = self._breakers[endpoint] = CircuitBreaker(
+                f"graph:{endpoint}",
+                failure_rate=settings.GRAPH_BREAKER_FAILURE_RATE,
+                min_calls=settings.GRAPH_BREAKER_MIN_CALLS,
+                window_seconds=settings.GRAPH_BREAKER_WINDOW_SECONDS,
+                open_seconds=settings.GRAPH_BREAKER_OPEN_SECONDS,
+            )
+        return breaker
+
+    # ------------------------------------------------------------------
+    # Read-through caching
+    # ------------------------------------------------------------------
+
+    async def _cached_get(
+        self,
+        cache: TTLCache[str, dict],
+        key: str,
+        path: str,
+        expected_status: set[int] | None = None,
+        *,
+        allow_stale: bool = False,
+    ) -> tuple[int, dict]:
+        """Read-through ``GET`` of *path*, cached in *cache* under *key*.
+
+        With *allow_stale* an outage is answered from the expired entry
+        (stale-if-error); otherwise the error is raised.
+        """
+        cached = cache.get(key)
+        if cached is not None:
+            return 200, cached
+        try:
+            return await self._revalidate(cache, key, path, expected_status)
+        except GraphApiError as exc:
+            stale = self._last_known_good(cache, key, exc) if allow_stale else None
+            if stale is None:
+                raise
+            mark_stale(stale[1])
+            return 200, stale[0]
+
+    @staticmethod
+    def _last_known_good(cache: TTLCache[str, Any], key: str, exc: GraphApiError) -> tuple[Any, float] | None:
+        """Return ``(value, age)`` to serve instead of raising *exc*, if any.
+
+        Only outages (breaker open, unreachable, 5xx, throttled) fall back to
+        stale data; client errors such as 404 are always raised.  Callers
+        only ask on behalf of reads rendered back to the user (``allow_stale``),
+        never for authorization or the preconditions of a write.
+        """
+        outage = isinstance(exc, GraphUnavailableError) or (
+            exc.upstream_status is not None and (exc.upstream_status >= 500 or exc.upstream_status == 429)
+        )
+        if not outage:
+            return None
+        stale = cache.get_stale(key, settings.GRAPH_STALE_IF_ERROR_SECONDS)
+        if stale is not None:
+            logger.warning("Graph read failed (%s); serving %s from %.0fs old cache", exc.message, key, stale[1])
+        return stale
+
+    async def _revalidate(
+        self,
+        cache: TTLCache[str, dict],
+        key: str,
+        path: str,
+        expected_status: set[int] | None = None,
+    ) -> tuple[int, dict]:
+        """Fetch *path* into *cache*, conditionally when an ETag is known.
+
+        An expired entry that carries an ETag is revalidated with
+        ``If-None-Match``; a ``304`` extends its lifetime without a body.
+        Only successful responses are cached.
+        """
+        stale = cache.peek(key)
+        etag = stale.etag if stale is not None else None
+
+        async def fetch() -> tuple[int, dict]:
+            generation = self._write_generation
+            resp = await self._request(
+                "GET",
+                path,
+                headers={"If-None-Match": etag} if etag else None,
+                expected_status=((expected_status or {200}) | {304}) if etag else expected_status,
+            )
+            current = generation == self._write_generation
+            if resp.status_code == 304 and stale is not None:
+                if current:
+                    cache.touch(key)
+                return 200, stale.value
+            data = _json(resp)
+            if resp.is_success and current:
+                cache.set(key, data, etag=resp.headers.get("ETag"))
+            return resp.status_code, data
+
+        return await self._coalesce(("GET", path, "cached"), fetch)
+
+    def _invalidate(self, app_object_id: str, *, app: bool = False, owners: bool = False) -> None:
+        """Drop cached reads for an application around a write.
+
+        Called both before and after the write: reads of the application
+        still in flight are detached so later callers do not join them, and
+        the write generation is bumped so they do not cache what they
+        fetched.
+        """
+        self._write_generation += 1
+        marker = f"/applications/{app_object_id}"
+        for key in [k for k in self._inflight_reads if any(isinstance(part, str) and marker in part for part in k)]:
+            del self._inflight_reads[key]
+        if app:
+            self._app_cache.invalidate(app_object_id)
+        if owners:
+            self._owner_cache.invalidate(app_object_id)
+
     @staticmethod
     async def _raise_graph_error(resp: httpx.Response) -> None:
         """Parse a Graph error response and raise ``GraphApiError``."""
         try:
-            body = resp.json()
+            body = json_codec.loads(resp.content)
+        except Exception:
+            body = None
+        raise GraphService._graph_error(resp.status_code, body, resp.text)
+
+    @staticmethod
+    def _graph_error(status_code: int, body: object, text: str = "") -> GraphApiError:
+        """Build a ``GraphApiError`` from a status code and (parsed) error body."""
+        if isinstance(body, dict):
             error_info = body.get("error", {})
             code = error_info.get("code", "UnknownError")
-            message = error_info.get("message", resp.text)
-        except Exception:
+            message = error_info.get("message", text)
+        else:
             code = "UnknownError"
-            message = resp.text
+            message = text or (body if isinstance(body, str) else "")
 
         logger.error(
             "Graph API error: status=%d code=%s message=%s",
-            resp.status_code,
+            status_code,
             code,
             message,
         )
-        raise GraphApiError(f"Graph API error ({resp.status_code}): {code} - {message}")
+        return GraphApiError(f"Graph API error ({status_code}): {code} - {message}", upstream_status=status_code)
+
+    # ------------------------------------------------------------------
+    # JSON batching
+    # ------------------------------------------------------------------
+
+    async def _batch(self, requests: list[dict]) -> dict[str, dict]:
+        """Execute sub-requests through ``POST /$batch`` (see ``_send_batch``).
+
+        Read-only batches are coalesced like ``_get_json``: identical
+        concurrent batches share one upstream call.
+        """
+        if all(sub["method"] == "GET" for sub in requests):
+            key = ("$batch", json.dumps(requests, sort_keys=True))
+            return await self._coalesce(key, lambda: self._send_batch(requests))
+        return await self._send_batch(requests)
+
+    async def _send_batch(self, requests: list[dict]) -> dict[str, dict]:
+        """Execute sub-requests through ``POST /$batch``.
+
+        Each sub-request is a dict with ``id``, ``method``, ``url`` (relative
+        to ``GRAPH_API_BASE``) and optionally ``body`` and ``dependsOn``.
+        Requests are sent in chunks of at most 20, in order, so a dependency
+        must appear before its dependents.  A sub-request whose dependency
+        was sent in an earlier chunk and failed is not sent and gets a
+        synthetic ``424`` response, mirroring what Graph does within a batch.
+
+        Returns the per-item responses (``status``, ``headers``, ``body``)
+        keyed by sub-request ``id``.
+        """
+        responses: dict[str, dict] = {}
+
+        for start in range(0, len(requests), _BATCH_MAX_REQUESTS):
+            chunk = requests[start : start + _BATCH_MAX_REQUESTS]
+            chunk_ids: set[str] = set()
+            to_send: list[dict] = []
+
+            for sub in chunk:
+                depends_on = sub.get("dependsOn", [])
+                resolved = [d for d in depends_on if d in responses]
+                if any(not self._batch_item_ok(responses[d]) for d in resolved):
+                    responses[sub["id"]] = {
+                        "id": sub["id"],
+                        "status": 424,
+                        "body": {"error": {"code": "FailedDependency", "message": "A dependent request failed."}},
+                    }
+                    continue
+
+                item: dict = {"id": sub["id"], "method": sub["method"], "url": sub["url"]}
+                if "body" in sub:
+                    item["body"] = sub["body"]
+                    item["headers"] = {"Content-Type": "application/json"}
+                pending = [d for d in depends_on if d in chunk_ids]
+                if pending:
+                    item["dependsOn"] = pending
+                to_send.append(item)
+                chunk_ids.add(sub["id"])
+
+            attempt = 0
+            while to_send:
+                # Not DELETE: a batch resent after a lost response cannot tell
+                # a 404 from its own earlier, successful sub-request
+                resp = await self._request(
+                    "POST",
+                    "/$batch",
+                    json={"requests": to_send},
+                    idempotent=all(sub["method"] in IDEMPOTENT_METHODS - {"DELETE"} for sub in to_send),
+                )
+                for item in _json(resp).get("responses", []):
+                    responses[item["id"]] = item
+
+                # Graph throttles batch items individually; resend throttled
+                # independent reads once the longest Retry-After has passed.
+                throttled = [
+                    sub
+                    for sub in to_send
+                    if responses.get(sub["id"], {}).get("status") == 429
+                    and sub["method"] in IDEMPOTENT_METHODS
+                    and "dependsOn" not in sub
+                ]
+                if not throttled:
+                    break
+                retry_after = max(
+                    (parse_retry_after(self._batch_header(responses[sub["id"]], "Retry-After")) or 0.0)
+                    for sub in throttled
+                )
+                self._rate_limiter.on_throttled(retry_after)
+                delay = self._retry_policy.delay_for(attempt, str(retry_after) if retry_after else None)
+                if delay is None:
+                    break
+                attempt += 1
+                await asyncio.sleep(delay)
+                to_send = throttled
+
+        return responses
+
+    @staticmethod
+    def _batch_header(item: dict | None, name: str) -> str | None:
+        """Case-insensitive header lookup on a batch response item."""
+        for key, value in ((item or {}).get("headers") or {}).items():
+            if key.lower() == name.lower():
+                return str(value)
+        return None
+
+    @staticmethod
+    def _batch_item_ok(item: dict, expected_status: set[int] | None = None) -> bool:
+        status = item.get("status", 0)
+        if expected_status is not None:
+            return status in expected_status
+        return 200 <= status < 300
+
+    @classmethod
+    def _batch_result(cls, item: dict | None, expected_status: set[int] | None = None) -> dict:
+        """Return the body of a batch response item, raising like ``_request`` would.
+
+        Raises ``GraphApiError`` if the item is missing or its status is
+        unexpected.
+        """
+        if item is None:
+            raise GraphApiError("Graph API error: missing response in $batch result.")
+        if not cls._batch_item_ok(item, expected_status):
+            raise cls._graph_error(item.get("status", 0), item.get("body"))
+        body = item.get("body")
+        return body if isinstance(body, dict) else {}
 
     # ------------------------------------------------------------------
     # Group membership
@@ -107,8 +604,8 @@ class GraphService:
         """Check which of the supplied *group_ids* the user is a member of.
 
         Uses ``POST /users/{id}/checkMemberGroups`` when the user object is
-        accessible, falling back to ``GET /groups/{id}/members`` for MSA /
-        guest accounts whose OID is not directly queryable in the directory.
+        accessible, falling back to ``_is_group_member`` for MSA / guest
+        accounts whose OID is not directly queryable in the directory.
         Returns the subset of *group_ids* the user belongs to.
         """
         try:
@@ -117,24 +614,79 @@ class GraphService:
                 f"/users/{user_oid}/checkMemberGroups",
                 json={"groupIds": group_ids},
                 expected_status={200, 404},
+                idempotent=True,
             )
             if resp.status_code == 200:
-                return resp.json().get("value", [])
+                return _json(resp).get("value", [])
         except GraphApiError:
             pass
 
-        # Fallback: query each group's members directly (handles MSA / guest accounts)
+        # Fallback for MSA / guest accounts: resolve each group on its own
         matched: list[str] = []
         for group_id in group_ids:
+            if await self._is_group_member(group_id, user_oid):
+                matched.append(group_id)
+        return matched
+
+    async def _is_group_member(self, group_id: str, user_oid: str) -> bool:
+        """Check direct membership of *user_oid* in *group_id* without
+        downloading the whole member list.
+
+        A fresh cached member-id set answers without a call.  Otherwise a
+        targeted ``$filter=id eq ...`` probe is tried; if the tenant rejects
+        it, the cached set is brought up to date from ``/groups/delta``.
+        """
+        members = self._group_members.get(group_id)
+        if members is not None:
+            return user_oid in members[0]
+
+        try:
             resp = await self._request(
                 "GET",
                 f"/groups/{group_id}/members",
-                params={"$select": "id", "$top": "999"},
+                params={"$filter": f"id eq '{user_oid}'", "$select": "id", "$count": "true"},
+                headers={"ConsistencyLevel": "eventual"},
             )
-            member_ids = {m.get("id") for m in resp.json().get("value", [])}
-            if user_oid in member_ids:
-                matched.append(group_id)
-        return matched
+            return any(m.get("id") == user_oid for m in _json(resp).get("value", []))
+        except GraphApiError:
+            logger.debug("Membership probe rejected for group %s; using member set", group_id)
+
+        member_ids, _ = await self._coalesce(("group-members", group_id), lambda: self._refresh_group_members(group_id))
+        return user_oid in member_ids
+
+    async def _refresh_group_members(self, group_id: str) -> tuple[frozenset[str], str | None]:
+        """Build or incrementally update the member-id set of *group_id*.
+
+        Follows the stored delta link when there is one, so a refresh only
+        transfers membership changes; an expired link triggers a full
+        rebuild.
+        """
+        entry = self._group_members.peek(group_id)
+        if entry is not None and entry.value[1]:
+            member_ids, delta_link = set(entry.value[0]), entry.value[1]
+        else:
+            member_ids, delta_link = set(), None
+
+        path = delta_link or "/groups/delta"
+        params = None if delta_link else {"$filter": f"id eq '{group_id}'", "$select": "members"}
+        while path:
+            status, data = await self._get_json(path, params=params, expected_status={200, 410})
+            if status == 410:
+                member_ids, path = set(), "/groups/delta"
+                params = {"$filter": f"id eq '{group_id}'", "$select": "members"}
+                continue
+            for group in data.get("value", []):
+                for member in group.get("members@delta", []):
+                    if "@removed" in member:
+                        member_ids.discard(member.get("id"))
+                    else:
+                        member_ids.add(member.get("id"))
+            delta_link = data.get("@odata.deltaLink", delta_link)
+            path, params = data.get("@odata.nextLink"), None
+
+        value = (frozenset(member_ids), delta_link)
+        self._group_members.set(group_id, value)
+        return value
 
     # ------------------------------------------------------------------
     # Applications (app registrations)
@@ -142,17 +694,16 @@ class GraphService:
 
     async def check_duplicate_name(self, display_name: str) -> bool:
         """Return ``True`` if an application with *display_name* already exists."""
-        # OData filter — exact match on displayName
-        resp = await self._request(
-            "GET",
+        # OData filter — exact match on displayName (quotes doubled per OData)
+        escaped = display_name.replace("'", "''")
+        _, data = await self._get_json(
             "/applications",
             params={
-                "$filter": f"displayName eq '{display_name}'",
+                "$filter": f"displayName eq '{escaped}'",
                 "$select": "id",
                 "$top": "1",
             },
         )
-        data = resp.json()
         return len(data.get("value", [])) > 0
 
     async def create_application(
@@ -175,7 +726,7 @@ class GraphService:
             body["tags"] = tags
 
         resp = await self._request("POST", "/applications", json=body)
-        return resp.json()
+        return _json(resp)
 
     async def create_service_principal(self, app_id: str) -> dict:
         """Create a service principal for the given *app_id*.
@@ -187,81 +738,273 @@ class GraphService:
             "/servicePrincipals",
             json={"appId": app_id},
         )
-        return resp.json()
+        return _json(resp)
 
-    async def get_application(self, app_object_id: str) -> dict:
+    async def get_application(self, app_object_id: str, *, fresh: bool = False, allow_stale: bool = False) -> dict:
         """Retrieve an application by its object ID.
 
+        With *fresh* the cached copy is revalidated against Graph; use it for
+        reads that enforce business rules, since other instances may have
+        changed the application meanwhile.  With *allow_stale* (responses
+        rendered to the caller only) an outage is answered from the expired
+        cache entry.
+
         Raises ``SpnNotFoundError`` if not found.
         """
-        resp = await self._request(
-            "GET",
-            f"/applications/{app_object_id}",
-            expected_status={200, 404},
+        path = f"/applications/{app_object_id}?$select={SPN_GRAPH_SELECT}"
+        if fresh:
+            status, app = await self._revalidate(self._app_cache, app_object_id, path, expected_status={200, 404})
+        else:
+            status, app = await self._cached_get(
+                self._app_cache, app_object_id, path, expected_status={200, 404}, allow_stale=allow_stale
+            )
+        if status == 404:
+            raise SpnNotFoundError(app_object_id)
+        return app
+
+    async def get_application_with_owners(
+        self, app_object_id: str, *, allow_stale: bool = False
+    ) -> tuple[dict, list[dict]]:
+        """Retrieve an application and its owners in a single ``$batch`` call.
+
+        Served from the read-through caches when possible; only the missing
+        half is fetched when the other one is cached.  With *allow_stale* an
+        outage is answered from the expired cache entries.
+
+        Raises ``SpnNotFoundError`` if the application does not exist.
+        """
+        app = self._app_cache.get(app_object_id)
+        owners_data = self._owner_cache.get(app_object_id)
+        if app is not None and owners_data is not None:
+            return app, owners_data.get("value", [])
+        try:
+            return await self._load_application_with_owners(app_object_id, app, owners_data)
+        except GraphApiError as exc:
+            if not allow_stale:
+                raise
+            stale_app = self._last_known_good(self._app_cache, app_object_id, exc)
+            stale_owners = self._last_known_good(self._owner_cache, app_object_id, exc)
+            if stale_app is None or stale_owners is None:
+                raise
+            mark_stale(max(stale_app[1], stale_owners[1]))
+            return stale_app[0], stale_owners[0].get("value", [])
+
+    async def _load_application_with_owners(
+        self, app_object_id: str, app: dict | None, owners_data: dict | None
+    ) -> tuple[dict, list[dict]]:
+        if app is not None:
+            _, owners_data = await self._revalidate(
+                self._owner_cache, app_object_id, f"/applications/{app_object_id}/owners?$select={OWNER_GRAPH_SELECT}"
+            )
+            return app, owners_data.get("value", [])
+        if owners_data is not None:
+            status, app = await self._revalidate(
+                self._app_cache,
+                app_object_id,
+                f"/applications/{app_object_id}?$select={SPN_GRAPH_SELECT}",
+                expected_status={200, 404},
+            )
+            if status == 404:
+                raise SpnNotFoundError(app_object_id)
+            return app, owners_data.get("value", [])
+
+        generation = self._write_generation
+        results = await self._batch(
+            [
+                {"id": "app", "method": "GET", "url": f"/applications/{app_object_id}?$select={SPN_GRAPH_SELECT}"},
+                {
+                    "id": "owners",
+                    "method": "GET",
+                    "url": f"/applications/{app_object_id}/owners?$select={OWNER_GRAPH_SELECT}",
+                },
+            ]
         )
-        if resp.status_code == 404:
+        app_item = results.get("app")
+        if app_item is not None and app_item.get("status") == 404:
             raise SpnNotFoundError(app_object_id)
-        return resp.json()
+        app = self._batch_result(app_item)
+        owners_data = self._batch_result(results.get("owners"))
+        if generation == self._write_generation:
+            self._app_cache.set(app_object_id, app, etag=self._batch_header(app_item, "ETag"))
+            self._owner_cache.set(app_object_id, owners_data, etag=self._batch_header(results.get("owners"), "ETag"))
+        return app, owners_data.get("value", [])
 
-    async def list_owned_applications(self, user_oid: str) -> list[dict]:
-        """List applications owned by the given user.
+    async def iter_owned_application_pages(
+        self,
+        user_oid: str,
+        *,
+        max_pages: int | None = None,
+        max_items: int | None = None,
+        allow_stale: bool = False,
+    ) -> AsyncIterator[list[dict]]:
+        """Yield applications owned by the given user, one Graph page at a time.
 
         Uses ``GET /users/{id}/ownedObjects/microsoft.graph.application``.
-        """
-        results: list[dict] = []
-        next_link: str | None = None
+        The next ``@odata.nextLink`` is requested as soon as a page arrives,
+        so it downloads while the caller processes the current page.
+        Iteration stops after *max_pages* pages or *max_items* applications.
 
-        # First request
-        resp = await self._request(
-            "GET",
-            f"/users/{user_oid}/ownedObjects/microsoft.graph.application",
-            params={"$top": "100"},
+        With *allow_stale*, if Graph is unavailable before the first page,
+        the last complete listing for the user is served instead
+        (stale-if-error).
+        """
+        fetch: asyncio.Future[dict] | None = asyncio.ensure_future(
+            self._fetch_page(
+                f"/users/{user_oid}/ownedObjects/microsoft.graph.application",
+                params={"$top": str(settings.GRAPH_PAGE_SIZE), "$select": SPN_GRAPH_SELECT},
+            )
         )
-        data = resp.json()
-        results.extend(data.get("value", []))
-        next_link = data.get("@odata.nextLink")
-
-        # Follow pagination
-        while next_link:
-            async with httpx.AsyncClient() as client:
-                access_token = self.get_access_token()
-                page_resp = await client.get(
-                    next_link,
-                    headers={
-                        "Authorization": f"Bearer {access_token}",
-                        "Content-Type": "application/json",
-                    },
-                    timeout=30.0,
+        pages = 0
+        items = 0
+        collected: list[dict] = []
+        try:
+            while fetch is not None:
+                try:
+                    data = await fetch
+                except GraphApiError as exc:
+                    stale = (
+                        self._last_known_good(self._owned_apps_cache, user_oid, exc)
+                        if allow_stale and not pages
+                        else None
+                    )
+                    if stale is None:
+                        raise
+                    fetch = None
+                    mark_stale(stale[1])
+                    yield stale[0][:max_items] if max_items is not None else stale[0]
+                    return
+                fetch = None
+                page: list[dict] = data.get("value", [])
+                next_link: str | None = data.get("@odata.nextLink")
+                pages += 1
+                if max_items is not None:
+                    page = page[: max_items - items]
+                items += len(page)
+
+                capped = (max_pages is not None and pages >= max_pages) or (
+                    max_items is not None and items >= max_items
                 )
-            if not page_resp.is_success:
-                await self._raise_graph_error(page_resp)
-            page_data = page_resp.json()
-            results.extend(page_data.get("value", []))
-            next_link = page_data.get("@odata.nextLink")
+                if next_link and not capped:
+                    # Prefetch the next page while the caller handles this one
+                    fetch = asyncio.ensure_future(self._fetch_page(next_link))
+
+                collected.extend(page)
+                yield page
+
+            if not capped:
+                self._owned_apps_cache.set(user_oid, collected)
+        finally:
+            if fetch is not None:
+                fetch.cancel()
+                # Consume any error so an abandoned prefetch does not log noise
+                with contextlib.suppress(BaseException):
+                    await fetch
+
+    async def _fetch_page(self, path: str, params: dict | None = None) -> dict:
+        """GET one page of applications.
 
+        With ``GRAPH_STREAMING_DECODE`` (and ``ijson`` installed) the body is
+        decoded while it downloads and only ``SPN_GRAPH_FIELDS`` of each
+        item are materialised.
+        """
+        if not (settings.GRAPH_STREAMING_DECODE and json_codec.STREAMING_AVAILABLE):
+            return _json(await self._request("GET", path, params=params))
+
+        resp = await self._request("GET", path, params=params, stream=True)
+        decoder = json_codec.PageDecoder(SPN_GRAPH_FIELDS)
+        try:
+            async for chunk in resp.aiter_bytes():
+                decoder.feed(chunk)
+            decoder.close()
+        finally:
+            await resp.aclose()
+        return decoder.page()
+
+    async def list_owned_applications(self, user_oid: str, *, allow_stale: bool = False) -> list[dict]:
+        """List all applications owned by the given user.
+
+        Convenience wrapper that collects ``iter_owned_application_pages``.
+        """
+        results: list[dict] = []
+        async for page in self.iter_owned_application_pages(user_oid, allow_stale=allow_stale):
+            results.extend(page)
         return results
 
+    async def iter_application_delta(
+        self, delta_link: str | None = None
+    ) -> AsyncIterator[tuple[list[dict], str | None]]:
+        """Yield ``(changes, delta_link)`` pages from ``GET /applications/delta``.
+
+        Without *delta_link* every application in the tenant is enumerated.
+        Removed applications carry an ``@removed`` annotation.  Only the last
+        page has the new ``@odata.deltaLink``; earlier pages yield ``None``.
+
+        Raises ``DeltaTokenExpiredError`` if Graph answers ``410 Gone``.
+        """
+        url: str | None = delta_link or "/applications/delta"
+        params: dict | None = None if delta_link else {"$select": SPN_GRAPH_SELECT}
+        while url:
+            resp = await self._request("GET", url, params=params, expected_status={200, 410})
+            if resp.status_code == 410:
+                raise DeltaTokenExpiredError()
+            data = _json(resp)
+            params = None
+            url = data.get("@odata.nextLink")
+            yield data.get("value", []), data.get("@odata.deltaLink")
+
     async def update_application(self, app_object_id: str, updates: dict) -> dict:
         """Update an application registration.
 
-        ``PATCH /applications/{id}`` returns 204 on success, so we re-fetch
-        the application to return the updated object.
+        ``PATCH /applications/{id}`` returns 204 on success, so the updated
+        object is re-fetched in the same ``$batch`` call, after the patch.
         """
-        await self._request(
-            "PATCH",
-            f"/applications/{app_object_id}",
-            json=updates,
-            expected_status={204},
+        self._invalidate(app_object_id, app=True)
+        results = await self._batch(
+            [
+                {"id": "patch", "method": "PATCH", "url": f"/applications/{app_object_id}", "body": updates},
+                {
+                    "id": "app",
+                    "method": "GET",
+                    "url": f"/applications/{app_object_id}?$select={SPN_GRAPH_SELECT}",
+                    "dependsOn": ["patch"],
+                },
+            ]
         )
-        return await self.get_application(app_object_id)
+        self._batch_result(results.get("patch"), expected_status={204})
+        self._invalidate(app_object_id, app=True)
+        app_item = results.get("app")
+        if app_item is not None and app_item.get("status") == 404:
+            raise SpnNotFoundError(app_object_id)
+        app = self._batch_result(app_item)
+        self._app_cache.set(app_object_id, app, etag=self._batch_header(app_item, "ETag"))
+        return app
 
     async def delete_application(self, app_object_id: str) -> None:
-        """Delete an application registration."""
+        """Delete an application registration.
+
+        Also drops every cached ownership decision for the application.
+        """
+        owner_oids = self._known_owner_oids(app_object_id)
+        self._invalidate(app_object_id, app=True, owners=True)
+        self._sp_ids.pop(app_object_id, None)
         await self._request(
             "DELETE",
             f"/applications/{app_object_id}",
             expected_status={204},
         )
+        self._invalidate(app_object_id, app=True, owners=True)
+        for user_oid in owner_oids:
+            await self.ownership_decisions.invalidate(f"{app_object_id}:{user_oid}")
+
+    def _known_owner_oids(self, app_object_id: str) -> set[str]:
+        """Return the owners this instance knows of for an application, from
+        its (possibly expired) owner list and its ownership decisions."""
+        prefix = f"{app_object_id}:"
+        oids = {key[len(prefix) :] for key in self.ownership_decisions.l1 if key.startswith(prefix)}
+        cached = self._owner_cache.peek(app_object_id)
+        if cached is not None:
+            oids.update(owner["id"] for owner in cached.value.get("value", []) if owner.get("id"))
+        return oids
 
     # ------------------------------------------------------------------
     # Secrets (password credentials)
@@ -278,6 +1021,7 @@ class GraphService:
         Returns the credential object which includes ``secretText`` (the
         plaintext secret, only available at creation time).
         """
+        self._invalidate(app_object_id, app=True)
         end_date = datetime.now(timezone.utc) + timedelta(days=expires_in_days)
         body = {
             "passwordCredential": {
@@ -290,108 +1034,232 @@ class GraphService:
             f"/applications/{app_object_id}/addPassword",
             json=body,
         )
-        return resp.json()
+        self._invalidate(app_object_id, app=True)
+        return _json(resp)
 
     async def remove_password(self, app_object_id: str, key_id: str) -> None:
         """Remove a client secret from an application."""
+        self._invalidate(app_object_id, app=True)
         await self._request(
             "POST",
             f"/applications/{app_object_id}/removePassword",
             json={"keyId": key_id},
             expected_status={204},
         )
+        self._invalidate(app_object_id, app=True)
 
     # ------------------------------------------------------------------
     # Owners
     # ------------------------------------------------------------------
 
-    async def list_owners(self, app_object_id: str) -> list[dict]:
-        """List owners of an application."""
-        resp = await self._request(
-            "GET",
-            f"/applications/{app_object_id}/owners",
-        )
-        data = resp.json()
+    async def list_owners(self, app_object_id: str, *, fresh: bool = False, allow_stale: bool = False) -> list[dict]:
+        """List owners of an application.
+
+        With *fresh* the cached list is revalidated against Graph, for strict
+        ownership checks and the preconditions of owner changes.  With
+        *allow_stale* (responses rendered to the caller only) an outage is
+        answered from the expired cache entry.
+        """
+        path = f"/applications/{app_object_id}/owners?$select={OWNER_GRAPH_SELECT}"
+        if fresh:
+            _, data = await self._revalidate(self._owner_cache, app_object_id, path)
+        else:
+            _, data = await self._cached_get(self._owner_cache, app_object_id, path, allow_stale=allow_stale)
         return data.get("value", [])
 
-    async def add_owner(self, app_object_id: str, user_oid: str) -> None:
-        """Add *user_oid* as an owner of both the application and its service
-        principal."""
-        owner_ref = {"@odata.id": f"{settings.GRAPH_API_BASE}/directoryObjects/{user_oid}"}
+    async def list_owners_bulk(self, app_object_ids: list[str]) -> dict[str, list[dict] | None]:
+        """List the owners of many applications using ``$batch`` (20 per call).
 
-        # Add owner to the application
-        await self._request(
-            "POST",
-            f"/applications/{app_object_id}/owners/$ref",
-            json=owner_ref,
-            expected_status={204},
+        Applications that no longer exist map to ``None``; those whose owners
+        could not be read for another reason (transient errors) are left out
+        of the result.
+        """
+        generation = self._write_generation
+        results = await self._batch(
+            [
+                {"id": str(i), "method": "GET", "url": f"/applications/{app_id}/owners?$select={OWNER_GRAPH_SELECT}"}
+                for i, app_id in enumerate(app_object_ids)
+            ]
         )
+        owners: dict[str, list[dict] | None] = {}
+        current = generation == self._write_generation
+        for i, app_id in enumerate(app_object_ids):
+            item = results.get(str(i))
+            if item is not None and item.get("status") == 404:
+                owners[app_id] = None
+                continue
+            if item is None or not self._batch_item_ok(item):
+                logger.warning("Could not read owners of application %s during bulk listing", app_id)
+                continue
+            body = self._batch_result(item)
+            if current:
+                self._owner_cache.set(app_id, body)
+            owners[app_id] = body.get("value", [])
+        return owners
 
-        # Also add owner to the corresponding service principal (best-effort)
-        app = await self.get_application(app_object_id)
-        app_id = app.get("appId")
-        if app_id:
-            sp = await self.get_service_principal_by_app_id(app_id)
-            if sp:
-                try:
-                    await self._request(
-                        "POST",
-                        f"/servicePrincipals/{sp['id']}/owners/$ref",
-                        json=owner_ref,
-                        expected_status={204},
-                    )
-                except GraphApiError:
-                    logger.warning(
-                        "Failed to add owner %s to service principal %s; application owner was added successfully.",
-                        user_oid,
-                        sp["id"],
-                    )
+    async def add_owner(self, app_object_id: str, user_oid: str, *, service_principal_id: str | None = None) -> None:
+        """Add *user_oid* as an owner of both the application and its service
+        principal.
+
+        When the service principal's object id is known (passed in as
+        *service_principal_id*, e.g. from the portal metadata, or already in
+        the in-process index) both owner references go out in a single
+        ``$batch`` call.  Otherwise the ``appId`` is read alongside the
+        application owner reference and the service principal is addressed
+        by its ``appId`` alternate key, filling the index for next time.
+        """
+        owner_ref = {"@odata.id": f"{settings.GRAPH_API_BASE}/directoryObjects/{user_oid}"}
+        await self._change_owner(
+            app_object_id,
+            lambda target: {"method": "POST", "url": f"{target}/owners/$ref", "body": owner_ref},
+            service_principal_id,
+        )
 
-    async def remove_owner(self, app_object_id: str, user_oid: str) -> None:
+    async def remove_owner(self, app_object_id: str, user_oid: str, *, service_principal_id: str | None = None) -> None:
         """Remove *user_oid* as an owner from both the application and its
-        service principal."""
-        # Remove from application
-        await self._request(
-            "DELETE",
-            f"/applications/{app_object_id}/owners/{user_oid}/$ref",
-            expected_status={204},
+        service principal.
+
+        Batched the same way as ``add_owner``.
+        """
+        await self.ownership_decisions.invalidate(f"{app_object_id}:{user_oid}")
+        await self._change_owner(
+            app_object_id,
+            lambda target: {"method": "DELETE", "url": f"{target}/owners/{user_oid}/$ref"},
+            service_principal_id,
         )
 
-        # Also remove from the corresponding service principal (best-effort)
-        app = await self.get_application(app_object_id)
-        app_id = app.get("appId")
-        if app_id:
-            sp = await self.get_service_principal_by_app_id(app_id)
-            if sp:
-                try:
-                    await self._request(
-                        "DELETE",
-                        f"/servicePrincipals/{sp['id']}/owners/{user_oid}/$ref",
-                        expected_status={204},
-                    )
-                except GraphApiError:
-                    logger.warning(
-                        "Failed to remove owner %s from service principal %s; "
-                        "application owner was removed successfully.",
-                        user_oid,
-                        sp["id"],
-                    )
+    async def _change_owner(
+        self,
+        app_object_id: str,
+        owner_request: Callable[[str], dict],
+        service_principal_id: str | None = None,
+    ) -> None:
+        """Apply an owner change to an application and (best-effort) its
+        service principal.
+
+        *owner_request* builds the ``$batch`` sub-request for a given
+        directory object path, e.g. ``/applications/{id}``.
+        """
+        self._invalidate(app_object_id, owners=True)
+        if service_principal_id:
+            self._sp_ids[app_object_id] = service_principal_id
+        try:
+            await self._apply_owner_change(app_object_id, owner_request)
+        finally:
+            self._invalidate(app_object_id, owners=True)
+
+    async def _apply_owner_change(self, app_object_id: str, owner_request: Callable[[str], dict]) -> None:
+        app_request = {"id": "owner", **owner_request(f"/applications/{app_object_id}")}
+        sp_object_id = self._sp_ids.get(app_object_id)
+
+        if sp_object_id is not None:
+            results = await self._batch(
+                [app_request, {"id": "spOwner", **owner_request(f"/servicePrincipals/{sp_object_id}")}]
+            )
+            self._batch_result(results.get("owner"), expected_status={204})
+            sp_result = results.get("spOwner")
+        else:
+            results = await self._batch(
+                [app_request, {"id": "app", "method": "GET", "url": f"/applications/{app_object_id}?$select=appId"}]
+            )
+            self._batch_result(results.get("owner"), expected_status={204})
+            app_id = self._app_id_from_batch(app_object_id, results.get("app"))
+            if not app_id:
+                return
+            sp_path = f"/servicePrincipals(appId='{app_id}')"
+            results = await self._batch(
+                [
+                    {"id": "spOwner", **owner_request(sp_path)},
+                    {"id": "sp", "method": "GET", "url": f"{sp_path}?$select=id"},
+                ]
+            )
+            sp = results.get("sp")
+            if sp is not None and self._batch_item_ok(sp) and sp.get("body", {}).get("id"):
+                self._sp_ids[app_object_id] = sp["body"]["id"]
+            sp_result = results.get("spOwner")
+
+        try:
+            self._batch_result(sp_result, expected_status={204, 404})
+        except GraphApiError:
+            logger.warning(
+                "Failed to update owners of the service principal for app %s; application owners were updated.",
+                app_object_id,
+            )
+
+    def _app_id_from_batch(self, app_object_id: str, item: dict | None) -> str | None:
+        """Extract ``appId`` from a batched application read."""
+        if item is not None and item.get("status") == 404:
+            raise SpnNotFoundError(app_object_id)
+        return self._batch_result(item).get("appId")
+
+    async def provision_application(self, app_object_id: str, app_id: str, owner_oid: str) -> list[dict]:
+        """Finish setting up a freshly created application in one ``$batch`` call.
+
+        Creates the service principal for *app_id*, adds *owner_oid* as owner
+        of the application and (best-effort) of the service principal, and
+        returns the application's owners.
+
+        Raises ``GraphApiError`` if the service principal or the application
+        owner could not be created.
+        """
+        owner_ref = {"@odata.id": f"{settings.GRAPH_API_BASE}/directoryObjects/{owner_oid}"}
+        results = await self._batch(
+            [
+                {"id": "sp", "method": "POST", "url": "/servicePrincipals", "body": {"appId": app_id}},
+                {
+                    "id": "appOwner",
+                    "method": "POST",
+                    "url": f"/applications/{app_object_id}/owners/$ref",
+                    "body": owner_ref,
+                },
+                {
+                    "id": "spOwner",
+                    "method": "POST",
+                    "url": f"/servicePrincipals(appId='{app_id}')/owners/$ref",
+                    "body": owner_ref,
+                    "dependsOn": ["sp"],
+                },
+                {
+                    "id": "owners",
+                    "method": "GET",
+                    "url": f"/applications/{app_object_id}/owners?$select={OWNER_GRAPH_SELECT}",
+                    "dependsOn": ["appOwner"],
+                },
+            ]
+        )
+        sp = self._batch_result(results.get("sp"))
+        if sp.get("id"):
+            self._sp_ids[app_object_id] = sp["id"]
+        self._batch_result(results.get("appOwner"), expected_status={204})
+        try:
+            self._batch_result(results.get("spOwner"), expected_status={204})
+        except GraphApiError:
+            logger.warning(
+                "Failed to add owner %s to service principal for app %s; application owner was added successfully.",
+                owner_oid,
+                app_id,
+            )
+        owners_data = self._batch_result(results.get("owners"))
+        self._owner_cache.set(app_object_id, owners_data)
+        return owners_data.get("value", [])
 
     # ------------------------------------------------------------------
     # Service principals
     # ------------------------------------------------------------------
 
+    def known_service_principal_id(self, app_object_id: str) -> str | None:
+        """Return the indexed service principal object id for an application, if any."""
+        return self._sp_ids.get(app_object_id)
+
     async def get_service_principal_by_app_id(self, app_id: str) -> dict | None:
         """Find a service principal by its application (client) ID.
 
         Returns ``None`` if no service principal exists for the given app.
         """
-        resp = await self._request(
-            "GET",
+        _, data = await self._get_json(
             "/servicePrincipals",
-            params={"$filter": f"appId eq '{app_id}'", "$top": "1"},
+            params={"$filter": f"appId eq '{app_id}'", "$select": SERVICE_PRINCIPAL_GRAPH_SELECT, "$top": "1"},
         )
-        data = resp.json()
         values = data.get("value", [])
         return values[0] if values else None
 
@@ -401,12 +1269,11 @@ class GraphService:
 
     async def get_user(self, user_oid: str) -> dict:
         """Retrieve a user profile from Entra ID."""
-        resp = await self._request(
-            "GET",
+        _, user = await self._get_json(
             f"/users/{user_oid}",
-            params={"$select": "id,displayName,mail,userPrincipalName"},
+            params={"$select": OWNER_GRAPH_SELECT},
         )
-        return resp.json()
+        return user
 
 
 # Module-level singleton so other modules can do ``from services.graph_service import graph_service``
@@ -2,29 +2,33 @@
 
 import logging
 
-from azure.identity.aio import DefaultAzureCredential
 from azure.keyvault.secrets.aio import SecretClient
 
 from core.config import settings
+from core.resilience import Bulkhead
+from services.token_service import token_service
 
 logger = logging.getLogger(__name__)
 
 
 class KeyVaultService:
-    """Async Key Vault client with lazy initialization."""
+    """Async Key Vault client with lazy initialization.
+
+    Every client call holds a slot of the Key Vault bulkhead, so slow
+    secret operations cannot starve the other dependencies.
+    """
 
     def __init__(self) -> None:
         self._client: SecretClient | None = None
-        self._credential: DefaultAzureCredential | None = None
+        self._bulkhead = Bulkhead("keyvault", settings.KEYVAULT_MAX_CONCURRENCY, settings.KEYVAULT_MAX_WAIT_SECONDS)
 
     async def _ensure_initialized(self) -> None:
         if self._client is not None:
             return
 
-        self._credential = DefaultAzureCredential()
         self._client = SecretClient(
             vault_url=settings.KEYVAULT_URI,
-            credential=self._credential,
+            credential=token_service,
         )
 
     @staticmethod
@@ -42,26 +46,36 @@ class KeyVaultService:
     async def store_secret(self, app_id: str, key_id: str, secret_value: str) -> str:
         """Store a secret in Key Vault. Returns the secret name."""
         name = self._make_secret_name(app_id, key_id)
-        await (await self._get_client()).set_secret(name, secret_value)
+        client = await self._get_client()
+        async with self._bulkhead:
+            await client.set_secret(name, secret_value)
         logger.info("Stored secret %s in Key Vault", name)
         return name
 
     async def get_secret(self, secret_name: str) -> str | None:
         """Retrieve a secret value. Returns None if not found."""
-        try:
-            secret = await (await self._get_client()).get_secret(secret_name)
-            return secret.value
-        except Exception:
-            logger.debug("Secret %s not found in Key Vault", secret_name)
-            return None
+        client = await self._get_client()
+        async with self._bulkhead:
+            try:
+                secret = await client.get_secret(secret_name)
+                return secret.value
+            except Exception:
+                logger.debug("Secret %s not found in Key Vault", secret_name)
+                return None
 
     async def delete_secret(self, secret_name: str) -> None:
         """Soft-delete a secret. Idempotent — ignores not-found errors."""
-        try:
-            await (await self._get_client()).delete_secret(secret_name)
-            logger.info("Deleted secret %s from Key Vault", secret_name)
-        except Exception:
-            logger.debug("Secret %s not found for deletion", secret_name)
+        client = await self._get_client()
+        async with self._bulkhead:
+            try:
+                await client.delete_secret(secret_name)
+                logger.info("Deleted secret %s from Key Vault", secret_name)
+            except Exception:
+                logger.debug("Secret %s not found for deletion", secret_name)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Return bulkhead counters."""
+        return {"bulkhead": self._bulkhead.stats()}
 
 
 keyvault_service = KeyVaultService()
@@ -0,0 +1,95 @@
+"""Publishes the in-process service counters (caches, bulkheads, breakers, token refreshes)."""
+
+import logging
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from opentelemetry.metrics import CallbackOptions, MeterProvider, Observation
+
+from core.auth import auth_stats
+from core.config import settings
+from services.cosmos_service import cosmos_service
+from services.graph_service import graph_service
+from services.keyvault_service import keyvault_service
+from services.token_service import token_service
+
+logger = logging.getLogger(__name__)
+
+_METER_NAME = "spn_portal"
+_GAUGE_NAME = "spn_portal.service_stats"
+
+
+def service_stats() -> dict[str, Any]:
+    """Return the ``stats()`` of every service, keyed by service."""
+    return {
+        "auth": auth_stats(),
+        "tokens": token_service.stats(),
+        "graph": graph_service.stats(),
+        "cosmos": cosmos_service.stats(),
+        "keyVault": keyvault_service.stats(),
+    }
+
+
+def flatten_stats(stats: Mapping[str, Any], prefix: str = "") -> dict[str, float]:
+    """Flatten nested counters into dotted names, e.g. ``graph.bulkhead.waiting``.
+
+    Non-numeric values (a circuit breaker's ``state``) are left out.
+    """
+    flat: dict[str, float] = {}
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, Mapping):
+            flat.update(flatten_stats(value, f"{name}."))
+        elif isinstance(value, int | float) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+class TelemetryService:
+    """Exports ``service_stats`` to Application Insights as OpenTelemetry gauges.
+
+    One observable gauge, ``spn_portal.service_stats``, carries every
+    counter as an observation with a ``stat`` attribute (the dotted name
+    from ``flatten_stats``); the counters are read at each export
+    interval, so nothing is recorded on the request path.  Without
+    ``APPLICATIONINSIGHTS_CONNECTION_STRING`` nothing is exported.
+
+    Only a meter provider of its own is set up: the Functions host already
+    sends logs and requests to Application Insights, so no log or trace
+    exporter is installed and the global providers are left alone.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self._meter_provider: MeterProvider | None = None
+
+    def configure(self) -> None:
+        """Set up the exporter and the gauge once. Failures are logged, never raised."""
+        if self._configured or not settings.APPINSIGHTS_CONNECTION:
+            return
+        self._configured = True
+        try:
+            # Imported here: the exporter is heavy and unused without a connection string
+            from azure.monitor.opentelemetry.exporter import AzureMonitorMetricExporter
+            from opentelemetry.sdk.metrics import MeterProvider as SdkMeterProvider
+            from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+
+            reader = PeriodicExportingMetricReader(
+                AzureMonitorMetricExporter(connection_string=settings.APPINSIGHTS_CONNECTION)
+            )
+            self._meter_provider = SdkMeterProvider(metric_readers=[reader])
+            self._meter_provider.get_meter(_METER_NAME).create_observable_gauge(
+                _GAUGE_NAME,
+                callbacks=[self._observe],
+                description="Cache, bulkhead, breaker, rate-limiter and token counters of this instance",
+            )
+        except Exception:
+            logger.warning("Failed to configure service metrics export", exc_info=True)
+
+    @staticmethod
+    def _observe(options: CallbackOptions) -> Iterable[Observation]:
+        for name, value in flatten_stats(service_stats()).items():
+            yield Observation(value, {"stat": name})
+
+
+telemetry_service = TelemetryService()
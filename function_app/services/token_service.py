@@ -0,0 +1,174 @@
+"""Shared, non-blocking access-token provider for all Azure SDK and Graph calls."""
+
+import asyncio
+import logging
+import time
+from types import TracebackType
+from typing import Any
+
+from azure.core.credentials import AccessToken
+from azure.identity.aio import DefaultAzureCredential
+
+from core.config import settings
+from core.host_cache import host_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TokenService:
+    """Async token cache in front of a single ``DefaultAzureCredential``.
+
+    Tokens are cached per scope set and request options (``tenant_id``,
+    ``enable_cae`` and any other keyword the credential accepts).  A cached token is served as long as it is
+    valid; once it enters the refresh window (``TOKEN_REFRESH_MARGIN_SECONDS``
+    before expiry) it is still served while a background task fetches a new
+    one.  Refreshes are single-flight per scope, so N concurrent callers
+    trigger at most one credential round trip.  With the host cache
+    enabled, worker processes on one machine also share tokens, and only
+    one of them refreshes a given scope.
+
+    Implements the ``AsyncTokenCredential`` protocol, so it can be handed to
+    Azure SDK clients (Cosmos, Key Vault) in place of a credential.
+    """
+
+    def __init__(self) -> None:
+        self._credential: DefaultAzureCredential | None = None
+        self._tokens: dict[tuple[str, ...], AccessToken] = {}
+        self._inflight: dict[tuple[str, ...], asyncio.Task[AccessToken]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._background_refreshes = 0
+        self._refreshes = 0
+        self._refresh_failures = 0
+        self._refresh_latency_total_ms = 0.0
+        self._refresh_latency_max_ms = 0.0
+
+    def _get_credential(self) -> DefaultAzureCredential:
+        if self._credential is None:
+            self._credential = DefaultAzureCredential()
+        return self._credential
+
+    # ------------------------------------------------------------------
+    # AsyncTokenCredential protocol
+    # ------------------------------------------------------------------
+
+    async def get_token(
+        self,
+        *scopes: str,
+        claims: str | None = None,
+        tenant_id: str | None = None,
+        **kwargs: Any,
+    ) -> AccessToken:
+        """Return a valid access token for *scopes*, from cache when possible.
+
+        Requests carrying ``claims`` (CAE challenges) bypass the cache and go
+        straight to the credential.  An explicit ``tenant_id`` (as sent by Key
+        Vault's challenge auth) is part of the cache key, not a bypass.
+        """
+        if claims is not None:
+            return await self._get_credential().get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+
+        if tenant_id is not None:
+            kwargs["tenant_id"] = tenant_id
+        key = _cache_key(scopes, kwargs)
+        now = time.time()
+        cached = self._tokens.get(key)
+
+        if cached is not None and now < cached.expires_on:
+            self._hits += 1
+            if cached.expires_on - now <= settings.TOKEN_REFRESH_MARGIN_SECONDS and key not in self._inflight:
+                self._background_refreshes += 1
+                self._start_refresh(key, scopes, kwargs)
+            return cached
+
+        self._misses += 1
+        task = self._inflight.get(key) or self._start_refresh(key, scopes, kwargs)
+        return await asyncio.shield(task)
+
+    async def close(self) -> None:
+        """Close the underlying credential."""
+        if self._credential is not None:
+            await self._credential.close()
+            self._credential = None
+
+    async def __aenter__(self) -> "TokenService":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        await self.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _start_refresh(
+        self, key: tuple[str, ...], scopes: tuple[str, ...], kwargs: dict[str, Any]
+    ) -> asyncio.Task[AccessToken]:
+        task = asyncio.get_running_loop().create_task(self._refresh(key, scopes, kwargs))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_refresh_done(key, t))
+        return task
+
+    def _on_refresh_done(self, key: tuple[str, ...], task: asyncio.Task[AccessToken]) -> None:
+        self._inflight.pop(key, None)
+        # Retrieve the exception so background failures are not reported as
+        # "never retrieved"; foreground callers see it through their await.
+        if not task.cancelled():
+            task.exception()
+
+    async def _refresh(self, key: tuple[str, ...], scopes: tuple[str, ...], kwargs: dict[str, Any]) -> AccessToken:
+        shared = await host_cache("tokens").get_or_load(" ".join(key), lambda: self._acquire(scopes, kwargs))
+        token = AccessToken(shared["token"], shared["expiresOn"])
+        self._tokens[key] = token
+        return token
+
+    async def _acquire(self, scopes: tuple[str, ...], kwargs: dict[str, Any]) -> tuple[dict, float]:
+        """Get a token from the credential, shared on the host until its refresh window."""
+        started = time.perf_counter()
+        try:
+            token = await self._get_credential().get_token(*scopes, **kwargs)
+        except Exception:
+            self._refresh_failures += 1
+            logger.warning("Token refresh failed for scopes %s", scopes, exc_info=True)
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._refreshes += 1
+            self._refresh_latency_total_ms += elapsed_ms
+            self._refresh_latency_max_ms = max(self._refresh_latency_max_ms, elapsed_ms)
+
+        ttl = token.expires_on - time.time() - settings.TOKEN_REFRESH_MARGIN_SECONDS
+        return {"token": token.token, "expiresOn": token.expires_on}, ttl
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict[str, float]:
+        """Return cache and refresh counters."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "backgroundRefreshes": self._background_refreshes,
+            "refreshes": self._refreshes,
+            "refreshFailures": self._refresh_failures,
+            "refreshLatencyAvgMs": self._refresh_latency_total_ms / self._refreshes if self._refreshes else 0.0,
+            "refreshLatencyMaxMs": self._refresh_latency_max_ms,
+        }
+
+    def clear(self) -> None:
+        """Drop all cached tokens. Useful for testing."""
+        self._tokens.clear()
+
+
+def _cache_key(scopes: tuple[str, ...], kwargs: dict[str, Any]) -> tuple[str, ...]:
+    """Build the cache key from the scopes plus every option that shapes the token."""
+    return tuple(scopes) + tuple(f"{name}={kwargs[name]!r}" for name in sorted(kwargs))
+
+
+token_service = TokenService()
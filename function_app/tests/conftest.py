@@ -4,6 +4,9 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import azure.functions as func
 import pytest
 
+from core.cache import TTLCache
+from core.shared_cache import TwoLevelCache
+
 
 @pytest.fixture
 def mock_user_context():
@@ -54,18 +57,32 @@ def bypass_auth():
     }
     with (
         patch("core.decorators.validate_token", new_callable=AsyncMock, return_value=mock_claims),
-        patch("core.decorators.check_group_membership", new_callable=AsyncMock, return_value=True),
+        patch("core.decorators.is_authorized_member", new_callable=AsyncMock, return_value=True),
     ):
         yield mock_claims
 
 
+def async_pages(*pages: list[dict]):
+    """Build a side effect for mocked async page iterators yielding *pages*."""
+
+    async def _iter(*args, **kwargs):
+        for page in pages:
+            yield page
+
+    return _iter
+
+
 def _make_graph_mock() -> MagicMock:
     mock = MagicMock()
     mock.check_duplicate_name = AsyncMock(return_value=False)
     mock.create_application = AsyncMock()
     mock.create_service_principal = AsyncMock()
     mock.get_application = AsyncMock()
+    mock.get_application_with_owners = AsyncMock()
+    mock.provision_application = AsyncMock(return_value=[])
+    mock.known_service_principal_id = MagicMock(return_value="sp-1")
     mock.list_owned_applications = AsyncMock(return_value=[])
+    mock.iter_owned_application_pages = MagicMock(side_effect=async_pages())
     mock.update_application = AsyncMock()
     mock.delete_application = AsyncMock()
     mock.add_password = AsyncMock()
@@ -74,6 +91,8 @@ def _make_graph_mock() -> MagicMock:
     mock.add_owner = AsyncMock()
     mock.remove_owner = AsyncMock()
     mock.get_user = AsyncMock()
+    # A real but disabled decision cache: every request checks ownership
+    mock.ownership_decisions = TwoLevelCache("ownership", TTLCache(0, 0))
     return mock
 
 
@@ -102,10 +121,14 @@ def mock_cosmos_service():
     mock.list_audit_events = AsyncMock(return_value=[])
     mock.add_keyvault_mapping = AsyncMock()
     mock.remove_keyvault_mapping = AsyncMock(return_value=None)
+    mock.reserve_spn_name = AsyncMock(return_value=True)
+    mock.assign_spn_name = AsyncMock()
+    mock.release_spn_name = AsyncMock()
     with (
         patch("services.cosmos_service.cosmos_service", mock),
         patch("blueprints.spn_blueprint.cosmos_service", mock),
         patch("blueprints.secret_blueprint.cosmos_service", mock),
+        patch("blueprints.owner_blueprint.cosmos_service", mock),
     ):
         yield mock
 
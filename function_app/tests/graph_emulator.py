@@ -0,0 +1,806 @@
+"""Stateful emulator of the Microsoft Graph endpoints used by the portal.
+
+Keeps a seeded tenant (users, groups, applications, service principals and
+owners) in memory and serves the calls ``GraphService`` makes, including
+``$batch``, paging, ``$select``, ETags and delta queries.  Latency is drawn
+from configurable distributions and ``429`` responses can be injected, so
+request counts, pagination, throttling and latency behaviour of the real
+client can be measured without a tenant.
+
+In-process, as an ``httpx`` transport::
+
+    emulator = GraphEmulator(seed=1, latency=Latency(median_ms=40, sigma=0.5))
+    emulator.tenant.seed(users=100, applications=5000, rng=emulator.rng)
+    graph_service._http_client = emulator.client()
+
+On a loopback port, for the Functions host (set
+``GRAPH_API_BASE=http://127.0.0.1:8765/v1.0``)::
+
+    cd function_app && python -m tests.graph_emulator --applications 5000 --latency-ms 40
+
+The emulator accepts any bearer token.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+import httpx
+
+API_VERSION_PREFIX = "/v1.0"
+
+# Graph limits mirrored by the emulator
+_BATCH_MAX_REQUESTS = 20
+_DEFAULT_PAGE_SIZE = 100
+_MAX_PAGE_SIZE = 999
+
+_FILTER_EQ = re.compile(r"^(\w+) eq '((?:[^']|'')*)'$")
+
+Result = tuple[int, dict[str, str], Any]
+
+
+# ---------------------------------------------------------------------------
+# Latency
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Per-request latency: log-normal around *median_ms* (constant when ``sigma == 0``), capped at *max_ms*."""
+
+    median_ms: float = 0.0
+    sigma: float = 0.0
+    max_ms: float = 30_000.0
+
+    def sample(self, rng: random.Random) -> float:
+        """Return one latency sample in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        ms = self.median_ms if self.sigma <= 0 else rng.lognormvariate(math.log(self.median_ms), self.sigma)
+        return min(ms, self.max_ms) / 1000
+
+
+# ---------------------------------------------------------------------------
+# Tenant state
+# ---------------------------------------------------------------------------
+
+
+def _new_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class Tenant:
+    """In-memory directory state served by ``GraphEmulator``."""
+
+    users: dict[str, dict] = field(default_factory=dict)
+    groups: dict[str, set[str]] = field(default_factory=dict)
+    applications: dict[str, dict] = field(default_factory=dict)
+    app_owners: dict[str, list[str]] = field(default_factory=dict)
+    app_versions: dict[str, int] = field(default_factory=dict)
+    service_principals: dict[str, dict] = field(default_factory=dict)
+    sp_owners: dict[str, list[str]] = field(default_factory=dict)
+    # Change logs backing delta queries; a delta token is an index into them
+    app_changes: list[tuple[str, bool]] = field(default_factory=list)
+    group_changes: list[tuple[str, str, bool]] = field(default_factory=list)
+
+    def add_user(self, rng: random.Random, display_name: str | None = None) -> dict:
+        user_id = _new_id(rng)
+        name = display_name or f"User {len(self.users) + 1}"
+        upn = f"{name.lower().replace(' ', '.')}@contoso.example"
+        self.users[user_id] = {
+            "id": user_id,
+            "displayName": name,
+            "mail": upn,
+            "userPrincipalName": upn,
+            "jobTitle": "Engineer",
+            "officeLocation": "Building 1",
+        }
+        return self.users[user_id]
+
+    def add_group(self, rng: random.Random, members: list[str] | None = None) -> str:
+        group_id = _new_id(rng)
+        self.groups[group_id] = set()
+        for member in members or []:
+            self.add_group_member(group_id, member)
+        return group_id
+
+    def add_group_member(self, group_id: str, user_id: str) -> None:
+        self.groups[group_id].add(user_id)
+        self.group_changes.append((group_id, user_id, False))
+
+    def remove_group_member(self, group_id: str, user_id: str) -> None:
+        self.groups[group_id].discard(user_id)
+        self.group_changes.append((group_id, user_id, True))
+
+    def add_application(
+        self,
+        rng: random.Random,
+        display_name: str,
+        owners: list[str] | None = None,
+        *,
+        service_principal: bool = True,
+        **properties: Any,
+    ) -> dict:
+        app_id = _new_id(rng)
+        app = {
+            "id": app_id,
+            "appId": _new_id(rng),
+            "displayName": display_name,
+            "description": None,
+            "createdDateTime": _now(),
+            "signInAudience": "AzureADMyOrg",
+            "publisherDomain": "contoso.example",
+            "identifierUris": [],
+            "tags": [],
+            "web": {"redirectUris": [], "implicitGrantSettings": {"enableIdTokenIssuance": False}},
+            "api": {"requestedAccessTokenVersion": 2, "oauth2PermissionScopes": []},
+            "requiredResourceAccess": [
+                {
+                    "resourceAppId": "00000003-0000-0000-c000-000000000000",
+                    "resourceAccess": [{"id": "e1fe6dd8-ba31-4d61-89e7-88639da4683d", "type": "Scope"}],
+                }
+            ],
+            "keyCredentials": [],
+            "passwordCredentials": [],
+            **properties,
+        }
+        self.applications[app_id] = app
+        self.app_owners[app_id] = list(owners or [])
+        self.touch_application(app_id)
+        if service_principal:
+            self.add_service_principal(rng, app["appId"], owners)
+        return app
+
+    def add_service_principal(self, rng: random.Random, app_id: str, owners: list[str] | None = None) -> dict:
+        app = next(a for a in self.applications.values() if a["appId"] == app_id)
+        sp = {"id": _new_id(rng), "appId": app_id, "displayName": app["displayName"], "accountEnabled": True}
+        self.service_principals[sp["id"]] = sp
+        self.sp_owners[sp["id"]] = list(owners or [])
+        return sp
+
+    def touch_application(self, app_id: str, removed: bool = False) -> None:
+        self.app_versions[app_id] = self.app_versions.get(app_id, 0) + 1
+        self.app_changes.append((app_id, removed))
+
+    def delete_application(self, app_id: str) -> None:
+        app = self.applications.pop(app_id)
+        self.app_owners.pop(app_id, None)
+        for sp_id in [s["id"] for s in self.service_principals.values() if s["appId"] == app["appId"]]:
+            del self.service_principals[sp_id]
+            self.sp_owners.pop(sp_id, None)
+        self.touch_application(app_id, removed=True)
+
+    def seed(
+        self,
+        *,
+        users: int = 10,
+        applications: int = 100,
+        groups: int = 1,
+        owners_per_application: int = 1,
+        rng: random.Random,
+    ) -> None:
+        """Add *users* users (all members of the first of *groups* groups) and
+        *applications* applications, each with a service principal and
+        *owners_per_application* owners picked at random."""
+        user_ids = [self.add_user(rng)["id"] for _ in range(users)]
+        for i in range(groups):
+            self.add_group(rng, user_ids if i == 0 else rng.sample(user_ids, k=len(user_ids) // 2))
+        for i in range(applications):
+            owners = rng.sample(user_ids, k=min(owners_per_application, len(user_ids)))
+            self.add_application(rng, f"app-{i:05d}", owners)
+
+
+# ---------------------------------------------------------------------------
+# Emulator
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Call:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    body: Any
+    base: str
+
+
+def _ok(body: Any = None, status: int = 200, headers: dict[str, str] | None = None) -> Result:
+    return status, headers or {}, body
+
+
+def _error(status: int, code: str, message: str) -> Result:
+    return status, {}, {"error": {"code": code, "message": message}}
+
+
+def _project(obj: dict, query: dict[str, str]) -> dict:
+    select = query.get("$select")
+    if not select:
+        return dict(obj)
+    fields = {f.strip() for f in select.split(",")} | {"id"}
+    return {k: v for k, v in obj.items() if k in fields}
+
+
+def _filter_eq(query: dict[str, str]) -> tuple[str, str] | None:
+    expr = query.get("$filter")
+    if expr is None:
+        return None
+    match = _FILTER_EQ.match(expr.strip())
+    if match is None:
+        raise ValueError(expr)
+    return match.group(1), match.group(2).replace("''", "'")
+
+
+def _endpoint(path: str) -> str:
+    return path.lstrip("/").split("/", 1)[0].split("(", 1)[0] or "root"
+
+
+class GraphEmulator:
+    """Serve Graph calls against a ``Tenant`` with injectable latency and throttling.
+
+    *latency* applies to every HTTP request unless *endpoint_latency* has an
+    entry for its endpoint class (``applications``, ``users``, ``$batch``,
+    ...).  Each request and each ``$batch`` item is throttled with
+    probability *throttle_rate*; ``throttle_next`` forces the next N.
+    """
+
+    def __init__(
+        self,
+        tenant: Tenant | None = None,
+        *,
+        seed: int = 0,
+        latency: Latency | None = None,
+        endpoint_latency: dict[str, Latency] | None = None,
+        throttle_rate: float = 0.0,
+        retry_after_seconds: float = 1.0,
+    ) -> None:
+        self.tenant = tenant or Tenant()
+        self.rng = random.Random(seed)
+        self.latency = latency or Latency()
+        self.endpoint_latency = endpoint_latency or {}
+        self.throttle_rate = throttle_rate
+        self.retry_after_seconds = retry_after_seconds
+        self._forced_throttles: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self.requests: Counter[str] = Counter()
+        self.batch_items: Counter[str] = Counter()
+        self.throttled = 0
+
+    # ------------------------------------------------------------------
+    # Control and metrics
+    # ------------------------------------------------------------------
+
+    def throttle_next(self, count: int = 1, endpoint: str = "*") -> None:
+        """Answer the next *count* calls to *endpoint* (``*`` = any) with ``429``."""
+        self._forced_throttles[endpoint] += count
+
+    def stats(self) -> dict[str, Any]:
+        """Return request counters by ``"METHOD endpoint"``."""
+        return {
+            "totalRequests": sum(self.requests.values()),
+            "requests": dict(self.requests),
+            "batchItems": dict(self.batch_items),
+            "throttled": self.throttled,
+        }
+
+    def reset_stats(self) -> None:
+        self.requests.clear()
+        self.batch_items.clear()
+        self.throttled = 0
+
+    def sample_latency(self, path: str) -> float:
+        """Return the latency in seconds to apply to a request for *path*."""
+        with self._lock:
+            dist = self.endpoint_latency.get(_endpoint(self._strip_prefix(path)), self.latency)
+            return dist.sample(self.rng)
+
+    # ------------------------------------------------------------------
+    # Serving
+    # ------------------------------------------------------------------
+
+    def transport(self) -> httpx.MockTransport:
+        """Return an ``httpx`` transport that serves requests in-process."""
+        return httpx.MockTransport(self.handle)
+
+    def client(self) -> httpx.AsyncClient:
+        """Return an ``AsyncClient`` wired to the emulator, e.g. for ``GraphService._http_client``."""
+        return httpx.AsyncClient(transport=self.transport())
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        delay = self.sample_latency(request.url.path)
+        if delay:
+            await asyncio.sleep(delay)
+        status, headers, content = self.dispatch(
+            request.method, str(request.url), dict(request.headers), request.content
+        )
+        return httpx.Response(status, headers=headers, content=content)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Start serving on a loopback port in a daemon thread; returns the server.
+
+        The bound address is ``server.server_address``; stop it with
+        ``server.shutdown()``.
+        """
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _serve(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                delay = emulator.sample_latency(urlsplit(self.path).path)
+                if delay:
+                    time.sleep(delay)
+                url = f"http://{self.headers.get('Host', host)}{self.path}"
+                status, headers, content = emulator.dispatch(self.command, url, dict(self.headers), body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _serve
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def dispatch(
+        self, method: str, url: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, dict[str, str], bytes]:
+        """Answer one HTTP request; returns ``(status, headers, body bytes)``."""
+        parts = urlsplit(url)
+        base = f"{parts.scheme}://{parts.netloc}"
+        if parts.path.startswith(API_VERSION_PREFIX):
+            base += API_VERSION_PREFIX
+        headers = {k.lower(): v for k, v in headers.items()}
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            status, resp_headers, data = _error(400, "BadRequest", "Invalid JSON body.")
+        else:
+            with self._lock:
+                status, resp_headers, data = self._execute(
+                    method.upper(), self._strip_prefix(parts.path), parts.query, headers, payload, base, self.requests
+                )
+        if data is None:
+            return status, resp_headers, b""
+        return status, {"Content-Type": "application/json", **resp_headers}, json.dumps(data).encode()
+
+    @staticmethod
+    def _strip_prefix(path: str) -> str:
+        return path[len(API_VERSION_PREFIX) :] if path.startswith(API_VERSION_PREFIX) else path
+
+    def _execute(
+        self,
+        method: str,
+        path: str,
+        query_string: str,
+        headers: dict[str, str],
+        body: Any,
+        base: str,
+        counter: Counter[str],
+    ) -> Result:
+        path = unquote(path)
+        endpoint = _endpoint(path)
+        counter[f"{method} {endpoint}"] += 1
+        if self._should_throttle(endpoint):
+            self.throttled += 1
+            status, _, error = _error(429, "TooManyRequests", "Too many requests.")
+            return status, {"Retry-After": f"{self.retry_after_seconds:g}"}, error
+
+        call = _Call(method, path, dict(parse_qsl(query_string)), headers, body, base)
+        if path == "/$batch" and method == "POST":
+            return self._batch(call)
+        for route_method, pattern, handler in _ROUTES:
+            match = pattern.fullmatch(path)
+            if match and route_method == method:
+                try:
+                    return handler(self, call, **match.groupdict())
+                except ValueError as exc:
+                    return _error(400, "Request_UnsupportedQuery", f"Unsupported query: {exc}")
+        return _error(400, "BadRequest", f"Unsupported request: {method} {path}")
+
+    def _should_throttle(self, endpoint: str) -> bool:
+        for key in (endpoint, "*"):
+            if self._forced_throttles[key] > 0:
+                self._forced_throttles[key] -= 1
+                return True
+        return self.throttle_rate > 0 and self.rng.random() < self.throttle_rate
+
+    def _batch(self, call: _Call) -> Result:
+        requests = (call.body or {}).get("requests", [])
+        if len(requests) > _BATCH_MAX_REQUESTS:
+            return _error(400, "BadRequest", f"A batch may contain at most {_BATCH_MAX_REQUESTS} requests.")
+        statuses: dict[str, int] = {}
+        responses: list[dict] = []
+        for sub in requests:
+            if any(not 200 <= statuses.get(dep, 0) < 300 for dep in sub.get("dependsOn", [])):
+                status, headers, data = _error(424, "FailedDependency", "A dependent request failed.")
+            else:
+                sub_path, _, sub_query = sub["url"].partition("?")
+                status, headers, data = self._execute(
+                    sub["method"].upper(),
+                    sub_path,
+                    sub_query,
+                    {k.lower(): v for k, v in (sub.get("headers") or {}).items()},
+                    sub.get("body"),
+                    call.base,
+                    self.batch_items,
+                )
+            statuses[sub["id"]] = status
+            item: dict[str, Any] = {"id": sub["id"], "status": status, "headers": headers}
+            if data is not None:
+                item["body"] = data
+            responses.append(item)
+        return _ok({"responses": responses})
+
+    def _page(self, call: _Call, items: list[dict], extra: dict | None = None, *, project: bool = True) -> Result:
+        """Return one page of *items* with an ``@odata.nextLink`` when more remain."""
+        top = min(int(call.query.get("$top", _DEFAULT_PAGE_SIZE)), _MAX_PAGE_SIZE)
+        skip = int(call.query.get("$skiptoken", 0))
+        page = items[skip : skip + top]
+        body: dict[str, Any] = {"value": [_project(i, call.query) for i in page] if project else page}
+        if skip + top < len(items):
+            query = {**call.query, "$top": str(top), "$skiptoken": str(skip + top)}
+            body["@odata.nextLink"] = f"{call.base}{call.path}?{urlencode(query)}"
+        elif extra:
+            body.update(extra)
+        return _ok(body)
+
+    # ------------------------------------------------------------------
+    # Applications
+    # ------------------------------------------------------------------
+
+    def _app(self, app: str) -> dict | None:
+        return self.tenant.applications.get(app)
+
+    def _list_applications(self, call: _Call) -> Result:
+        apps = list(self.tenant.applications.values())
+        condition = _filter_eq(call.query)
+        if condition is not None:
+            key, value = condition
+            apps = [a for a in apps if a.get(key) == value]
+        return self._page(call, apps)
+
+    def _create_application(self, call: _Call) -> Result:
+        body = dict(call.body or {})
+        name = body.pop("displayName", None)
+        if not name:
+            return _error(400, "Request_BadRequest", "displayName is required.")
+        app = self.tenant.add_application(self.rng, name, service_principal=False, **body)
+        return _ok(app, 201)
+
+    def _get_application(self, call: _Call, app: str) -> Result:
+        obj = self._app(app)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        etag = f'W/"{self.tenant.app_versions[app]}"'
+        if call.headers.get("if-none-match") == etag:
+            return _ok(None, 304, {"ETag": etag})
+        return _ok(_project(obj, call.query), headers={"ETag": etag})
+
+    def _update_application(self, call: _Call, app: str) -> Result:
+        obj = self._app(app)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        obj.update({k: v for k, v in (call.body or {}).items() if k not in ("id", "appId")})
+        self.tenant.touch_application(app)
+        return _ok(None, 204)
+
+    def _delete_application(self, call: _Call, app: str) -> Result:
+        if self._app(app) is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        self.tenant.delete_application(app)
+        return _ok(None, 204)
+
+    def _application_delta(self, call: _Call) -> Result:
+        changes = self.tenant.app_changes
+        token = call.query.get("$deltatoken")
+        if token is None:
+            items = list(self.tenant.applications.values())
+        else:
+            since = int(token)
+            if since > len(changes):
+                return _error(410, "SyncStateNotFound", "The delta token is no longer valid.")
+            latest: dict[str, bool] = {}
+            for app_id, removed in changes[since:]:
+                latest[app_id] = removed
+            items = [
+                {"id": app_id, "@removed": {"reason": "deleted"}} if removed else self.tenant.applications[app_id]
+                for app_id, removed in latest.items()
+                if removed or app_id in self.tenant.applications
+            ]
+        delta_link = f"{call.base}/applications/delta?{urlencode({'$deltatoken': len(changes)})}"
+        return self._page(call, items, {"@odata.deltaLink": delta_link})
+
+    def _add_password(self, call: _Call, app: str) -> Result:
+        obj = self._app(app)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        requested = (call.body or {}).get("passwordCredential", {})
+        secret = "".join(self.rng.choice("abcdefghijklmnopqrstuvwxyz0123456789~._-") for _ in range(40))
+        credential = {
+            "keyId": _new_id(self.rng),
+            "displayName": requested.get("displayName"),
+            "startDateTime": _now(),
+            "endDateTime": requested.get("endDateTime"),
+            "hint": secret[:3],
+        }
+        obj["passwordCredentials"] = [*obj.get("passwordCredentials", []), credential]
+        self.tenant.touch_application(app)
+        return _ok({**credential, "secretText": secret})
+
+    def _remove_password(self, call: _Call, app: str) -> Result:
+        obj = self._app(app)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        key_id = (call.body or {}).get("keyId")
+        remaining = [c for c in obj.get("passwordCredentials", []) if c["keyId"] != key_id]
+        if len(remaining) == len(obj.get("passwordCredentials", [])):
+            return _error(404, "Request_ResourceNotFound", f"No password credential with keyId '{key_id}'.")
+        obj["passwordCredentials"] = remaining
+        self.tenant.touch_application(app)
+        return _ok(None, 204)
+
+    def _list_app_owners(self, call: _Call, app: str) -> Result:
+        if self._app(app) is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        return self._page(call, self._users(self.tenant.app_owners[app]))
+
+    def _add_app_owner(self, call: _Call, app: str) -> Result:
+        if self._app(app) is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        return self._add_ref(self.tenant.app_owners[app], call)
+
+    def _remove_app_owner(self, call: _Call, app: str, user: str) -> Result:
+        if self._app(app) is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{app}' does not exist.")
+        return self._remove_ref(self.tenant.app_owners[app], user)
+
+    # ------------------------------------------------------------------
+    # Service principals
+    # ------------------------------------------------------------------
+
+    def _resolve_sp(self, sp: str) -> dict | None:
+        if sp.startswith("/"):
+            return self.tenant.service_principals.get(sp[1:])
+        app_id = sp[len("(appId='") : -len("')")]
+        return next((s for s in self.tenant.service_principals.values() if s["appId"] == app_id), None)
+
+    def _list_service_principals(self, call: _Call) -> Result:
+        sps = list(self.tenant.service_principals.values())
+        condition = _filter_eq(call.query)
+        if condition is not None:
+            key, value = condition
+            sps = [s for s in sps if s.get(key) == value]
+        return self._page(call, sps)
+
+    def _create_service_principal(self, call: _Call) -> Result:
+        app_id = (call.body or {}).get("appId")
+        if not any(a["appId"] == app_id for a in self.tenant.applications.values()):
+            return _error(400, "Request_BadRequest", f"No application with appId '{app_id}'.")
+        if any(s["appId"] == app_id for s in self.tenant.service_principals.values()):
+            return _error(409, "Request_MultipleObjectsWithSameKeyValue", "The service principal already exists.")
+        return _ok(self.tenant.add_service_principal(self.rng, app_id), 201)
+
+    def _get_service_principal(self, call: _Call, sp: str) -> Result:
+        obj = self._resolve_sp(sp)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", "Service principal does not exist.")
+        return _ok(_project(obj, call.query))
+
+    def _add_sp_owner(self, call: _Call, sp: str) -> Result:
+        obj = self._resolve_sp(sp)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", "Service principal does not exist.")
+        return self._add_ref(self.tenant.sp_owners[obj["id"]], call)
+
+    def _remove_sp_owner(self, call: _Call, sp: str, user: str) -> Result:
+        obj = self._resolve_sp(sp)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", "Service principal does not exist.")
+        return self._remove_ref(self.tenant.sp_owners[obj["id"]], user)
+
+    # ------------------------------------------------------------------
+    # Owner references
+    # ------------------------------------------------------------------
+
+    def _users(self, user_ids: list[str]) -> list[dict]:
+        return [
+            {"@odata.type": "#microsoft.graph.user", **self.tenant.users[u]} for u in user_ids if u in self.tenant.users
+        ]
+
+    def _add_ref(self, owners: list[str], call: _Call) -> Result:
+        ref = (call.body or {}).get("@odata.id", "")
+        user = ref.rstrip("/").rsplit("/", 1)[-1]
+        if user not in self.tenant.users:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{user}' does not exist.")
+        if user in owners:
+            return _error(400, "Request_BadRequest", "One or more added object references already exist.")
+        owners.append(user)
+        return _ok(None, 204)
+
+    @staticmethod
+    def _remove_ref(owners: list[str], user: str) -> Result:
+        if user not in owners:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{user}' does not exist.")
+        owners.remove(user)
+        return _ok(None, 204)
+
+    # ------------------------------------------------------------------
+    # Users and groups
+    # ------------------------------------------------------------------
+
+    def _get_user(self, call: _Call, user: str) -> Result:
+        obj = self.tenant.users.get(user)
+        if obj is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{user}' does not exist.")
+        return _ok(_project(obj, call.query))
+
+    def _check_member_groups(self, call: _Call, user: str) -> Result:
+        if user not in self.tenant.users:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{user}' does not exist.")
+        group_ids = (call.body or {}).get("groupIds", [])
+        return _ok({"value": [g for g in group_ids if user in self.tenant.groups.get(g, ())]})
+
+    def _owned_applications(self, call: _Call, user: str) -> Result:
+        if user not in self.tenant.users:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{user}' does not exist.")
+        apps = [a for a_id, a in self.tenant.applications.items() if user in self.tenant.app_owners[a_id]]
+        return self._page(call, apps)
+
+    def _group_members(self, call: _Call, group: str) -> Result:
+        members = self.tenant.groups.get(group)
+        if members is None:
+            return _error(404, "Request_ResourceNotFound", f"Resource '{group}' does not exist.")
+        if ("$filter" in call.query or "$count" in call.query) and call.headers.get("consistencylevel") != "eventual":
+            return _error(400, "Request_UnsupportedQuery", "Advanced queries require ConsistencyLevel: eventual.")
+        users = self._users(sorted(members))
+        condition = _filter_eq(call.query)
+        if condition is not None:
+            key, value = condition
+            users = [u for u in users if u.get(key) == value]
+        return self._page(call, users)
+
+    def _group_delta(self, call: _Call) -> Result:
+        condition = _filter_eq(call.query)
+        changes = self.tenant.group_changes
+        token = call.query.get("$deltatoken")
+        if token is None:
+            groups = [condition[1]] if condition else list(self.tenant.groups)
+            items = [
+                {"id": g, "members@delta": [{"id": m} for m in sorted(self.tenant.groups.get(g, ()))]} for g in groups
+            ]
+        else:
+            since = int(token)
+            if since > len(changes):
+                return _error(410, "SyncStateNotFound", "The delta token is no longer valid.")
+            by_group: dict[str, dict[str, bool]] = {}
+            for group_id, member, removed in changes[since:]:
+                by_group.setdefault(group_id, {})[member] = removed
+            items = [
+                {
+                    "id": g,
+                    "members@delta": [
+                        {"id": m, "@removed": {"reason": "deleted"}} if removed else {"id": m}
+                        for m, removed in members.items()
+                    ],
+                }
+                for g, members in by_group.items()
+                if g == call.query.get("$groupid", g)
+            ]
+        query = {"$deltatoken": str(len(changes))}
+        if condition:
+            # Keep the delta link scoped to the requested group
+            query["$groupid"] = condition[1]
+        delta_link = f"{call.base}/groups/delta?{urlencode(query)}"
+        items = [i for i in items if i["id"] in self.tenant.groups]
+        # $select=members is answered with members@delta, so no projection
+        return self._page(call, items, {"@odata.deltaLink": delta_link}, project=False)
+
+
+_SP = r"(?P<sp>/[^/()]+|\(appId='[^']*'\))"
+
+_ROUTES: list[tuple[str, re.Pattern[str], Any]] = [
+    (method, re.compile(pattern), handler)
+    for method, pattern, handler in [
+        ("GET", r"/applications", GraphEmulator._list_applications),
+        ("POST", r"/applications", GraphEmulator._create_application),
+        ("GET", r"/applications/delta", GraphEmulator._application_delta),
+        ("GET", r"/applications/(?P<app>[^/]+)", GraphEmulator._get_application),
+        ("PATCH", r"/applications/(?P<app>[^/]+)", GraphEmulator._update_application),
+        ("DELETE", r"/applications/(?P<app>[^/]+)", GraphEmulator._delete_application),
+        ("POST", r"/applications/(?P<app>[^/]+)/addPassword", GraphEmulator._add_password),
+        ("POST", r"/applications/(?P<app>[^/]+)/removePassword", GraphEmulator._remove_password),
+        ("GET", r"/applications/(?P<app>[^/]+)/owners", GraphEmulator._list_app_owners),
+        ("POST", r"/applications/(?P<app>[^/]+)/owners/\$ref", GraphEmulator._add_app_owner),
+        ("DELETE", r"/applications/(?P<app>[^/]+)/owners/(?P<user>[^/]+)/\$ref", GraphEmulator._remove_app_owner),
+        ("GET", r"/servicePrincipals", GraphEmulator._list_service_principals),
+        ("POST", r"/servicePrincipals", GraphEmulator._create_service_principal),
+        ("GET", rf"/servicePrincipals{_SP}", GraphEmulator._get_service_principal),
+        ("POST", rf"/servicePrincipals{_SP}/owners/\$ref", GraphEmulator._add_sp_owner),
+        ("DELETE", rf"/servicePrincipals{_SP}/owners/(?P<user>[^/]+)/\$ref", GraphEmulator._remove_sp_owner),
+        ("GET", r"/users/(?P<user>[^/]+)", GraphEmulator._get_user),
+        ("POST", r"/users/(?P<user>[^/]+)/checkMemberGroups", GraphEmulator._check_member_groups),
+        (
+            "GET",
+            r"/users/(?P<user>[^/]+)/ownedObjects/microsoft\.graph\.application",
+            GraphEmulator._owned_applications,
+        ),
+        ("GET", r"/groups/delta", GraphEmulator._group_delta),
+        ("GET", r"/groups/(?P<group>[^/]+)/members", GraphEmulator._group_members),
+    ]
+]
+
+
+# ---------------------------------------------------------------------------
+# Command line
+# ---------------------------------------------------------------------------
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a seeded Microsoft Graph emulator on a loopback port.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--applications", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=1)
+    parser.add_argument("--owners-per-application", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="median latency per request")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="log-normal spread (0 = constant)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    emulator = GraphEmulator(
+        seed=args.seed,
+        latency=Latency(args.latency_ms, args.latency_sigma),
+        throttle_rate=args.throttle_rate,
+        retry_after_seconds=args.retry_after,
+    )
+    emulator.tenant.seed(
+        users=args.users,
+        applications=args.applications,
+        groups=args.groups,
+        owners_per_application=args.owners_per_application,
+        rng=emulator.rng,
+    )
+    server = emulator.serve(args.host, args.port)
+    host, port = server.server_address[:2]
+    user = next(iter(emulator.tenant.users))
+    owned = sum(user in owners for owners in emulator.tenant.app_owners.values())
+    print(f"GRAPH_API_BASE=http://{host}:{port}{API_VERSION_PREFIX}")
+    print(f"ALLOWED_GROUP_ID={next(iter(emulator.tenant.groups))}")
+    print(f"Sample user {user} owns {owned} applications")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Minimal in-process server speaking the Redis protocol (RESP2).
+
+Implements just what ``RedisSharedCache`` sends through ``redis.asyncio``
+- ``PING``, ``AUTH``, ``SELECT``, ``GET``, ``SET key value PX ms``,
+``DEL``, ``PUBLISH`` and ``SUBSCRIBE``; anything else (the client's
+``CLIENT SETINFO``) gets an error reply - so the backend and pub/sub
+invalidation can be tested without a Redis server::
+
+    async with RedisStandIn() as server:
+        backend = RedisSharedCache(server.url)
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+
+def _bulk(value: bytes | None) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(*items: bytes) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(_bulk(item) for item in items)
+
+
+class RedisStandIn:
+    """Serve the Redis protocol on a loopback port from an in-memory dict."""
+
+    def __init__(self) -> None:
+        self.data: dict[bytes, tuple[bytes, float]] = {}
+        self.commands: Counter[str] = Counter()
+        self._subscribers: dict[bytes, set[asyncio.StreamWriter]] = {}
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+        self.url = ""
+
+    async def __aenter__(self) -> "RedisStandIn":
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        self.url = f"redis://{host}:{port}/0"
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.drop_connections()
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self) -> None:
+        """Close every client connection, as a server restart would."""
+        for writer in list(self._connections):
+            writer.close()
+        self._connections.clear()
+        for writers in self._subscribers.values():
+            writers.clear()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int((await reader.readline())[1:])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._execute(args, writer))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _execute(self, args: list[bytes], writer: asyncio.StreamWriter) -> bytes:
+        command = args[0].decode().upper()
+        self.commands[command] += 1
+        if command in ("PING", "AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if command == "GET":
+            value, expires_at = self.data.get(args[1], (None, 0.0))
+            return _bulk(value if expires_at > time.monotonic() else None)
+        if command == "SET":
+            ttl_ms = int(args[4]) if len(args) > 4 and args[3].upper() == b"PX" else 10**12
+            self.data[args[1]] = (args[2], time.monotonic() + ttl_ms / 1000)
+            return b"+OK\r\n"
+        if command == "DEL":
+            return b":%d\r\n" % (self.data.pop(args[1], None) is not None)
+        if command == "PUBLISH":
+            receivers = self._subscribers.get(args[1], set())
+            for subscriber in receivers:
+                subscriber.write(_array(b"message", args[1], args[2]))
+            return b":%d\r\n" % len(receivers)
+        if command == "SUBSCRIBE":
+            self._subscribers.setdefault(args[1], set()).add(writer)
+            return b"*3\r\n" + _bulk(b"subscribe") + _bulk(args[1]) + b":1\r\n"
+        return b"-ERR unknown command\r\n"
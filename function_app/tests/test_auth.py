@@ -0,0 +1,371 @@
+"""Tests for token validation and its caches in core.auth."""
+
+import asyncio
+import base64
+import time
+from unittest.mock import AsyncMock, patch
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+from core import auth, shared_cache
+from core.config import settings
+from core.exceptions import ForbiddenError, UnauthorizedError
+
+TENANT_ID = "00000000-0000-0000-0000-000000000000"
+CLIENT_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _b64(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def make_key(kid: str) -> tuple[rsa.RSAPrivateKey, dict]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    numbers = private_key.public_key().public_numbers()
+    return private_key, {"kid": kid, "kty": "RSA", "use": "sig", "n": _b64(numbers.n), "e": _b64(numbers.e)}
+
+
+KEY, JWK = make_key("kid-1")
+
+
+def make_token(private_key=KEY, kid: str = "kid-1", lifetime: int = 3600, algorithm: str = "RS256", **claims) -> str:
+    now = int(time.time())
+    payload = {
+        "oid": "user-1",
+        "aud": CLIENT_ID,
+        "iss": settings.ENTRA_ISSUER_TEMPLATE.format(tenant_id=TENANT_ID),
+        "nbf": now - 10,
+        "exp": now + lifetime,
+        **claims,
+    }
+    return jwt.encode(payload, private_key, algorithm=algorithm, headers={"kid": kid})
+
+
+@pytest.fixture(autouse=True)
+def auth_env(monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_ID", TENANT_ID)
+    monkeypatch.setattr(settings, "CLIENT_ID", CLIENT_ID)
+    auth._clear_caches()
+    yield
+    auth._clear_caches()
+
+
+GROUP_ID = "22222222-2222-2222-2222-222222222222"
+
+
+@pytest.fixture
+def member_groups(monkeypatch):
+    monkeypatch.setattr(settings, "ALLOWED_GROUP_ID", GROUP_ID)
+    with patch("services.graph_service.graph_service.check_member_groups", new_callable=AsyncMock) as mock:
+        mock.return_value = [GROUP_ID]
+        yield mock
+
+
+def age_membership(user_oid: str, seconds: float) -> None:
+    """Pretend the cached membership decision for *user_oid* was made *seconds* earlier."""
+    entry = auth._group_membership_cache.peek(user_oid)
+    entry.stored_at -= seconds
+    entry.expires_at -= seconds
+
+
+@pytest.fixture
+def jwks():
+    with patch("core.auth._fetch_jwks", new_callable=AsyncMock) as mock:
+        mock.return_value = {"keys": [JWK]}
+        yield mock
+
+
+@pytest.fixture
+def shared_l2(monkeypatch):
+    """An in-memory shared cache standing in for the other instances."""
+    data: dict[str, dict] = {}
+    backend = AsyncMock(supports_broadcast=False)
+    backend.get.side_effect = data.get
+    backend.set.side_effect = lambda key, value, ttl_seconds: data.__setitem__(key, value)
+    monkeypatch.setattr(shared_cache, "_backend", backend)
+    return data
+
+
+class TestVerifiedTokenCache:
+    async def test_repeat_token_skips_verification(self, jwks):
+        token = make_token()
+
+        first = await auth.validate_token(token)
+        with patch("core.auth._verify_token", new_callable=AsyncMock) as verify:
+            second = await auth.validate_token(token)
+
+        assert first == second
+        verify.assert_not_called()
+        stats = auth.auth_stats()
+        assert stats["verifiedTokenCache"]["hits"] == 1
+        assert stats["verification"]["count"] == 1
+
+    async def test_token_close_to_expiry_is_not_cached(self, jwks):
+        token = make_token(lifetime=int(settings.TOKEN_CACHE_CLOCK_SKEW_SECONDS) - 5)
+
+        await auth.validate_token(token)
+        await auth.validate_token(token)
+
+        assert auth.auth_stats()["verification"]["count"] == 2
+
+    async def test_invalid_token_is_not_cached(self, jwks):
+        token = make_token(aud="someone-else")
+
+        for _ in range(2):
+            with pytest.raises(UnauthorizedError):
+                await auth.validate_token(token)
+        assert len(auth._verified_tokens) == 0
+
+    async def test_key_rotation_flushes_cache(self, jwks, monkeypatch):
+        monkeypatch.setattr(auth, "_JWKS_MIN_REFRESH_INTERVAL_SECONDS", 0)
+        token = make_token()
+        await auth.validate_token(token)
+        new_key, new_jwk = make_key("kid-2")
+        jwks.return_value = {"keys": [new_jwk]}
+
+        # A token signed with the new key forces a JWKS refresh
+        await auth.validate_token(make_token(new_key, kid="kid-2"))
+
+        assert len(auth._verified_tokens) == 1
+        with pytest.raises(UnauthorizedError):
+            await auth.validate_token(token)
+
+
+class TestSigningKeys:
+    async def test_key_map_is_built_once_per_refresh(self, jwks):
+        await auth.validate_token(make_token())
+        await auth.validate_token(make_token(oid="user-2"))
+
+        assert set(auth._signing_keys) == {"kid-1"}
+        jwks.assert_awaited_once()
+
+    async def test_ec_keys_are_supported(self, jwks):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        public_jwk = {**jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key(), as_dict=True), "kid": "ec-1"}
+        jwks.return_value = {"keys": [JWK, public_jwk]}
+        token = make_token(private_key, kid="ec-1", algorithm="ES256")
+
+        assert (await auth.validate_token(token))["oid"] == "user-1"
+
+    async def test_symmetric_keys_are_ignored(self, jwks):
+        jwks.return_value = {
+            "keys": [JWK, {"kid": "hmac", "kty": "oct", "k": "c2VjcmV0LXNlY3JldC1zZWNyZXQtc2VjcmV0LXNlY3JldA"}]
+        }
+        token = jwt.encode(
+            {"oid": "user-1"}, "secret-secret-secret-secret-secret", algorithm="HS256", headers={"kid": "hmac"}
+        )
+
+        with pytest.raises(UnauthorizedError):
+            await auth.validate_token(token)
+        assert "hmac" not in auth._signing_keys
+
+
+class TestJwksRefresh:
+    async def test_cold_start_downloads_once(self, jwks):
+        tokens = [make_token(oid=f"user-{i}") for i in range(5)]
+
+        await asyncio.gather(*(auth.validate_token(t) for t in tokens))
+
+        jwks.assert_awaited_once()
+
+    async def test_unknown_kids_share_one_refresh_and_are_negative_cached(self, jwks, monkeypatch):
+        monkeypatch.setattr(auth, "_JWKS_MIN_REFRESH_INTERVAL_SECONDS", 0)
+        await auth.validate_token(make_token())
+        bogus = make_token(kid="bogus")
+
+        results = await asyncio.gather(*(auth.validate_token(bogus) for _ in range(10)), return_exceptions=True)
+        with pytest.raises(UnauthorizedError):
+            await auth.validate_token(bogus)
+
+        assert all(isinstance(r, UnauthorizedError) for r in results)
+        assert jwks.await_count == 2
+        assert auth.auth_stats()["jwks"]["unknownKidRejections"] == 11
+
+    async def test_forced_refreshes_are_rate_limited(self, jwks):
+        await auth.validate_token(make_token())
+
+        with pytest.raises(UnauthorizedError):
+            await auth.validate_token(make_token(kid="new-kid"))
+
+        jwks.assert_awaited_once()
+
+    async def test_refreshes_in_background_before_expiry(self, jwks):
+        token = make_token()
+        await auth.validate_token(token)
+        auth._jwks_cache_timestamp -= auth._JWKS_CACHE_TTL_SECONDS - auth._JWKS_REFRESH_AHEAD_SECONDS
+
+        async def slow_fetch():
+            await asyncio.sleep(0.05)
+            return {"keys": [JWK]}
+
+        jwks.side_effect = slow_fetch
+
+        started = time.perf_counter()
+        await auth.validate_token(make_token(oid="user-2"))
+        assert time.perf_counter() - started < 0.05
+        await auth._jwks_refresh
+
+        assert jwks.await_count == 2
+        assert auth.auth_stats()["jwks"]["backgroundRefreshes"] == 1
+
+    async def test_failed_background_refresh_keeps_keys(self, jwks):
+        await auth.validate_token(make_token())
+        auth._jwks_cache_timestamp -= auth._JWKS_CACHE_TTL_SECONDS - auth._JWKS_REFRESH_AHEAD_SECONDS
+        jwks.side_effect = RuntimeError("down")
+
+        await auth.validate_token(make_token(oid="user-2"))
+        with pytest.raises(RuntimeError):
+            await auth._jwks_refresh
+
+        assert auth.auth_stats()["jwks"]["refreshFailures"] == 1
+        assert "kid-1" in auth._signing_keys
+
+
+class TestGroupMembershipCache:
+    async def test_concurrent_misses_share_one_graph_call(self, member_groups):
+        async def slow_check(user_oid, group_ids):
+            await asyncio.sleep(0.01)
+            return group_ids
+
+        member_groups.side_effect = slow_check
+
+        results = await asyncio.gather(*(auth.check_group_membership("user-1") for _ in range(10)))
+
+        assert results == [True] * 10
+        member_groups.assert_awaited_once()
+        assert auth.auth_stats()["groupMembershipCache"]["coalescedChecks"] == 9
+
+    async def test_non_members_expire_sooner(self, member_groups):
+        member_groups.return_value = []
+
+        assert await auth.check_group_membership("user-1") is False
+        assert await auth.check_group_membership("user-1") is False
+
+        member_groups.assert_awaited_once()
+        entry = auth._group_membership_cache.peek("user-1")
+        assert entry.expires_at - entry.stored_at == pytest.approx(settings.GROUP_MEMBERSHIP_NEGATIVE_TTL_SECONDS)
+
+    async def test_expired_decision_is_served_while_rechecked(self, member_groups):
+        await auth.check_group_membership("user-1")
+        age_membership("user-1", settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS + 1)
+        member_groups.return_value = []
+
+        assert await auth.check_group_membership("user-1") is True
+        await auth._membership_checks["user-1"]
+
+        assert await auth.check_group_membership("user-1") is False
+        assert member_groups.await_count == 2
+        assert auth.auth_stats()["groupMembershipCache"]["backgroundChecks"] == 1
+
+    async def test_decision_past_stale_window_waits_for_graph(self, member_groups):
+        await auth.check_group_membership("user-1")
+        age_membership(
+            "user-1", settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS + settings.GROUP_MEMBERSHIP_STALE_SECONDS + 1
+        )
+        member_groups.return_value = []
+
+        assert await auth.check_group_membership("user-1") is False
+        assert auth.auth_stats()["groupMembershipCache"]["backgroundChecks"] == 0
+
+    async def test_graph_failure_denies_without_caching(self, member_groups):
+        member_groups.side_effect = RuntimeError("graph down")
+
+        with pytest.raises(ForbiddenError):
+            await auth.check_group_membership("user-1")
+
+        assert auth._group_membership_cache.peek("user-1") is None
+        assert auth.auth_stats()["groupMembershipCache"]["checkFailures"] == 1
+
+    async def test_failed_background_check_keeps_decision(self, member_groups):
+        await auth.check_group_membership("user-1")
+        age_membership("user-1", settings.GROUP_MEMBERSHIP_CACHE_TTL_SECONDS + 1)
+        member_groups.side_effect = RuntimeError("graph down")
+
+        assert await auth.check_group_membership("user-1") is True
+        with pytest.raises(RuntimeError):
+            await auth._membership_checks["user-1"]
+
+        assert auth._group_membership_cache.peek("user-1").value is True
+
+    async def test_cache_is_bounded(self, member_groups, monkeypatch):
+        monkeypatch.setattr(settings, "GROUP_MEMBERSHIP_CACHE_MAX_ENTRIES", 2)
+        auth._clear_caches()
+
+        for user in ("user-1", "user-2", "user-3"):
+            await auth.check_group_membership(user)
+
+        stats = auth.auth_stats()["groupMembershipCache"]
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+        assert auth._group_membership_cache.peek("user-1") is None
+
+
+class TestGroupAuthorization:
+    async def test_groups_claim_authorises_without_graph(self, member_groups):
+        assert await auth.is_authorized_member({"oid": "user-1", "groups": ["other", GROUP_ID]}) is True
+        assert await auth.is_authorized_member({"oid": "user-2", "groups": ["other"]}) is False
+
+        member_groups.assert_not_awaited()
+        stats = auth.auth_stats()["groupAuthorization"]
+        assert stats["fromClaim"] == 2
+        assert stats["fromClaimRatio"] == 1.0
+
+    @pytest.mark.parametrize(
+        "claims",
+        [
+            {"_claim_names": {"groups": "src1"}, "_claim_sources": {"src1": {"endpoint": "https://graph"}}},
+            {"hasgroups": True},
+        ],
+    )
+    async def test_group_overage_falls_back_to_graph(self, member_groups, claims):
+        assert await auth.is_authorized_member({"oid": "user-1", **claims}) is True
+
+        member_groups.assert_awaited_once_with("user-1", [GROUP_ID])
+        assert auth.auth_stats()["groupAuthorization"]["overageFallbacks"] == 1
+
+    async def test_token_without_groups_claim_falls_back_to_graph(self, member_groups):
+        assert await auth.is_authorized_member({"oid": "guest-1"}) is True
+        assert await auth.is_authorized_member({"oid": "user-1", "groups": []}) is False
+
+        member_groups.assert_awaited_once_with("guest-1", [GROUP_ID])
+        stats = auth.auth_stats()["groupAuthorization"]
+        assert (stats["fromClaim"], stats["missingClaimFallbacks"], stats["fromClaimRatio"]) == (1, 1, 0.5)
+
+    async def test_claim_can_be_ignored(self, member_groups, monkeypatch):
+        monkeypatch.setattr(settings, "AUTH_USE_GROUPS_CLAIM", False)
+        member_groups.return_value = []
+
+        assert await auth.is_authorized_member({"oid": "user-1", "groups": [GROUP_ID]}) is False
+        member_groups.assert_awaited_once()
+
+
+class TestSharedCache:
+    async def test_membership_decided_by_another_instance_skips_graph(self, member_groups, shared_l2):
+        shared_l2["membership:user-1"] = {"value": True, "expiresAt": time.time() + 60}
+
+        assert await auth.check_group_membership("user-1") is True
+
+        member_groups.assert_not_awaited()
+        assert auth.auth_stats()["groupMembershipCache"]["l2Hits"] == 1
+
+    async def test_membership_decision_is_shared(self, member_groups, shared_l2):
+        await auth.check_group_membership("user-1")
+
+        assert shared_l2["membership:user-1"]["value"] is True
+
+    async def test_signing_keys_are_never_taken_from_shared_cache(self, jwks, shared_l2):
+        forged_key, forged_jwk = make_key("kid-1")
+        shared_l2["jwks:keys"] = {"value": {"keys": [forged_jwk]}, "expiresAt": time.time() + 60}
+
+        with pytest.raises(UnauthorizedError):
+            await auth.validate_token(make_token(forged_key))
+
+        jwks.assert_awaited_once()
+
+    async def test_jwks_is_not_written_to_shared_cache(self, jwks, shared_l2):
+        await auth.validate_token(make_token())
+
+        assert not any(key.startswith("jwks:") for key in shared_l2)
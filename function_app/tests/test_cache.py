@@ -0,0 +1,65 @@
+"""Tests for the in-process TTL/LRU cache."""
+
+from core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestTTLCache:
+    def test_hit_and_miss(self):
+        cache: TTLCache[str, int] = TTLCache(10, 60)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.stats()["hitRatio"] == 0.5
+
+    def test_entries_expire_but_stay_peekable(self):
+        clock = FakeClock()
+        cache: TTLCache[str, int] = TTLCache(10, 60, clock=clock)
+        cache.set("a", 1, etag="e1")
+        clock.now = 61
+        assert cache.get("a") is None
+        entry = cache.peek("a")
+        assert entry is not None
+        assert entry.etag == "e1"
+
+    def test_touch_extends_lifetime(self):
+        clock = FakeClock()
+        cache: TTLCache[str, int] = TTLCache(10, 60, clock=clock)
+        cache.set("a", 1)
+        clock.now = 61
+        cache.touch("a")
+        assert cache.get("a") == 1
+
+    def test_evicts_least_recently_used(self):
+        cache: TTLCache[str, int] = TTLCache(2, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.peek("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_disabled_cache_stores_nothing(self):
+        cache: TTLCache[str, int] = TTLCache(0, 60)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_get_stale_serves_expired_entries_within_max_age(self):
+        clock = FakeClock()
+        cache: TTLCache[str, str] = TTLCache(10, 5, clock=clock)
+        cache.set("a", "value")
+        clock.now = 30
+
+        assert cache.get("a") is None
+        assert cache.get_stale("a", max_age_seconds=60) == ("value", 30)
+        assert cache.get_stale("a", max_age_seconds=10) is None
+        assert cache.stats()["staleHits"] == 1
@@ -1,10 +1,14 @@
 """Tests for CosmosService."""
 
+import time
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from azure.cosmos.exceptions import CosmosResourceExistsError, CosmosResourceNotFoundError
 
-from services.cosmos_service import CosmosService
+from core.exceptions import DependencyBusyError
+from core.resilience import Bulkhead
+from services.cosmos_service import CosmosService, normalize_spn_name
 
 
 @pytest.fixture
@@ -14,6 +18,10 @@ def cosmos():
     svc._client = MagicMock()  # pretend initialized
     svc._spn_container = MagicMock()
     svc._audit_container = MagicMock()
+    svc._mirror_container = MagicMock()
+    svc._names_container = MagicMock()
+    svc._ownership_container = MagicMock()
+    svc._shared_cache_container = MagicMock()
     return svc
 
 
@@ -100,3 +108,88 @@ class TestKeyvaultMappings:
 
         name = await cosmos.remove_keyvault_mapping("spn-1", "nonexistent")
         assert name is None
+
+
+class TestSpnNameReservations:
+    async def test_reserves_free_name(self, cosmos):
+        cosmos._names_container.create_item = AsyncMock()
+
+        assert await cosmos.reserve_spn_name("My App") is True
+        item = cosmos._names_container.create_item.call_args[0][0]
+        assert item["name"] == "my app"
+        assert item["spnId"] is None
+
+    async def test_normalises_case_and_whitespace(self):
+        assert normalize_spn_name("  My App ") == normalize_spn_name("MY APP")
+
+    async def test_rejects_name_held_by_other_spn(self, cosmos):
+        cosmos._names_container.create_item = AsyncMock(side_effect=CosmosResourceExistsError())
+        cosmos._names_container.read_item = AsyncMock(return_value={"spnId": "other", "reservedAt": 0, "_etag": "e"})
+
+        assert await cosmos.reserve_spn_name("My App", "spn-1") is False
+
+    async def test_accepts_name_already_held_by_same_spn(self, cosmos):
+        cosmos._names_container.create_item = AsyncMock(side_effect=CosmosResourceExistsError())
+        cosmos._names_container.read_item = AsyncMock(return_value={"spnId": "spn-1", "reservedAt": 0, "_etag": "e"})
+
+        assert await cosmos.reserve_spn_name("my app", "spn-1") is True
+
+    async def test_takes_over_abandoned_pending_reservation(self, cosmos):
+        cosmos._names_container.create_item = AsyncMock(side_effect=CosmosResourceExistsError())
+        cosmos._names_container.read_item = AsyncMock(return_value={"spnId": None, "reservedAt": 0, "_etag": "e"})
+        cosmos._names_container.replace_item = AsyncMock()
+
+        assert await cosmos.reserve_spn_name("My App") is True
+        assert cosmos._names_container.replace_item.call_args.kwargs["etag"] == "e"
+
+    async def test_fresh_pending_reservation_blocks(self, cosmos):
+        cosmos._names_container.create_item = AsyncMock(side_effect=CosmosResourceExistsError())
+        cosmos._names_container.read_item = AsyncMock(
+            return_value={"spnId": None, "reservedAt": time.time(), "_etag": "e"}
+        )
+
+        assert await cosmos.reserve_spn_name("My App") is False
+
+    async def test_release_only_deletes_own_reservation(self, cosmos):
+        cosmos._names_container.read_item = AsyncMock(return_value={"spnId": "other", "_etag": "e"})
+        cosmos._names_container.delete_item = AsyncMock()
+
+        await cosmos.release_spn_name("My App", "spn-1")
+
+        cosmos._names_container.delete_item.assert_not_called()
+
+
+class TestOwnershipIndex:
+    async def test_entry_is_partitioned_by_user(self, cosmos):
+        cosmos._ownership_container.upsert_item = AsyncMock()
+        await cosmos.upsert_ownership("user-1", {"id": "spn-1", "displayName": "One"})
+        item = cosmos._ownership_container.upsert_item.call_args[0][0]
+        assert item == {"id": "spn-1", "spnId": "spn-1", "userOid": "user-1", "displayName": "One"}
+
+    async def test_ownership_check_is_a_point_read(self, cosmos):
+        cosmos._ownership_container.read_item = AsyncMock(side_effect=CosmosResourceNotFoundError())
+        assert await cosmos.get_ownership("user-1", "spn-1") is None
+        cosmos._ownership_container.read_item.assert_awaited_once_with(item="spn-1", partition_key="user-1")
+
+
+class TestSharedCacheItems:
+    async def test_item_expires_through_cosmos_ttl(self, cosmos):
+        cosmos._shared_cache_container.upsert_item = AsyncMock()
+        await cosmos.upsert_shared_cache_item({"id": "abc", "value": True}, 2.5)
+        item = cosmos._shared_cache_container.upsert_item.call_args[0][0]
+        assert item == {"id": "abc", "value": True, "ttl": 3}
+
+    async def test_missing_item_returns_none(self, cosmos):
+        cosmos._shared_cache_container.read_item = AsyncMock(side_effect=CosmosResourceNotFoundError())
+        assert await cosmos.get_shared_cache_item("abc") is None
+
+
+class TestBulkhead:
+    async def test_busy_cosmos_is_not_reported_as_not_found(self, cosmos):
+        cosmos._bulkhead = Bulkhead("cosmos", max_concurrent=1, max_wait_seconds=0.01)
+        cosmos._spn_container.read_item = AsyncMock(return_value={"id": "spn-1"})
+        async with cosmos._bulkhead:
+            with pytest.raises(DependencyBusyError):
+                await cosmos.get_spn_metadata("spn-1")
+        cosmos._spn_container.read_item.assert_not_called()
+        assert cosmos.stats()["bulkhead"]["rejected"] == 1
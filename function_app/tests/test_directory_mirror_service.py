@@ -0,0 +1,338 @@
+"""Tests for DirectoryMirrorService."""
+
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from core.config import settings
+from core.exceptions import GraphApiError
+from core.resilience import RetryPolicy
+from services.directory_mirror_service import DirectoryMirrorService
+from services.graph_service import DeltaTokenExpiredError, GraphService
+from tests.conftest import async_pages
+
+
+@pytest.fixture
+def cosmos():
+    mock = MagicMock()
+    mock.get_directory_sync_state = AsyncMock(return_value=None)
+    mock.save_directory_sync_state = AsyncMock()
+    mock.get_directory_application = AsyncMock(return_value=None)
+    mock.upsert_directory_application = AsyncMock()
+    mock.delete_directory_application = AsyncMock()
+    mock.find_directory_application_by_name = AsyncMock(return_value=None)
+    mock.list_directory_applications_with_stale_owners = AsyncMock(return_value=[])
+    mock.list_directory_application_ids = AsyncMock(return_value=[])
+    mock.iter_directory_applications_by_owner = MagicMock(side_effect=async_pages())
+    mock.upsert_ownership = AsyncMock()
+    mock.delete_ownership = AsyncMock()
+    mock.get_ownership = AsyncMock(return_value=None)
+    mock.iter_owned_applications = MagicMock(side_effect=async_pages())
+    with patch("services.directory_mirror_service.cosmos_service", mock):
+        yield mock
+
+
+@pytest.fixture
+def graph():
+    mock = MagicMock()
+    mock.iter_application_delta = MagicMock(side_effect=async_pages())
+    mock.list_owners_bulk = AsyncMock(return_value={})
+    mock.list_owners = AsyncMock(return_value=[])
+    mock.check_duplicate_name = AsyncMock(return_value=False)
+    mock.iter_owned_application_pages = MagicMock(side_effect=async_pages())
+    with patch("services.graph_service.graph_service", mock):
+        yield mock
+
+
+@pytest.fixture
+def mirror_mode(monkeypatch):
+    monkeypatch.setattr(settings, "DIRECTORY_MIRROR_MODE", "mirror")
+
+
+@pytest.fixture
+def index_mode(mirror_mode, monkeypatch):
+    monkeypatch.setattr(settings, "OWNERSHIP_INDEX_ENABLED", True)
+
+
+@pytest.fixture
+def mirror(cosmos, graph):
+    return DirectoryMirrorService()
+
+
+def live_graph(handler) -> tuple[GraphService, list[httpx.Request]]:
+    """A real GraphService answering through *handler*; returns it and the captured requests."""
+    live = GraphService()
+    live.get_access_token = AsyncMock(return_value="fake-token")  # type: ignore[method-assign]
+    live._retry_policy = RetryPolicy(max_retries=0)
+    seen: list[httpx.Request] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return handler(request)
+
+    live._http_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    return live, seen
+
+
+OWNER = {"id": "user-1", "displayName": "User One", "mail": "u1@example.com", "userPrincipalName": "u1"}
+
+
+class TestSync:
+    async def test_applies_upserts_and_removals(self, mirror, cosmos, graph):
+        changes = [
+            {"id": "app-1", "appId": "a1", "displayName": "One"},
+            {"id": "app-2", "@removed": {"reason": "deleted"}},
+        ]
+        graph.iter_application_delta.side_effect = async_pages((changes, "https://graph/delta?token=1"))
+        graph.list_owners_bulk.return_value = {"app-1": [OWNER]}
+
+        counts = await mirror.sync()
+
+        assert counts == {"changed": 1, "removed": 1, "ownersRefreshed": 0}
+        cosmos.delete_directory_application.assert_awaited_once_with("app-2")
+        doc = cosmos.upsert_directory_application.call_args[0][0]
+        assert doc["displayNameLower"] == "one"
+        assert doc["ownerIds"] == ["user-1"]
+        state = cosmos.save_directory_sync_state.call_args[0][0]
+        assert state["deltaLink"] == "https://graph/delta?token=1"
+
+    async def test_incremental_round_merges_with_existing(self, mirror, cosmos, graph):
+        cosmos.get_directory_sync_state.return_value = {"deltaLink": "https://graph/delta?token=1"}
+        cosmos.get_directory_application.return_value = {
+            "id": "app-1",
+            "displayName": "One",
+            "owners": [OWNER],
+            "ownerIds": ["user-1"],
+            "ownersSyncedAt": 1,
+        }
+        graph.iter_application_delta.side_effect = async_pages(([{"id": "app-1", "description": "new"}], "link-2"))
+        graph.list_owners_bulk.return_value = {}
+
+        await mirror.sync()
+
+        graph.iter_application_delta.assert_called_once_with("https://graph/delta?token=1")
+        doc = cosmos.upsert_directory_application.call_args[0][0]
+        assert doc["displayName"] == "One"
+        assert doc["description"] == "new"
+        assert doc["ownerIds"] == ["user-1"]
+
+    async def test_full_resync_when_delta_link_expired(self, mirror, cosmos, graph):
+        cosmos.get_directory_sync_state.return_value = {"deltaLink": "expired"}
+
+        def delta(link):
+            if link == "expired":
+                raise DeltaTokenExpiredError()
+            return async_pages(([], "fresh"))()
+
+        graph.iter_application_delta.side_effect = delta
+
+        await mirror.sync()
+
+        assert cosmos.save_directory_sync_state.call_args[0][0]["deltaLink"] == "fresh"
+
+    async def test_refreshes_stale_owner_lists(self, mirror, cosmos, graph):
+        cosmos.list_directory_applications_with_stale_owners.return_value = ["app-1"]
+        cosmos.get_directory_application.return_value = {"id": "app-1", "ownerIds": []}
+        graph.list_owners_bulk.return_value = {"app-1": [OWNER]}
+
+        counts = await mirror.sync()
+
+        assert counts["ownersRefreshed"] == 1
+        assert cosmos.upsert_directory_application.call_args[0][0]["ownerIds"] == ["user-1"]
+
+    async def test_deleted_apps_are_dropped_instead_of_refreshed(self, mirror, cosmos, graph):
+        cosmos.list_directory_applications_with_stale_owners.return_value = ["gone", "app-1"]
+        cosmos.get_directory_application.return_value = {"id": "app-1", "ownerIds": []}
+        graph.list_owners_bulk.return_value = {"gone": None, "app-1": [OWNER]}
+
+        counts = await mirror.sync()
+
+        assert counts["ownersRefreshed"] == 1
+        cosmos.delete_directory_application.assert_awaited_once_with("gone")
+
+    async def test_full_resync_sweeps_apps_it_did_not_see(self, mirror, cosmos, graph):
+        graph.iter_application_delta.side_effect = async_pages(([{"id": "app-1", "displayName": "One"}], "link"))
+        cosmos.list_directory_application_ids.return_value = ["app-1", "ghost"]
+
+        counts = await mirror.sync()
+
+        assert counts["removed"] == 1
+        cosmos.delete_directory_application.assert_awaited_once_with("ghost")
+
+    async def test_full_resync_keeps_owners_whose_read_failed(self, mirror, cosmos, graph, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"ownershipIndexBuilt": True}
+        graph.iter_application_delta.side_effect = async_pages(([{"id": "app-1", "displayName": "One"}], "link"))
+        graph.list_owners_bulk.return_value = {}  # transient failure: app-1 left out
+        cosmos.get_directory_application.return_value = {
+            "id": "app-1",
+            "owners": [OWNER],
+            "ownerIds": ["user-1"],
+            "ownersSyncedAt": 123.0,
+        }
+
+        await mirror.sync()
+
+        doc = cosmos.upsert_directory_application.call_args[0][0]
+        assert (doc["ownerIds"], doc["ownersSyncedAt"]) == (["user-1"], 123.0)
+        cosmos.upsert_ownership.assert_awaited_once()
+        cosmos.delete_ownership.assert_not_called()
+
+    async def test_incremental_round_does_not_sweep(self, mirror, cosmos, graph):
+        cosmos.get_directory_sync_state.return_value = {"deltaLink": "https://graph/delta?token=1"}
+        graph.iter_application_delta.side_effect = async_pages(([], "link-2"))
+
+        await mirror.sync()
+
+        cosmos.list_directory_application_ids.assert_not_called()
+
+    async def test_names_are_stored_normalised(self, mirror, cosmos, graph):
+        graph.iter_application_delta.side_effect = async_pages(([{"id": "app-1", "displayName": " Straße "}], "link"))
+
+        await mirror.sync()
+
+        assert cosmos.upsert_directory_application.call_args[0][0]["displayNameLower"] == "strasse"
+
+
+class TestReads:
+    async def test_live_mode_uses_graph(self, mirror, cosmos, graph):
+        graph.check_duplicate_name.return_value = True
+        assert await mirror.check_duplicate_name("x") is True
+        cosmos.find_directory_application_by_name.assert_not_called()
+
+    async def test_fresh_mirror_answers_listing(self, mirror, cosmos, graph, mirror_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time()}
+        cosmos.iter_directory_applications_by_owner.side_effect = async_pages([{"id": "app-1"}, {"id": "app-2"}])
+
+        pages = [page async for page in mirror.iter_owned_application_pages("user-1", max_items=1)]
+
+        assert pages == [[{"id": "app-1"}]]
+        graph.iter_owned_application_pages.assert_not_called()
+
+    async def test_stale_mirror_falls_back_to_graph(self, mirror, cosmos, graph, mirror_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time() - 10_000}
+        graph.iter_owned_application_pages.side_effect = async_pages([{"id": "live"}])
+
+        pages = [page async for page in mirror.iter_owned_application_pages("user-1")]
+
+        assert pages == [[{"id": "live"}]]
+
+    async def test_mirror_failure_falls_back_to_graph(self, mirror, cosmos, graph, mirror_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time()}
+        cosmos.find_directory_application_by_name.side_effect = Exception("boom")
+
+        assert await mirror.check_duplicate_name("x") is False
+        graph.check_duplicate_name.assert_awaited_once_with("x")
+
+
+class TestIsOwner:
+    async def test_trusts_fresh_positive_answer(self, mirror, cosmos, graph, mirror_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time()}
+        cosmos.get_directory_application.return_value = {"ownerIds": ["user-1"], "ownersSyncedAt": time.time()}
+
+        assert await mirror.is_owner("app-1", "user-1") is True
+        graph.list_owners.assert_not_called()
+
+    async def test_confirms_negative_answer_against_graph(self, mirror, cosmos, graph, mirror_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time()}
+        cosmos.get_directory_application.return_value = {"ownerIds": [], "ownersSyncedAt": time.time()}
+        graph.list_owners.return_value = [OWNER]
+
+        assert await mirror.is_owner("app-1", "user-1") is True
+        graph.list_owners.assert_awaited_once_with("app-1", fresh=False)
+
+
+class TestWriteThrough:
+    async def test_noop_in_live_mode(self, mirror, cosmos):
+        await mirror.record_application({"id": "app-1"})
+        await mirror.forget_application("app-1")
+        cosmos.upsert_directory_application.assert_not_called()
+        cosmos.delete_directory_application.assert_not_called()
+
+    async def test_owner_changes_update_document(self, mirror, cosmos, mirror_mode):
+        cosmos.get_directory_application.return_value = {"id": "app-1", "owners": [OWNER], "ownerIds": ["user-1"]}
+
+        await mirror.record_owner_added("app-1", {"id": "user-2"})
+        assert cosmos.upsert_directory_application.call_args[0][0]["ownerIds"] == ["user-1", "user-2"]
+
+        await mirror.record_owner_removed("app-1", "user-1")
+        assert cosmos.upsert_directory_application.call_args[0][0]["ownerIds"] == []
+
+
+class TestOwnershipIndex:
+    async def test_first_sync_is_a_full_resync_that_builds_the_index(self, mirror, cosmos, graph, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"deltaLink": "https://graph/delta?token=1"}
+        graph.iter_application_delta.side_effect = async_pages(([{"id": "app-1", "displayName": "One"}], "link-2"))
+        graph.list_owners_bulk.return_value = {"app-1": [OWNER]}
+
+        await mirror.sync()
+
+        graph.iter_application_delta.assert_called_once_with(None)
+        user_oid, entry = cosmos.upsert_ownership.call_args[0]
+        assert (user_oid, entry["id"], entry["displayName"]) == ("user-1", "app-1", "One")
+        assert "owners" not in entry
+        assert cosmos.save_directory_sync_state.call_args[0][0]["ownershipIndexBuilt"] is True
+
+    async def test_owner_changes_maintain_entries(self, mirror, cosmos, index_mode):
+        cosmos.get_directory_application.return_value = {"id": "app-1", "owners": [OWNER], "ownerIds": ["user-1"]}
+
+        await mirror.record_owner_added("app-1", {"id": "user-2"})
+        assert {c[0][0] for c in cosmos.upsert_ownership.call_args_list} == {"user-1", "user-2"}
+
+        await mirror.record_owner_removed("app-1", "user-1")
+        cosmos.delete_ownership.assert_awaited_once_with("user-1", "app-1")
+
+    async def test_forgotten_application_drops_entries(self, mirror, cosmos, index_mode):
+        cosmos.get_directory_application.return_value = {"id": "app-1", "ownerIds": ["user-1", "user-2"]}
+
+        await mirror.forget_application("app-1")
+
+        assert cosmos.delete_ownership.await_count == 2
+        cosmos.delete_directory_application.assert_awaited_once_with("app-1")
+
+    async def test_is_owner_is_a_point_read(self, mirror, cosmos, graph, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time(), "ownershipIndexBuilt": True}
+        cosmos.get_ownership.return_value = {"id": "app-1", "ownersSyncedAt": time.time()}
+
+        assert await mirror.is_owner("app-1", "user-1") is True
+        cosmos.get_ownership.assert_awaited_once_with("user-1", "app-1")
+        cosmos.get_directory_application.assert_not_called()
+        graph.list_owners.assert_not_called()
+
+    async def test_listing_is_a_single_partition_query(self, mirror, cosmos, graph, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time(), "ownershipIndexBuilt": True}
+        cosmos.iter_owned_applications.side_effect = async_pages([{"id": "app-1"}])
+
+        pages = [page async for page in mirror.iter_owned_application_pages("user-1")]
+
+        assert pages == [[{"id": "app-1"}]]
+        cosmos.iter_owned_applications.assert_called_once_with("user-1", settings.GRAPH_PAGE_SIZE)
+        cosmos.iter_directory_applications_by_owner.assert_not_called()
+
+    async def test_unbuilt_index_is_not_read(self, mirror, cosmos, graph, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time()}
+        cosmos.get_directory_application.return_value = {"ownerIds": ["user-1"], "ownersSyncedAt": time.time()}
+
+        assert await mirror.is_owner("app-1", "user-1") is True
+        cosmos.get_ownership.assert_not_called()
+
+    async def test_strict_check_goes_to_graph(self, mirror, cosmos, index_mode):
+        cosmos.get_directory_sync_state.return_value = {"lastSyncedAt": time.time(), "ownershipIndexBuilt": True}
+        cosmos.get_ownership.return_value = {"id": "app-1", "ownersSyncedAt": time.time()}
+        live, seen = live_graph(lambda r: httpx.Response(200, json={"value": []}))
+        # A warm owner cache that still lists the user must not answer
+        live._owner_cache.set("app-1", {"value": [OWNER]})
+
+        with patch("services.graph_service.graph_service", live):
+            assert await mirror.is_owner("app-1", "user-1", strict=True) is False
+
+        cosmos.get_ownership.assert_not_called()
+        assert [r.url.path for r in seen] == ["/v1.0/applications/app-1/owners"]
+
+    async def test_strict_check_never_uses_stale_owners(self, mirror, cosmos, index_mode):
+        live, _ = live_graph(lambda r: httpx.Response(503))
+        live._owner_cache.set("app-1", {"value": [OWNER]}, ttl_seconds=0)
+
+        with patch("services.graph_service.graph_service", live), pytest.raises(GraphApiError):
+            await mirror.is_owner("app-1", "user-1", strict=True)
@@ -0,0 +1,130 @@
+"""GraphService against the stateful Graph emulator (request counts, paging, throttling)."""
+
+import random
+from unittest.mock import AsyncMock
+
+import pytest
+
+from core.config import settings
+from core.resilience import RetryPolicy
+from services.graph_service import GraphService
+from tests.graph_emulator import GraphEmulator, Latency
+
+
+@pytest.fixture
+def emulator():
+    emulator = GraphEmulator(seed=7, retry_after_seconds=0)
+    emulator.tenant.seed(users=3, applications=250, rng=emulator.rng)
+    return emulator
+
+
+@pytest.fixture
+def graph(emulator):
+    svc = GraphService()
+    svc.get_access_token = AsyncMock(return_value="fake-token")  # type: ignore[method-assign]
+    svc._retry_policy = RetryPolicy(max_retries=3, base_delay=0, max_delay=0)
+    svc._http_client = emulator.client()
+    return svc
+
+
+def owner_of_most(emulator: GraphEmulator) -> str:
+    counts = {u: sum(u in owners for owners in emulator.tenant.app_owners.values()) for u in emulator.tenant.users}
+    return max(counts, key=lambda u: counts[u])
+
+
+class TestLatency:
+    def test_constant(self):
+        assert Latency(median_ms=5).sample(random.Random(0)) == 0.005
+
+    def test_lognormal_is_capped(self):
+        rng = random.Random(0)
+        samples = [Latency(median_ms=10, sigma=2, max_ms=50).sample(rng) for _ in range(500)]
+        assert max(samples) == 0.05
+        assert min(samples) < 0.01
+
+
+class TestGraphServiceAgainstEmulator:
+    async def test_owned_applications_are_paged_and_projected(self, graph, emulator):
+        user = owner_of_most(emulator)
+        expected = sum(user in owners for owners in emulator.tenant.app_owners.values())
+
+        apps = await graph.list_owned_applications(user)
+
+        assert len(apps) == expected
+        assert "requiredResourceAccess" not in apps[0]
+        assert emulator.stats()["requests"]["GET users"] == -(-expected // settings.GRAPH_PAGE_SIZE)
+
+    async def test_create_and_provision_take_two_requests(self, graph, emulator):
+        user = next(iter(emulator.tenant.users))
+
+        app = await graph.create_application("payments-worker")
+        owners = await graph.provision_application(app["id"], app["appId"], user)
+
+        assert [o["id"] for o in owners] == [user]
+        assert emulator.stats()["totalRequests"] == 2
+        assert graph.known_service_principal_id(app["id"]) is not None
+
+    async def test_injected_throttling_is_retried(self, graph, emulator):
+        user = next(iter(emulator.tenant.users))
+        emulator.throttle_next(2, "users")
+
+        assert (await graph.get_user(user))["id"] == user
+        assert emulator.stats()["throttled"] == 2
+        assert emulator.stats()["requests"]["GET users"] == 3
+
+    async def test_throttled_batch_items_are_resent(self, graph, emulator):
+        app_ids = list(emulator.tenant.applications)[:5]
+        emulator.throttle_next(1, "applications")
+
+        owners = await graph.list_owners_bulk(app_ids)
+
+        assert set(owners) == set(app_ids)
+        assert emulator.stats()["requests"]["POST $batch"] == 2
+
+    async def test_expired_application_is_revalidated_with_etag(self, graph, emulator):
+        app_id = next(iter(emulator.tenant.applications))
+        await graph.get_application(app_id)
+        graph._app_cache.peek(app_id).expires_at = 0
+
+        assert (await graph.get_application(app_id))["id"] == app_id
+        assert emulator.stats()["requests"]["GET applications"] == 2
+        assert graph.stats()["applicationCache"]["size"] == 1
+
+    async def test_delta_reports_deleted_applications(self, graph, emulator):
+        delta_link = None
+        count = 0
+        async for changes, link in graph.iter_application_delta():
+            count += len(changes)
+            delta_link = link or delta_link
+        app_id = next(iter(emulator.tenant.applications))
+        await graph.delete_application(app_id)
+
+        changes = [c async for c, _ in graph.iter_application_delta(delta_link)]
+
+        assert count == 250
+        assert changes == [[{"id": app_id, "@removed": {"reason": "deleted"}}]]
+
+    async def test_group_membership(self, graph, emulator):
+        user = next(iter(emulator.tenant.users))
+        group = next(iter(emulator.tenant.groups))
+
+        assert await graph.check_member_groups(user, [group, "other"]) == [group]
+        assert await graph._is_group_member(group, user) is True
+        members, _ = await graph._refresh_group_members(group)
+        assert members == frozenset(emulator.tenant.users)
+
+
+class TestLoopback:
+    async def test_graph_api_base_can_point_at_emulator(self, graph, emulator, monkeypatch):
+        server = emulator.serve()
+        host, port = server.server_address[:2]
+        monkeypatch.setattr(settings, "GRAPH_API_BASE", f"http://{host}:{port}/v1.0")
+        graph._http_client = None
+        user = next(iter(emulator.tenant.users))
+        try:
+            assert (await graph.get_user(user))["id"] == user
+        finally:
+            await graph.aclose()
+            server.shutdown()
+            server.server_close()
+        assert emulator.stats()["requests"]["GET users"] == 1
@@ -0,0 +1,717 @@
+"""Tests for GraphService."""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+
+from core import json_codec
+from core.cache import stale_age
+from core.config import settings
+from core.exceptions import GraphApiError, GraphUnavailableError, SpnNotFoundError
+from core.resilience import Bulkhead, RetryPolicy
+from models.owner import OWNER_GRAPH_SELECT
+from models.spn import SERVICE_PRINCIPAL_GRAPH_SELECT, SPN_GRAPH_SELECT
+from services.graph_service import GraphService
+
+
+@pytest.fixture
+def graph():
+    """Create a GraphService with a stubbed token provider."""
+    svc = GraphService()
+    svc.get_access_token = AsyncMock(return_value="fake-token")  # type: ignore[method-assign]
+    svc._retry_policy = RetryPolicy(max_retries=3, base_delay=0, max_delay=0)
+    return svc
+
+
+def use_transport(svc: GraphService, handler) -> list[httpx.Request]:
+    """Route *svc*'s HTTP client through a mock transport; returns the captured requests."""
+    seen: list[httpx.Request] = []
+
+    def _handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        return handler(request)
+
+    svc._http_client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    return seen
+
+
+class TestHttpClient:
+    async def test_client_is_reused_across_calls(self, graph):
+        first = graph.get_http_client()
+        assert graph.get_http_client() is first
+        await graph.aclose()
+
+    async def test_aclose_releases_client(self, graph):
+        client = graph.get_http_client()
+        await graph.aclose()
+        assert client.is_closed
+        assert graph.get_http_client() is not client
+        await graph.aclose()
+
+    async def test_requests_share_one_client(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "user-1"}))
+        client = graph._http_client
+
+        await graph.get_user("user-1")
+        await graph.get_user("user-1")
+
+        assert len(seen) == 2
+        assert graph._http_client is client
+        assert seen[0].headers["Authorization"] == "Bearer fake-token"
+
+
+class TestListOwnedApplications:
+    async def test_follows_next_link(self, graph):
+        next_link = f"{settings.GRAPH_API_BASE}/users/u1/ownedObjects/microsoft.graph.application?$skiptoken=abc"
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if "skiptoken" in str(request.url):
+                return httpx.Response(200, json={"value": [{"id": "app-2"}]})
+            return httpx.Response(200, json={"value": [{"id": "app-1"}], "@odata.nextLink": next_link})
+
+        seen = use_transport(graph, handler)
+        apps = await graph.list_owned_applications("u1")
+
+        assert [a["id"] for a in apps] == ["app-1", "app-2"]
+        assert len(seen) == 2
+        assert str(seen[1].url) == next_link
+
+
+def paged_handler(total_pages: int, per_page: int = 2):
+    """Serve *total_pages* pages of owned applications linked by ``@odata.nextLink``."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", "0"))
+        body: dict = {"value": [{"id": f"app-{page}-{i}"} for i in range(per_page)]}
+        if page + 1 < total_pages:
+            body["@odata.nextLink"] = f"{settings.GRAPH_API_BASE}/users/u1/ownedObjects?page={page + 1}"
+        return httpx.Response(200, json=body)
+
+    return handler
+
+
+class TestIterOwnedApplicationPages:
+    async def test_yields_pages_in_order(self, graph):
+        use_transport(graph, paged_handler(3))
+        pages = [page async for page in graph.iter_owned_application_pages("u1")]
+        assert [[a["id"] for a in p] for p in pages] == [
+            ["app-0-0", "app-0-1"],
+            ["app-1-0", "app-1-1"],
+            ["app-2-0", "app-2-1"],
+        ]
+
+    async def test_prefetches_next_page(self, graph):
+        seen = use_transport(graph, paged_handler(3))
+        pages = graph.iter_owned_application_pages("u1")
+
+        await pages.__anext__()
+        await asyncio.sleep(0.01)  # let the prefetch run while the page is "processed"
+        assert len(seen) == 2
+        await pages.aclose()
+
+    async def test_max_items_caps_results(self, graph):
+        seen = use_transport(graph, paged_handler(5))
+        pages = [page async for page in graph.iter_owned_application_pages("u1", max_items=3)]
+        assert sum(len(p) for p in pages) == 3
+        assert len(seen) == 2
+
+    async def test_max_pages_caps_requests(self, graph):
+        seen = use_transport(graph, paged_handler(5))
+        pages = [page async for page in graph.iter_owned_application_pages("u1", max_pages=1)]
+        assert len(pages) == 1
+        assert len(seen) == 1
+
+
+def batch_handler(statuses: dict[str, int], bodies: dict[str, dict] | None = None):
+    """Build a ``$batch`` handler answering each sub-request id with the given status."""
+    bodies = bodies or {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/$batch"):
+            subs = json.loads(request.content)["requests"]
+            return httpx.Response(
+                200,
+                json={
+                    "responses": [
+                        {"id": sub["id"], "status": statuses.get(sub["id"], 200), "body": bodies.get(sub["id"], {})}
+                        for sub in subs
+                    ]
+                },
+            )
+        return httpx.Response(204)
+
+    return handler
+
+
+class TestBatch:
+    async def test_splits_at_twenty_requests(self, graph):
+        seen = use_transport(graph, batch_handler({}))
+        subs = [{"id": str(i), "method": "GET", "url": f"/applications/{i}"} for i in range(45)]
+
+        results = await graph._batch(subs)
+
+        assert len(results) == 45
+        assert [len(json.loads(r.content)["requests"]) for r in seen] == [20, 20, 5]
+
+    async def test_failed_dependency_in_earlier_chunk_is_not_sent(self, graph):
+        seen = use_transport(graph, batch_handler({"0": 500}))
+        subs = [{"id": str(i), "method": "GET", "url": f"/applications/{i}"} for i in range(20)]
+        subs.append({"id": "late", "method": "GET", "url": "/applications/late", "dependsOn": ["0"]})
+
+        results = await graph._batch(subs)
+
+        assert results["late"]["status"] == 424
+        assert len(seen) == 1
+
+    async def test_depends_on_kept_within_chunk(self, graph):
+        seen = use_transport(graph, batch_handler({}))
+        await graph._batch(
+            [
+                {"id": "a", "method": "PATCH", "url": "/applications/x", "body": {"tags": []}},
+                {"id": "b", "method": "GET", "url": "/applications/x", "dependsOn": ["a"]},
+            ]
+        )
+
+        sent = json.loads(seen[0].content)["requests"]
+        assert sent[0]["headers"]["Content-Type"] == "application/json"
+        assert sent[1]["dependsOn"] == ["a"]
+
+
+class TestBatchedOperations:
+    async def test_add_owner_unindexed_costs_two_round_trips_and_fills_index(self, graph):
+        seen = use_transport(
+            graph,
+            batch_handler({"owner": 204, "spOwner": 204}, {"app": {"appId": "client-1"}, "sp": {"id": "sp-1"}}),
+        )
+
+        await graph.add_owner("app-1", "user-1")
+
+        assert len(seen) == 2
+        sent = json.loads(seen[1].content)["requests"]
+        assert sent[0]["url"] == "/servicePrincipals(appId='client-1')/owners/$ref"
+        assert graph.known_service_principal_id("app-1") == "sp-1"
+
+    async def test_add_owner_indexed_costs_one_round_trip(self, graph):
+        graph._sp_ids["app-1"] = "sp-1"
+        seen = use_transport(graph, batch_handler({"owner": 204, "spOwner": 204}))
+
+        await graph.add_owner("app-1", "user-1")
+
+        assert len(seen) == 1
+        sent = json.loads(seen[0].content)["requests"]
+        assert [r["url"] for r in sent] == ["/applications/app-1/owners/$ref", "/servicePrincipals/sp-1/owners/$ref"]
+
+    async def test_remove_owner_uses_passed_service_principal_id(self, graph):
+        seen = use_transport(graph, batch_handler({"owner": 204, "spOwner": 204}))
+
+        await graph.remove_owner("app-1", "user-1", service_principal_id="sp-9")
+
+        assert len(seen) == 1
+        sent = json.loads(seen[0].content)["requests"]
+        assert sent[1]["url"] == "/servicePrincipals/sp-9/owners/user-1/$ref"
+        assert graph.known_service_principal_id("app-1") == "sp-9"
+
+    async def test_remove_owner_drops_cached_ownership_decision(self, graph):
+        graph._sp_ids["app-1"] = "sp-1"
+        use_transport(graph, batch_handler({"owner": 204, "spOwner": 204}))
+        await graph.ownership_decisions.set("app-1:user-1", True)
+
+        await graph.remove_owner("app-1", "user-1")
+
+        assert await graph.ownership_decisions.get("app-1:user-1") is None
+
+    async def test_owners_bulk_marks_deleted_apps_and_skips_failures(self, graph):
+        use_transport(graph, batch_handler({"1": 404, "2": 500}, {"0": {"value": [{"id": "user-1"}]}}))
+
+        owners = await graph.list_owners_bulk(["app-0", "app-1", "app-2"])
+
+        assert owners == {"app-0": [{"id": "user-1"}], "app-1": None}
+
+    async def test_provision_indexes_service_principal(self, graph):
+        use_transport(graph, batch_handler({"appOwner": 204, "spOwner": 204}, {"sp": {"id": "sp-1"}}))
+
+        await graph.provision_application("app-1", "client-1", "user-1")
+
+        assert graph.known_service_principal_id("app-1") == "sp-1"
+
+    async def test_add_owner_raises_when_app_owner_fails(self, graph):
+        use_transport(graph, batch_handler({"owner": 400}, {"owner": {"error": {"code": "BadRequest"}}}))
+
+        with pytest.raises(GraphApiError):
+            await graph.add_owner("app-1", "user-1")
+
+    async def test_remove_owner_app_not_found(self, graph):
+        use_transport(graph, batch_handler({"owner": 204, "app": 404}))
+
+        with pytest.raises(SpnNotFoundError):
+            await graph.remove_owner("app-1", "user-1")
+
+    async def test_get_application_with_owners(self, graph):
+        seen = use_transport(
+            graph,
+            batch_handler({}, {"app": {"id": "app-1"}, "owners": {"value": [{"id": "user-1"}]}}),
+        )
+
+        app, owners = await graph.get_application_with_owners("app-1")
+
+        assert app["id"] == "app-1"
+        assert owners == [{"id": "user-1"}]
+        assert len(seen) == 1
+
+    async def test_provision_application_tolerates_sp_owner_failure(self, graph):
+        use_transport(
+            graph,
+            batch_handler(
+                {"sp": 201, "appOwner": 204, "spOwner": 400},
+                {"owners": {"value": [{"id": "user-1"}]}},
+            ),
+        )
+
+        owners = await graph.provision_application("app-1", "client-1", "user-1")
+
+        assert owners == [{"id": "user-1"}]
+
+    async def test_provision_application_raises_when_sp_fails(self, graph):
+        use_transport(graph, batch_handler({"sp": 400, "appOwner": 204, "spOwner": 424}))
+
+        with pytest.raises(GraphApiError):
+            await graph.provision_application("app-1", "client-1", "user-1")
+
+
+def flaky_handler(failures: list[httpx.Response], final: httpx.Response):
+    """Return each response in *failures* once, then *final* forever."""
+    pending = list(failures)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return pending.pop(0) if pending else final
+
+    return handler
+
+
+class TestRetries:
+    async def test_retries_throttled_get_honouring_retry_after(self, graph):
+        seen = use_transport(
+            graph,
+            flaky_handler(
+                [httpx.Response(429, headers={"Retry-After": "0"})],
+                httpx.Response(200, json={"id": "app-1"}),
+            ),
+        )
+
+        app = await graph.get_application("app-1")
+
+        assert app["id"] == "app-1"
+        assert len(seen) == 2
+        assert graph._rate_limiter.stats()["throttled"] == 1
+
+    async def test_retries_transient_5xx(self, graph):
+        seen = use_transport(
+            graph,
+            flaky_handler([httpx.Response(503), httpx.Response(502)], httpx.Response(200, json={"value": []})),
+        )
+
+        assert await graph.list_owners("app-1") == []
+        assert len(seen) == 3
+
+    async def test_gives_up_after_max_retries(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(503))
+
+        with pytest.raises(GraphApiError):
+            await graph.list_owners("app-1")
+        assert len(seen) == 4  # 1 attempt + 3 retries
+
+    async def test_does_not_retry_non_idempotent_post(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(503))
+
+        with pytest.raises(GraphApiError):
+            await graph.add_password("app-1", "secret", 30)
+        assert len(seen) == 1
+
+    async def test_retried_delete_treats_404_as_deleted(self, graph):
+        # The first DELETE went through but its response was lost
+        seen = use_transport(graph, flaky_handler([httpx.Response(503)], httpx.Response(404)))
+
+        await graph.delete_application("app-1")
+        assert len(seen) == 2
+
+    async def test_first_delete_404_is_an_error(self, graph):
+        use_transport(graph, lambda r: httpx.Response(404, json={"error": {"code": "Request_ResourceNotFound"}}))
+
+        with pytest.raises(GraphApiError):
+            await graph.delete_application("app-1")
+
+    async def test_does_not_resend_owner_removal_batch(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(503))
+
+        with pytest.raises(GraphApiError):
+            await graph.remove_owner("app-1", "user-1", service_principal_id="sp-1")
+        assert len(seen) == 1
+
+    async def test_does_not_wait_beyond_retry_after_cap(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(429, headers={"Retry-After": "3600"}))
+
+        with pytest.raises(GraphApiError):
+            await graph.list_owners("app-1")
+        assert len(seen) == 1
+
+    async def test_resends_throttled_batch_reads(self, graph):
+        calls: list[list[str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            subs = json.loads(request.content)["requests"]
+            calls.append([sub["id"] for sub in subs])
+            first = len(calls) == 1
+            return httpx.Response(
+                200,
+                json={
+                    "responses": [
+                        {
+                            "id": sub["id"],
+                            "status": 429 if first and sub["id"] == "owners" else 200,
+                            "headers": {"Retry-After": "0"},
+                            "body": {"value": []},
+                        }
+                        for sub in subs
+                    ]
+                },
+            )
+
+        use_transport(graph, handler)
+        await graph.get_application_with_owners("app-1")
+
+        assert calls == [["app", "owners"], ["owners"]]
+
+
+class TestCoalescing:
+    @staticmethod
+    def slow_transport(graph, body: dict) -> list[httpx.Request]:
+        seen: list[httpx.Request] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json=body)
+
+        graph._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return seen
+
+    async def test_identical_concurrent_reads_share_one_call(self, graph):
+        seen = self.slow_transport(graph, {"id": "app-1"})
+
+        results = await asyncio.gather(*(graph.get_application("app-1") for _ in range(5)))
+
+        assert all(r["id"] == "app-1" for r in results)
+        assert len(seen) == 1
+        assert graph.stats()["coalescing"] == {"upstreamReads": 1, "coalescedReads": 4}
+
+    async def test_different_reads_are_not_coalesced(self, graph):
+        seen = self.slow_transport(graph, {"value": []})
+
+        await asyncio.gather(graph.list_owners("app-1"), graph.list_owners("app-2"))
+
+        assert len(seen) == 2
+
+    async def test_sequential_reads_are_not_coalesced(self, graph):
+        seen = self.slow_transport(graph, {"id": "user-1"})
+
+        await graph.get_user("user-1")
+        await graph.get_user("user-1")
+
+        assert len(seen) == 2
+
+    async def test_identical_read_batches_share_one_call(self, graph):
+        seen = self.slow_transport(graph, {"responses": [{"id": "app", "status": 200, "body": {"id": "app-1"}}]})
+
+        await asyncio.gather(
+            *(graph._batch([{"id": "app", "method": "GET", "url": "/applications/app-1"}]) for _ in range(3))
+        )
+
+        assert len(seen) == 1
+
+    async def test_errors_are_shared(self, graph):
+        graph._http_client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(404)))
+
+        results = await asyncio.gather(
+            graph.get_application("missing"), graph.get_application("missing"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, SpnNotFoundError) for r in results)
+
+
+class TestReadThroughCache:
+    async def test_get_application_is_cached(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "app-1"}))
+
+        await graph.get_application("app-1")
+        await graph.get_application("app-1")
+
+        assert len(seen) == 1
+        assert graph.stats()["applicationCache"]["hitRatio"] == 0.5
+
+    async def test_not_found_is_not_cached(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(404))
+
+        for _ in range(2):
+            with pytest.raises(SpnNotFoundError):
+                await graph.get_application("missing")
+        assert len(seen) == 2
+
+    async def test_expired_entry_is_revalidated_with_etag(self, graph):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == 'W/"1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json={"id": "app-1"}, headers={"ETag": 'W/"1"'})
+
+        seen = use_transport(graph, handler)
+        await graph.get_application("app-1")
+        graph._app_cache.peek("app-1").expires_at = 0  # type: ignore[union-attr]
+
+        app = await graph.get_application("app-1")
+
+        assert app == {"id": "app-1"}
+        assert len(seen) == 2
+        assert seen[1].headers["If-None-Match"] == 'W/"1"'
+        assert graph._app_cache.get("app-1") == {"id": "app-1"}
+
+    async def test_password_changes_invalidate_application(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "app-1", "keyId": "k"}))
+
+        await graph.get_application("app-1")
+        await graph.add_password("app-1", "secret", 30)
+        await graph.get_application("app-1")
+
+        assert len(seen) == 3
+
+    async def test_owner_changes_invalidate_owner_list(self, graph):
+        graph._owner_cache.set("app-1", {"value": [{"id": "user-1"}]})
+        use_transport(graph, batch_handler({"owner": 204}, {"app": {}}))
+
+        await graph.remove_owner("app-1", "user-1")
+
+        assert graph._owner_cache.peek("app-1") is None
+
+    async def test_delete_invalidates_everything(self, graph):
+        graph._app_cache.set("app-1", {"id": "app-1"})
+        graph._owner_cache.set("app-1", {"value": []})
+        use_transport(graph, lambda r: httpx.Response(204))
+
+        await graph.delete_application("app-1")
+
+        assert graph._app_cache.peek("app-1") is None
+        assert graph._owner_cache.peek("app-1") is None
+
+    async def test_read_in_flight_during_write_is_not_cached(self, graph):
+        release = asyncio.Event()
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "GET":
+                await release.wait()
+                return httpx.Response(200, json={"id": "app-1", "passwordCredentials": []})
+            return httpx.Response(200, json={"keyId": "k"})
+
+        graph._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        read = asyncio.create_task(graph.get_application("app-1"))
+        await asyncio.sleep(0.01)
+
+        await graph.add_password("app-1", "secret", 30)
+        release.set()
+        await read
+
+        assert graph._app_cache.peek("app-1") is None
+
+    async def test_delete_drops_ownership_decisions(self, graph):
+        graph._owner_cache.set("app-1", {"value": [{"id": "user-1"}]})
+        await graph.ownership_decisions.set("app-1:user-1", True)
+        await graph.ownership_decisions.set("app-1:user-2", True)
+        use_transport(graph, lambda r: httpx.Response(204))
+
+        await graph.delete_application("app-1")
+
+        assert await graph.ownership_decisions.get("app-1:user-1") is None
+        assert await graph.ownership_decisions.get("app-1:user-2") is None
+
+    async def test_fresh_read_bypasses_cache(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "app-1"}))
+
+        await graph.get_application("app-1")
+        await graph.get_application("app-1", fresh=True)
+
+        assert len(seen) == 2
+
+    async def test_get_application_with_owners_fetches_only_missing_half(self, graph):
+        graph._app_cache.set("app-1", {"id": "app-1"})
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"value": [{"id": "user-1"}]}))
+
+        app, owners = await graph.get_application_with_owners("app-1")
+
+        assert app == {"id": "app-1"}
+        assert owners == [{"id": "user-1"}]
+        assert len(seen) == 1
+        assert seen[0].url.path.endswith("/applications/app-1/owners")
+
+
+class TestGroupMembershipFallback:
+    @staticmethod
+    def handler(probe_status: int = 200, probe_members: list[str] | None = None, delta_pages: list[dict] | None = None):
+        pages = iter(delta_pages or [])
+
+        def _handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path.endswith("/checkMemberGroups"):
+                return httpx.Response(404)
+            if "/members" in request.url.path:
+                if probe_status != 200:
+                    return httpx.Response(probe_status, json={"error": {"code": "Request_UnsupportedQuery"}})
+                return httpx.Response(200, json={"value": [{"id": m} for m in probe_members or []]})
+            return httpx.Response(200, json=next(pages))
+
+        return _handler
+
+    async def test_probes_membership_instead_of_listing_members(self, graph):
+        seen = use_transport(graph, self.handler(probe_members=["user-1"]))
+
+        assert await graph.check_member_groups("user-1", ["group-1"]) == ["group-1"]
+
+        probe = seen[1]
+        assert probe.url.params["$filter"] == "id eq 'user-1'"
+        assert probe.headers["ConsistencyLevel"] == "eventual"
+
+    async def test_builds_member_set_from_paged_delta_when_probe_rejected(self, graph):
+        pages = [
+            {"value": [{"members@delta": [{"id": "user-1"}]}], "@odata.nextLink": "https://graph/delta?page=2"},
+            {"value": [{"members@delta": [{"id": "user-2"}]}], "@odata.deltaLink": "https://graph/delta?token=1"},
+        ]
+        seen = use_transport(graph, self.handler(probe_status=400, delta_pages=pages))
+
+        assert await graph.check_member_groups("user-2", ["group-1"]) == ["group-1"]
+        calls = len(seen)
+        assert await graph.check_member_groups("user-3", ["group-1"]) == []
+
+        # Second lookup: only checkMemberGroups, answered from the member set
+        assert len(seen) == calls + 1
+        assert graph._group_members.get("group-1") == (frozenset({"user-1", "user-2"}), "https://graph/delta?token=1")
+
+    async def test_refresh_applies_membership_changes(self, graph):
+        graph._group_members.set(
+            "group-1", (frozenset({"user-1", "user-2"}), "https://graph/delta?token=1"), ttl_seconds=0
+        )
+        changes = {
+            "value": [{"members@delta": [{"id": "user-1", "@removed": {}}, {"id": "user-3"}]}],
+            "@odata.deltaLink": "https://graph/delta?token=2",
+        }
+        seen = use_transport(graph, self.handler(delta_pages=[changes]))
+
+        await graph._refresh_group_members("group-1")
+
+        assert str(seen[0].url) == "https://graph/delta?token=1"
+        assert graph._group_members.get("group-1") == (frozenset({"user-2", "user-3"}), "https://graph/delta?token=2")
+
+
+class TestProjections:
+    async def test_reads_select_only_rendered_fields(self, graph):
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "app-1", "value": []}))
+
+        await graph.get_application("app-1")
+        await graph.list_owners("app-1")
+        await graph.list_owned_applications("user-1")
+        await graph.get_service_principal_by_app_id("client-1")
+
+        assert [r.url.params["$select"] for r in seen] == [
+            SPN_GRAPH_SELECT,
+            OWNER_GRAPH_SELECT,
+            SPN_GRAPH_SELECT,
+            SERVICE_PRINCIPAL_GRAPH_SELECT,
+        ]
+
+
+class TestOutages:
+    async def test_open_breaker_fails_fast(self, graph):
+        graph._retry_policy = RetryPolicy(max_retries=0)
+        seen = use_transport(graph, lambda r: httpx.Response(503))
+        graph._breaker_for(f"{settings.GRAPH_API_BASE}/users").min_calls = 2
+
+        for _ in range(2):
+            with pytest.raises(GraphApiError):
+                await graph.get_user("user-1")
+        with pytest.raises(GraphUnavailableError):
+            await graph.get_user("user-1")
+
+        assert len(seen) == 2
+        assert graph.stats()["circuitBreakers"]["users"]["state"] == "open"
+
+    async def test_unreachable_graph_raises_unavailable(self, graph):
+        graph._retry_policy = RetryPolicy(max_retries=0)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            raise httpx.ConnectError("down")
+
+        use_transport(graph, handler)
+
+        with pytest.raises(GraphUnavailableError):
+            await graph.get_user("user-1")
+
+    async def test_full_bulkhead_serves_stale_data(self, graph):
+        graph._bulkhead = Bulkhead("graph", max_concurrent=1, max_wait_seconds=0.01)
+        graph._app_cache.set("app-1", {"id": "app-1"}, ttl_seconds=0)
+        seen = use_transport(graph, lambda r: httpx.Response(200, json={"id": "app-1"}))
+
+        async with graph._bulkhead:
+            assert await graph.get_application("app-1", allow_stale=True) == {"id": "app-1"}
+
+        assert seen == []
+        assert stale_age() is not None
+        assert graph.stats()["bulkhead"]["rejected"] == 1
+
+    async def test_serves_stale_application_while_graph_fails(self, graph):
+        graph._retry_policy = RetryPolicy(max_retries=0)
+        graph._app_cache.set("app-1", {"id": "app-1"}, ttl_seconds=0)
+        use_transport(graph, lambda r: httpx.Response(503))
+
+        assert await graph.get_application("app-1", allow_stale=True) == {"id": "app-1"}
+        assert stale_age() is not None
+
+    async def test_owner_checks_never_use_stale_data(self, graph):
+        graph._retry_policy = RetryPolicy(max_retries=0)
+        graph._owner_cache.set("app-1", {"value": [{"id": "user-1"}]}, ttl_seconds=0)
+        use_transport(graph, lambda r: httpx.Response(503))
+
+        with pytest.raises(GraphApiError):
+            await graph.list_owners("app-1")
+        assert await graph.list_owners("app-1", allow_stale=True) == [{"id": "user-1"}]
+
+    async def test_client_errors_are_not_masked_by_stale_data(self, graph):
+        graph._owner_cache.set("app-1", {"value": []}, ttl_seconds=0)
+        use_transport(graph, lambda r: httpx.Response(403, json={"error": {"code": "Forbidden"}}))
+
+        with pytest.raises(GraphApiError):
+            await graph.list_owners("app-1", allow_stale=True)
+
+    async def test_serves_last_complete_listing_while_graph_fails(self, graph):
+        graph._retry_policy = RetryPolicy(max_retries=0)
+        use_transport(graph, lambda r: httpx.Response(200, json={"value": [{"id": "app-1"}]}))
+        await graph.list_owned_applications("user-1")
+
+        graph._owned_apps_cache.set("user-1", graph._owned_apps_cache.peek("user-1").value, ttl_seconds=0)
+        use_transport(graph, lambda r: httpx.Response(500))
+
+        assert await graph.list_owned_applications("user-1", allow_stale=True) == [{"id": "app-1"}]
+
+
+class TestStreamingDecode:
+    @pytest.mark.skipif(not json_codec.STREAMING_AVAILABLE, reason="ijson not installed")
+    async def test_streamed_pages_keep_only_rendered_fields(self, graph, monkeypatch):
+        monkeypatch.setattr(settings, "GRAPH_STREAMING_DECODE", True)
+        pages = {
+            "/users/user-1/ownedObjects/microsoft.graph.application": {
+                "value": [{"id": "app-1", "displayName": "One", "keyCredentials": [{"key": "x"}]}],
+                "@odata.nextLink": "https://graph.microsoft.com/v1.0/next",
+            },
+            "/next": {"value": [{"id": "app-2", "displayName": "Two"}]},
+        }
+        use_transport(graph, lambda r: httpx.Response(200, json=pages[r.url.path.removeprefix("/v1.0")]))
+
+        apps = await graph.list_owned_applications("user-1")
+
+        assert apps == [{"id": "app-1", "displayName": "One"}, {"id": "app-2", "displayName": "Two"}]
@@ -0,0 +1,176 @@
+"""Tests for the memory-mapped host cache shared by worker processes."""
+
+import asyncio
+import os
+import stat
+import struct
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from azure.core.credentials import AccessToken
+
+from core import host_cache as host_cache_module
+from core.cache import TTLCache
+from core.config import settings
+from core.host_cache import _SEQ, HostCache, _digest
+from core.shared_cache import TwoLevelCache
+from services.token_service import TokenService
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another worker: takes the refresh lock for "k", then fills the slot on request
+WORKER = """
+import sys
+from core.config import settings
+from core.host_cache import HostCache, _digest
+
+settings.HOST_CACHE_ENABLED = True
+cache = HostCache("t", 4, 256, directory=sys.argv[1])
+cache._mapped()
+assert cache._try_lock(cache._size + cache._offset(_digest("k")) // cache.slot_bytes, 1)
+print("ready", flush=True)
+sys.stdin.readline()
+cache.set("k", "from-worker", 60)
+"""
+
+
+@pytest.fixture(autouse=True)
+def host_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "HOST_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "HOST_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(host_cache_module, "_tables", {})
+
+
+@pytest.fixture
+def table(tmp_path):
+    cache = HostCache("t", 4, 256, directory=str(tmp_path))
+    yield cache
+    cache.close()
+
+
+class TestHostCache:
+    def test_values_are_shared_through_the_file(self, table, tmp_path):
+        other = HostCache("t", 4, 256, directory=str(tmp_path))
+
+        assert table.set("k", {"keys": [1]}, 60)
+
+        assert other.get("k") == {"keys": [1]}
+        assert stat.S_IMODE(os.stat(table.path).st_mode) == 0o600
+        other.close()
+
+    def test_expired_and_deleted_entries_miss(self, table):
+        table.set("old", 1, 60)
+        table.set("gone", 2, 60)
+        offset = table._offset(_digest("old"))
+        struct.pack_into("<d", table._mapped(), offset + _SEQ.size, time.time() - 1)
+
+        table.delete("gone")
+
+        assert table.get("old") is None
+        assert table.get("gone") is None
+
+    def test_colliding_key_replaces_slot(self, tmp_path):
+        table = HostCache("one", 1, 256, directory=str(tmp_path))
+        table.set("a", 1, 60)
+        table.set("b", 2, 60)
+
+        assert (table.get("a"), table.get("b")) == (None, 2)
+
+    def test_oversize_value_is_not_cached(self, table):
+        assert table.set("k", "x" * 300, 60) is False
+        assert table.stats()["oversize"] == 1
+
+    def test_write_in_progress_is_not_read(self, table):
+        table.set("k", 1, 60)
+        offset = table._offset(_digest("k"))
+        seq = _SEQ.unpack_from(table._mapped(), offset)[0]
+        _SEQ.pack_into(table._mapped(), offset, seq + 1)
+
+        assert table.get("k") is None
+        assert table.stats()["tornReads"] == 3
+
+        # A writer that died mid-write does not wedge the slot
+        assert table.set("k", 2, 60)
+        assert table.get("k") == 2
+
+    async def test_disabled_cache_always_loads(self, table, monkeypatch):
+        monkeypatch.setattr(settings, "HOST_CACHE_ENABLED", False)
+        load = AsyncMock(return_value=("v", 60))
+
+        for _ in range(2):
+            assert await table.get_or_load("k", load) == "v"
+
+        assert load.await_count == 2
+        assert not os.path.exists(table.path)
+
+
+class TestSingleWriterRefresh:
+    async def test_waits_for_the_worker_refreshing_the_key(self, table, tmp_path):
+        worker = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-c",
+            WORKER,
+            str(tmp_path),
+            cwd=APP_DIR,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        assert await worker.stdout.readline() == b"ready\n"
+        load = AsyncMock(return_value=("from-self", 60))
+
+        follower = asyncio.create_task(table.get_or_load("k", load))
+        await asyncio.sleep(0.1)
+        assert not follower.done()
+        worker.stdin.write(b"go\n")
+        await worker.stdin.drain()
+
+        assert await follower == "from-worker"
+        assert await worker.wait() == 0
+        load.assert_not_awaited()
+        assert table.stats()["follows"] == 1
+
+    async def test_loads_itself_when_the_refresher_is_too_slow(self, table, monkeypatch):
+        monkeypatch.setattr(settings, "HOST_CACHE_LEAD_WAIT_SECONDS", 0.0)
+        table._mapped()
+        table._try_lock = MagicMock(return_value=False)
+        load = AsyncMock(return_value=("v", 60))
+
+        assert await table.get_or_load("k", load) == "v"
+        load.assert_awaited_once()
+
+
+class TestIntegration:
+    async def test_membership_tier_between_l1_and_l2(self, table):
+        first = TwoLevelCache("membership", TTLCache(10, 60), host=table)
+        second = TwoLevelCache("membership", TTLCache(10, 60), host=table)
+
+        await first.set("user-1", True)
+
+        assert await second.get("user-1") is True
+        assert second.stats()["hostHits"] == 1
+
+    async def test_workers_share_graph_tokens(self):
+        workers = []
+        for _ in range(2):
+            worker = TokenService()
+            worker._credential = MagicMock()
+            worker._credential.get_token = AsyncMock(return_value=AccessToken("tok-1", int(time.time()) + 3600))
+            workers.append(worker)
+
+        tokens = [await worker.get_token("https://graph.microsoft.com/.default") for worker in workers]
+
+        assert {token.token for token in tokens} == {"tok-1"}
+        workers[0]._credential.get_token.assert_awaited_once()
+        workers[1]._credential.get_token.assert_not_awaited()
+
+    async def test_token_in_refresh_window_is_not_shared(self):
+        worker = TokenService()
+        worker._credential = MagicMock()
+        expires_on = int(time.time()) + settings.TOKEN_REFRESH_MARGIN_SECONDS - 10
+        worker._credential.get_token = AsyncMock(return_value=AccessToken("tok-1", expires_on))
+
+        await worker.get_token("scope")
+
+        assert host_cache_module.host_cache("tokens").get("scope") is None
@@ -0,0 +1,69 @@
+"""Tests for JSON decoding helpers."""
+
+import json
+
+import pytest
+
+from core import json_codec
+from core.json_codec import PageDecoder
+
+pytestmark = pytest.mark.skipif(not json_codec.STREAMING_AVAILABLE, reason="ijson not installed")
+
+PAGE = {
+    "@odata.context": "https://graph.microsoft.com/v1.0/$metadata#applications",
+    "value": [
+        {
+            "id": "app-1",
+            "displayName": "One",
+            "tags": ["a", "b"],
+            "passwordCredentials": [{"keyId": "k1", "displayName": "s"}],
+            "keyCredentials": [{"key": "x" * 500}],
+            "web": {"redirectUris": ["https://example.com"]},
+        },
+        {"id": "app-2", "displayName": "Two", "api": {"oauth2PermissionScopes": [{"id": "s"}]}, "tags": []},
+    ],
+    "@odata.nextLink": "https://graph.microsoft.com/v1.0/next?page=2",
+}
+
+
+def decode(payload: bytes, chunk_size: int) -> PageDecoder:
+    decoder = PageDecoder(("id", "displayName", "tags", "passwordCredentials"))
+    for i in range(0, len(payload), chunk_size):
+        decoder.feed(payload[i : i + chunk_size])
+    decoder.close()
+    return decoder
+
+
+class TestLoads:
+    def test_matches_stdlib(self):
+        payload = json.dumps(PAGE).encode()
+        assert json_codec.loads(payload) == json.loads(payload)
+
+
+class TestPageDecoder:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+    def test_keeps_only_requested_fields(self, chunk_size):
+        decoder = decode(json.dumps(PAGE).encode(), chunk_size)
+
+        assert decoder.items == [
+            {
+                "id": "app-1",
+                "displayName": "One",
+                "tags": ["a", "b"],
+                "passwordCredentials": [{"keyId": "k1", "displayName": "s"}],
+            },
+            {"id": "app-2", "displayName": "Two", "tags": []},
+        ]
+
+    def test_collects_odata_annotations(self):
+        page = decode(json.dumps(PAGE).encode(), 64).page()
+
+        assert page["@odata.nextLink"] == "https://graph.microsoft.com/v1.0/next?page=2"
+        assert len(page["value"]) == 2
+
+    def test_numbers_are_floats_not_decimals(self):
+        decoder = PageDecoder(("id", "score"))
+        decoder.feed(b'{"value": [{"id": "a", "score": 1.5}]}')
+        decoder.close()
+        assert decoder.items == [{"id": "a", "score": 1.5}]
+        assert type(decoder.items[0]["score"]) is float
@@ -4,6 +4,8 @@ from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
+from core.exceptions import DependencyBusyError
+from core.resilience import Bulkhead
 from services.keyvault_service import KeyVaultService
 
 
@@ -59,3 +61,14 @@ class TestDeleteSecret:
     async def test_ignores_not_found(self, kv):
         kv._client.delete_secret = AsyncMock(side_effect=Exception("NotFound"))
         await kv.delete_secret("missing")  # should not raise
+
+
+class TestBulkhead:
+    async def test_busy_key_vault_is_not_reported_as_not_found(self, kv):
+        kv._bulkhead = Bulkhead("keyvault", max_concurrent=1, max_wait_seconds=0.01)
+        kv._client.delete_secret = AsyncMock()
+        async with kv._bulkhead:
+            with pytest.raises(DependencyBusyError):
+                await kv.delete_secret("spn-abc-def")
+        kv._client.delete_secret.assert_not_called()
+        assert kv.stats()["bulkhead"]["rejected"] == 1
@@ -5,6 +5,8 @@ import json
 import pytest
 
 from blueprints.owner_blueprint import add_owner, list_owners, remove_owner
+from core.cache import TTLCache
+from core.shared_cache import TwoLevelCache
 from tests.conftest import SAMPLE_OWNERS, make_request
 
 
@@ -39,8 +41,8 @@ class TestListOwners:
         assert body["value"][0]["id"] == "00000000-0000-0000-0000-000000000001"
         assert body["value"][0]["displayName"] == "Test User"
 
-    async def test_empty_owners(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
-        # First call: @require_owner checks ownership (user is owner); second call: endpoint returns []
+    async def test_owners_fetched_once_per_request(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
+        # @require_owner's ownership check and the endpoint body share one read
         mock_graph_service.list_owners.side_effect = [SAMPLE_OWNERS, []]
 
         req = make_request("GET", route_params={"spn_id": "app-object-id-1"})
@@ -48,7 +50,8 @@ class TestListOwners:
 
         assert resp.status_code == 200
         body = json.loads(resp.get_body())
-        assert body["count"] == 0
+        assert body["count"] == 1
+        mock_graph_service.list_owners.assert_awaited_once_with("app-object-id-1", allow_stale=False)
 
     async def test_multiple_owners(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.list_owners.return_value = [SAMPLE_OWNERS[0], SECOND_OWNER]
@@ -82,9 +85,26 @@ class TestAddOwner:
         body = json.loads(resp.get_body())
         assert body["id"] == "00000000-0000-0000-0000-000000000002"
         assert body["displayName"] == "Second User"
-        mock_graph_service.add_owner.assert_called_once_with("app-object-id-1", "00000000-0000-0000-0000-000000000002")
+        mock_graph_service.add_owner.assert_called_once_with(
+            "app-object-id-1", "00000000-0000-0000-0000-000000000002", service_principal_id="sp-1"
+        )
         mock_audit_service.log.assert_called_once()
 
+    async def test_ownership_decision_is_cached(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
+        mock_graph_service.ownership_decisions = TwoLevelCache("ownership", TTLCache(10, 60))
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+        mock_graph_service.get_user.return_value = SECOND_OWNER
+
+        for _ in range(2):
+            req = make_request(
+                "POST",
+                route_params={"spn_id": "app-object-id-1"},
+                body={"userId": "00000000-0000-0000-0000-000000000002"},
+            )
+            assert (await add_owner(req)).status_code == 201
+
+        mock_graph_service.list_owners.assert_awaited_once()
+
     async def test_missing_user_id(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
 
@@ -133,9 +153,31 @@ class TestRemoveOwner:
 
         assert resp.status_code == 204
         mock_graph_service.remove_owner.assert_called_once_with(
-            "app-object-id-1", "00000000-0000-0000-0000-000000000002"
+            "app-object-id-1", "00000000-0000-0000-0000-000000000002", service_principal_id="sp-1"
         )
         mock_audit_service.log.assert_called_once()
+        # The strict ownership check and the last-owner check share one live read
+        mock_graph_service.list_owners.assert_awaited_once_with("app-object-id-1", fresh=True)
+
+    async def test_passes_service_principal_id_from_metadata(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_graph_service.known_service_principal_id.return_value = None
+        mock_cosmos_service.get_spn_metadata.return_value = {"servicePrincipalId": "sp-9"}
+        mock_graph_service.list_owners.return_value = [SAMPLE_OWNERS[0], SECOND_OWNER]
+
+        req = make_request(
+            "DELETE",
+            route_params={
+                "spn_id": "app-object-id-1",
+                "owner_id": "00000000-0000-0000-0000-000000000002",
+            },
+        )
+        assert (await remove_owner(req)).status_code == 204
+
+        mock_graph_service.remove_owner.assert_called_once_with(
+            "app-object-id-1", "00000000-0000-0000-0000-000000000002", service_principal_id="sp-9"
+        )
 
     async def test_cannot_remove_last_owner(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.list_owners.return_value = SAMPLE_OWNERS  # only 1 owner
@@ -184,7 +226,7 @@ class TestRemoveOwner:
         assert resp.status_code == 204
 
     async def test_empty_owners_prevents_removal(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
-        # First call: @require_owner (user is owner); second call: endpoint body sees empty list → 400
+        # Only the first list is fetched: the endpoint reuses @require_owner's single owner → 400
         mock_graph_service.list_owners.side_effect = [SAMPLE_OWNERS, []]
 
         req = make_request(
@@ -0,0 +1,68 @@
+"""Tests for the per-request context and its memo."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from core.exceptions import UnauthorizedError
+from core.request_context import RequestContext, request_context, use_request_context
+from tests.conftest import SAMPLE_APP, SAMPLE_OWNERS
+
+
+class TestRequestContext:
+    def test_missing_outside_require_auth(self):
+        with pytest.raises(UnauthorizedError):
+            request_context()
+
+    def test_bound_for_the_block_only(self, mock_user_context):
+        context = RequestContext(mock_user_context)
+        with use_request_context(context):
+            assert request_context() is context
+            assert request_context().oid == mock_user_context["oid"]
+        with pytest.raises(UnauthorizedError):
+            request_context()
+
+    async def test_memoize_loads_once_and_counts_hits(self, mock_user_context):
+        context = RequestContext(mock_user_context)
+        load = AsyncMock(return_value=SAMPLE_APP)
+
+        for _ in range(3):
+            assert await context.memoize(("application", "spn-1"), load) is SAMPLE_APP
+
+        load.assert_awaited_once()
+        assert context.memo_hits == 2
+
+    async def test_failed_load_is_not_memoised(self, mock_user_context):
+        context = RequestContext(mock_user_context)
+        load = AsyncMock(side_effect=[RuntimeError("boom"), SAMPLE_APP])
+
+        with pytest.raises(RuntimeError):
+            await context.memoize(("application", "spn-1"), load)
+
+        assert await context.memoize(("application", "spn-1"), load) is SAMPLE_APP
+
+    async def test_batch_read_fills_both_entries(self, mock_user_context, mock_graph_service):
+        mock_graph_service.get_application_with_owners.return_value = (SAMPLE_APP, SAMPLE_OWNERS)
+        context = RequestContext(mock_user_context)
+
+        assert await context.application_with_owners("spn-1") == (SAMPLE_APP, SAMPLE_OWNERS)
+        assert await context.owners("spn-1") is SAMPLE_OWNERS
+        assert await context.application("spn-1") is SAMPLE_APP
+
+        mock_graph_service.list_owners.assert_not_called()
+        mock_graph_service.get_application.assert_not_called()
+        assert context.memo_hits == 2
+
+    async def test_stale_permitted_reads_are_not_reused_by_strict_ones(self, mock_user_context, mock_graph_service):
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+        context = RequestContext(mock_user_context)
+
+        await context.owners("spn-1", allow_stale=True)
+        await context.owners("spn-1")
+        await context.owners("spn-1", allow_stale=True)
+
+        assert [call.kwargs for call in mock_graph_service.list_owners.await_args_list] == [
+            {"allow_stale": True},
+            {"allow_stale": False},
+        ]
+        assert context.memo_hits == 1
@@ -0,0 +1,193 @@
+"""Tests for retry, rate-limiting, circuit-breaker and bulkhead primitives."""
+
+import asyncio
+import time
+
+import pytest
+
+from core.exceptions import DependencyBusyError
+from core.resilience import AdaptiveRateLimiter, Bulkhead, CircuitBreaker, RetryPolicy, parse_retry_after
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after("7") == 7.0
+
+    def test_http_date(self):
+        value = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60))
+        delay = parse_retry_after(value)
+        assert delay is not None
+        assert 55 <= delay <= 61
+
+    def test_missing_or_invalid(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+
+
+class TestRetryPolicy:
+    def test_prefers_retry_after(self):
+        assert RetryPolicy().delay_for(0, "2") == 2.0
+
+    def test_backoff_is_bounded(self):
+        policy = RetryPolicy(max_retries=10, base_delay=1.0, max_delay=4.0)
+        assert all(0 <= policy.delay_for(attempt) <= 4.0 for attempt in range(10))  # type: ignore[operator]
+
+    def test_gives_up_after_max_retries(self):
+        assert RetryPolicy(max_retries=2).delay_for(2) is None
+
+    def test_gives_up_when_retry_after_too_long(self):
+        assert RetryPolicy(max_retry_after=10).delay_for(0, "60") is None
+
+
+class TestAdaptiveRateLimiter:
+    async def test_burst_is_immediate(self):
+        limiter = AdaptiveRateLimiter(max_rate=1000, burst=5)
+        for _ in range(5):
+            await limiter.acquire()
+        assert limiter.stats()["waits"] == 0
+
+    async def test_waits_when_bucket_is_empty(self):
+        limiter = AdaptiveRateLimiter(max_rate=100, burst=1)
+        await limiter.acquire()
+        await limiter.acquire()
+        assert limiter.stats()["waits"] == 1
+
+    def test_throttling_halves_rate_and_success_recovers(self):
+        limiter = AdaptiveRateLimiter(max_rate=10, min_rate=1, increase_step=1)
+        limiter.on_throttled()
+        assert limiter.rate == 5
+        limiter.on_throttled()
+        limiter.on_throttled()
+        limiter.on_throttled()
+        assert limiter.rate == 1
+        for _ in range(20):
+            limiter.on_success()
+        assert limiter.rate == 10
+
+    async def test_retry_after_pauses_bucket(self):
+        limiter = AdaptiveRateLimiter(max_rate=1000, burst=10)
+        limiter.on_throttled(retry_after=0.05)
+        started = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - started >= 0.04
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestCircuitBreaker:
+    def make(self, clock: FakeClock) -> CircuitBreaker:
+        return CircuitBreaker("test", failure_rate=0.5, min_calls=4, window_seconds=10, open_seconds=5, clock=clock)
+
+    def test_opens_once_failure_rate_reached(self):
+        breaker = self.make(FakeClock())
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        assert breaker.allow() is False
+        assert breaker.stats()["rejected"] == 1
+
+    def test_needs_min_calls(self):
+        breaker = self.make(FakeClock())
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_old_outcomes_leave_the_window(self):
+        clock = FakeClock()
+        breaker = self.make(clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        clock.now = 20
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = FakeClock()
+        breaker = self.make(clock)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 5
+
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        assert breaker.allow() is True
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = self.make(clock)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 5
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        assert breaker.stats()["opened"] == 2
+
+
+class TestBulkhead:
+    async def test_limits_concurrency_and_queues(self):
+        bulkhead = Bulkhead("test", max_concurrent=2, max_wait_seconds=1.0)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with bulkhead:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(5)))
+
+        stats = bulkhead.stats()
+        assert peak == 2
+        assert stats["acquired"] == 5
+        assert stats["queued"] == 3
+        assert stats["maxWaiting"] == 3
+        assert stats["active"] == 0
+        assert stats["waiting"] == 0
+
+    async def test_rejects_after_max_wait(self):
+        bulkhead = Bulkhead("test", max_concurrent=1, max_wait_seconds=0.01)
+        async with bulkhead:
+            with pytest.raises(DependencyBusyError):
+                async with bulkhead:
+                    pass
+
+        assert bulkhead.stats()["rejected"] == 1
+        assert bulkhead.stats()["waitSecondsMax"] >= 0.01
+        async with bulkhead:  # the slot is free again
+            pass
+
+    async def test_releases_slot_on_error(self):
+        bulkhead = Bulkhead("test", max_concurrent=1, max_wait_seconds=0.01)
+        with pytest.raises(RuntimeError):
+            async with bulkhead:
+                raise RuntimeError("boom")
+        async with bulkhead:
+            assert bulkhead.active == 1
+
+    async def test_disabled_when_zero(self):
+        bulkhead = Bulkhead("test", max_concurrent=0, max_wait_seconds=0.01)
+        async with bulkhead, bulkhead:
+            pass
+        assert bulkhead.stats()["acquired"] == 0
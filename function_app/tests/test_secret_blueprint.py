@@ -64,6 +64,7 @@ class TestCreateSecret:
         assert resp.status_code == 400
         body = json.loads(resp.get_body())
         assert body["error"]["code"] == "MAX_SECRETS_REACHED"
+        mock_graph_service.get_application.assert_called_once_with("app-object-id-1", fresh=True)
 
     async def test_custom_expiry(
         self, mock_graph_service, mock_cosmos_service, mock_keyvault_service, mock_audit_service
@@ -201,6 +202,7 @@ class TestDeleteSecret:
         assert resp.status_code == 404
         body = json.loads(resp.get_body())
         assert body["error"]["code"] == "SECRET_NOT_FOUND"
+        mock_graph_service.get_application.assert_called_once_with("app-object-id-1", fresh=True)
 
     async def test_no_kv_mapping_still_succeeds(
         self, mock_graph_service, mock_cosmos_service, mock_keyvault_service, mock_audit_service
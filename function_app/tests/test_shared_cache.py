@@ -0,0 +1,196 @@
+"""Tests for the two-level cache and its shared backends."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import redis.exceptions
+
+from core import shared_cache
+from core.cache import TTLCache
+from core.config import settings
+from core.shared_cache import CosmosSharedCache, RedisSharedCache, TwoLevelCache
+from tests.redis_stand_in import RedisStandIn
+
+
+class DictBackend:
+    """In-memory L2 without broadcast, like the Cosmos backend."""
+
+    supports_broadcast = False
+
+    def __init__(self) -> None:
+        self.data: dict[str, object] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl_seconds):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def publish(self, message):
+        return None
+
+    def subscribe(self, callback):
+        return None
+
+    async def aclose(self):
+        return None
+
+
+def make_cache(backend, maxsize: int = 10) -> TwoLevelCache:
+    return TwoLevelCache("ns", TTLCache(maxsize, 60), backend)
+
+
+class TestTwoLevelCache:
+    async def test_other_instance_reads_through_l2(self):
+        backend = DictBackend()
+        first, second = make_cache(backend), make_cache(backend)
+
+        await first.set("k", {"v": 1})
+
+        assert await second.get("k") == {"v": 1}
+        assert await second.get("k") == {"v": 1}
+        stats = second.stats()
+        assert (stats["l2Hits"], stats["hits"]) == (1, 1)
+
+    async def test_l2_copy_keeps_remaining_lifetime(self):
+        backend = DictBackend()
+        backend.data["ns:k"] = {"value": True, "expiresAt": time.time() + 5}
+        cache = make_cache(backend)
+
+        assert await cache.get("k") is True
+        entry = cache.l1.peek("k")
+        assert entry.expires_at - entry.stored_at == pytest.approx(5, abs=0.5)
+
+    async def test_expired_l2_entry_is_a_miss(self):
+        backend = DictBackend()
+        backend.data["ns:k"] = {"value": True, "expiresAt": time.time() - 1}
+        cache = make_cache(backend)
+
+        assert await cache.get("k") is None
+        assert cache.stats()["l2Misses"] == 1
+
+    async def test_backend_errors_and_timeouts_are_misses(self, monkeypatch):
+        monkeypatch.setattr(settings, "SHARED_CACHE_TIMEOUT_SECONDS", 0.01)
+        backend = DictBackend()
+        cache = make_cache(backend)
+
+        async def hang(key):
+            await asyncio.sleep(1)
+
+        with patch.object(backend, "get", side_effect=hang):
+            assert await cache.get("slow") is None
+        with patch.object(backend, "set", side_effect=ConnectionError("down")):
+            await cache.set("k", True)
+
+        assert cache.l1.get("k") is True
+        assert cache.stats()["l2Errors"] == 2
+
+    async def test_disabled_l1_skips_l2(self):
+        backend = DictBackend()
+        cache = make_cache(backend, maxsize=0)
+
+        await cache.set("k", True)
+
+        assert await cache.get("k") is None
+        assert backend.data == {}
+
+    async def test_no_backend_is_l1_only(self, monkeypatch):
+        monkeypatch.setattr(settings, "SHARED_CACHE_BACKEND", "none")
+        monkeypatch.setattr(shared_cache, "_backend", None)
+        cache = TwoLevelCache("ns", TTLCache(10, 60))
+
+        await cache.set("k", True)
+        await cache.invalidate("k")
+
+        assert await cache.get("k") is None
+        assert cache.stats()["l2Misses"] == 0
+
+    async def test_misconfigured_backend_is_l1_only(self, monkeypatch, caplog):
+        monkeypatch.setattr(settings, "SHARED_CACHE_BACKEND", "redis")
+        monkeypatch.setattr(settings, "SHARED_CACHE_REDIS_URL", "")
+        monkeypatch.setattr(shared_cache, "_backend", None)
+        monkeypatch.setattr(shared_cache, "_rejected_kind", None)
+        cache = TwoLevelCache("ns", TTLCache(10, 60))
+
+        await cache.set("k", True)
+        assert await cache.get("k") is True
+        assert await cache.get_shared("k") is None
+
+        assert [r.levelname for r in caplog.records] == ["ERROR"]
+
+
+class TestCosmosSharedCache:
+    async def test_round_trip_uses_hashed_ids(self):
+        stored = {}
+
+        async def upsert(item, ttl_seconds):
+            stored[item["id"]] = item
+
+        with patch("services.cosmos_service.cosmos_service") as cosmos:
+            cosmos.upsert_shared_cache_item = AsyncMock(side_effect=upsert)
+            cosmos.get_shared_cache_item = AsyncMock(side_effect=lambda item_id: stored.get(item_id))
+            backend = CosmosSharedCache()
+
+            await backend.set("membership:user/1", {"value": True}, 60)
+            assert await backend.get("membership:user/1") == {"value": True}
+
+        (item_id,) = stored
+        assert "/" not in item_id and stored[item_id]["key"] == "membership:user/1"
+
+    async def test_item_past_its_expiry_is_ignored(self):
+        with patch("services.cosmos_service.cosmos_service") as cosmos:
+            cosmos.get_shared_cache_item = AsyncMock(return_value={"value": 1, "expiresAt": time.time() - 1})
+            assert await CosmosSharedCache().get("k") is None
+
+
+async def wait_for(condition) -> None:
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("condition not met")
+
+
+class TestRedisSharedCache:
+    async def test_set_get_delete(self):
+        async with RedisStandIn() as server:
+            backend = RedisSharedCache(server.url)
+            await backend.set("k", {"keys": [1]}, 60)
+            assert await backend.get("k") == {"keys": [1]}
+            await backend.delete("k")
+            assert await backend.get("k") is None
+            await backend.aclose()
+
+        assert (server.commands["SET"], server.commands["GET"], server.commands["DEL"]) == (1, 2, 1)
+
+    async def test_reconnects_after_connection_loss(self):
+        async with RedisStandIn() as server:
+            backend = RedisSharedCache(server.url)
+            await backend.set("k", 1, 60)
+            server.drop_connections()
+
+            with pytest.raises(redis.exceptions.ConnectionError):
+                await backend.get("k")
+            assert await backend.get("k") == 1
+            await backend.aclose()
+
+    async def test_invalidation_reaches_other_instances(self):
+        async with RedisStandIn() as server:
+            backends = [RedisSharedCache(server.url), RedisSharedCache(server.url)]
+            first, second = (make_cache(backend) for backend in backends)
+            await first.set("k", True)
+            assert await second.get("k") is True
+            await wait_for(lambda: server.commands["SUBSCRIBE"] == 2)
+
+            await first.invalidate("k")
+            await wait_for(lambda: second.stats()["invalidationsReceived"] == 1)
+
+            assert second.l1.get("k") is None
+            assert await second.get("k") is None
+            for backend in backends:
+                await backend.aclose()
@@ -1,11 +1,15 @@
 """Tests for SPN blueprint endpoints."""
 
 import json
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
 from blueprints.spn_blueprint import create_spn, delete_spn, get_spn, list_spns, update_spn
-from tests.conftest import SAMPLE_APP, SAMPLE_OWNERS, make_request
+from core.cache import mark_stale
+from core.exceptions import GraphApiError
+from core.request_helpers import STALE_HEADER
+from tests.conftest import SAMPLE_APP, SAMPLE_OWNERS, async_pages, make_request
 
 
 @pytest.fixture(autouse=True)
@@ -21,8 +25,7 @@ def _auth(bypass_auth):
 class TestCreateSpn:
     async def test_success(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.create_application.return_value = SAMPLE_APP
-        mock_graph_service.create_service_principal.return_value = {"id": "sp-1"}
-        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+        mock_graph_service.provision_application.return_value = SAMPLE_OWNERS
 
         req = make_request("POST", body={"displayName": "Test SPN"})
         resp = await create_spn(req)
@@ -30,9 +33,16 @@ class TestCreateSpn:
         assert resp.status_code == 201
         body = json.loads(resp.get_body())
         assert body["displayName"] == "Test SPN"
+        assert len(body["owners"]) == 1
         mock_graph_service.create_application.assert_called_once()
-        mock_graph_service.create_service_principal.assert_called_once()
+        mock_graph_service.provision_application.assert_called_once_with(
+            "app-object-id-1", "app-client-id-1", "00000000-0000-0000-0000-000000000001"
+        )
+        mock_graph_service.list_owners.assert_not_called()
         mock_cosmos_service.upsert_spn_metadata.assert_called_once()
+        metadata = mock_cosmos_service.upsert_spn_metadata.call_args[0][1]
+        assert metadata["appId"] == "app-client-id-1"
+        assert metadata["servicePrincipalId"] == "sp-1"
         mock_audit_service.log.assert_called_once()
 
     async def test_duplicate_name_returns_400(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
@@ -45,6 +55,31 @@ class TestCreateSpn:
         body = json.loads(resp.get_body())
         assert body["error"]["code"] == "DUPLICATE_SPN_NAME"
 
+    async def test_reserved_name_returns_400_without_graph_calls(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_cosmos_service.reserve_spn_name.return_value = False
+
+        req = make_request("POST", body={"displayName": "Taken"})
+        resp = await create_spn(req)
+
+        assert resp.status_code == 400
+        assert json.loads(resp.get_body())["error"]["code"] == "DUPLICATE_SPN_NAME"
+        mock_graph_service.check_duplicate_name.assert_not_called()
+        mock_graph_service.create_application.assert_not_called()
+
+    async def test_failed_create_releases_reservation(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_graph_service.create_application.side_effect = GraphApiError()
+
+        req = make_request("POST", body={"displayName": "New App"})
+        resp = await create_spn(req)
+
+        assert resp.status_code == 502
+        mock_cosmos_service.release_spn_name.assert_awaited_once_with("New App")
+        mock_cosmos_service.assign_spn_name.assert_not_called()
+
     async def test_missing_display_name_returns_400(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         req = make_request("POST", body={})
         resp = await create_spn(req)
@@ -55,7 +90,7 @@ class TestCreateSpn:
 
     async def test_cleanup_on_sp_creation_failure(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.create_application.return_value = SAMPLE_APP
-        mock_graph_service.create_service_principal.side_effect = Exception("SP failed")
+        mock_graph_service.provision_application.side_effect = Exception("SP failed")
 
         req = make_request("POST", body={"displayName": "Test SPN"})
         resp = await create_spn(req)
@@ -65,8 +100,7 @@ class TestCreateSpn:
 
     async def test_with_all_optional_fields(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.create_application.return_value = SAMPLE_APP
-        mock_graph_service.create_service_principal.return_value = {"id": "sp-1"}
-        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+        mock_graph_service.provision_application.return_value = SAMPLE_OWNERS
 
         req = make_request(
             "POST",
@@ -93,7 +127,7 @@ class TestCreateSpn:
 
 class TestListSpns:
     async def test_returns_owned_apps(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
-        mock_graph_service.list_owned_applications.return_value = [SAMPLE_APP]
+        mock_graph_service.iter_owned_application_pages.side_effect = async_pages([SAMPLE_APP])
 
         req = make_request("GET")
         resp = await list_spns(req)
@@ -103,8 +137,20 @@ class TestListSpns:
         assert body["count"] == 1
         assert body["value"][0]["displayName"] == "Test SPN"
 
+    async def test_combines_pages(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
+        second_app = {**SAMPLE_APP, "id": "app-object-id-2"}
+        mock_graph_service.iter_owned_application_pages.side_effect = async_pages([SAMPLE_APP], [second_app])
+
+        req = make_request("GET")
+        resp = await list_spns(req)
+
+        body = json.loads(resp.get_body())
+        assert [v["id"] for v in body["value"]] == ["app-object-id-1", "app-object-id-2"]
+        assert body["count"] == 2
+        mock_cosmos_service.list_spn_metadata_by_ids.assert_not_called()
+
     async def test_empty_list(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
-        mock_graph_service.list_owned_applications.return_value = []
+        mock_graph_service.iter_owned_application_pages.side_effect = async_pages([])
 
         req = make_request("GET")
         resp = await list_spns(req)
@@ -117,7 +163,7 @@ class TestListSpns:
     async def test_cosmos_failure_degrades_gracefully(
         self, mock_graph_service, mock_cosmos_service, mock_audit_service
     ):
-        mock_graph_service.list_owned_applications.return_value = [SAMPLE_APP]
+        mock_graph_service.iter_owned_application_pages.side_effect = async_pages([SAMPLE_APP])
         mock_cosmos_service.list_spn_metadata_by_ids.side_effect = Exception("DB error")
 
         req = make_request("GET")
@@ -143,6 +189,39 @@ class TestGetSpn:
         body = json.loads(resp.get_body())
         assert body["id"] == "app-object-id-1"
         assert len(body["owners"]) == 1
+        # Owners fetched by @require_owner are reused; only the application is read
+        mock_graph_service.list_owners.assert_awaited_once()
+        mock_graph_service.get_application_with_owners.assert_not_called()
+
+    async def test_batches_reads_when_ownership_came_from_mirror(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_graph_service.get_application_with_owners.return_value = (SAMPLE_APP, SAMPLE_OWNERS)
+
+        with patch(
+            "services.directory_mirror_service.directory_mirror_service.is_owner",
+            new_callable=AsyncMock,
+            return_value=True,
+        ):
+            resp = await get_spn(make_request("GET", route_params={"spn_id": "app-object-id-1"}))
+
+        assert resp.status_code == 200
+        mock_graph_service.get_application_with_owners.assert_awaited_once_with("app-object-id-1", allow_stale=True)
+        mock_graph_service.list_owners.assert_not_called()
+
+    async def test_stale_data_is_flagged(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
+        async def stale_read(spn_id, **kwargs):
+            mark_stale(42.7)
+            return SAMPLE_APP
+
+        mock_graph_service.get_application.side_effect = stale_read
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+
+        req = make_request("GET", route_params={"spn_id": "app-object-id-1"})
+        resp = await get_spn(req)
+
+        assert resp.status_code == 200
+        assert resp.headers[STALE_HEADER] == "42"
 
     async def test_not_found(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         from core.exceptions import SpnNotFoundError
@@ -164,6 +243,7 @@ class TestGetSpn:
 class TestUpdateSpn:
     async def test_update_display_name(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         updated_app = {**SAMPLE_APP, "displayName": "New Name"}
+        mock_graph_service.get_application.return_value = SAMPLE_APP
         mock_graph_service.update_application.return_value = updated_app
         mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
 
@@ -177,7 +257,10 @@ class TestUpdateSpn:
         assert resp.status_code == 200
         body = json.loads(resp.get_body())
         assert body["displayName"] == "New Name"
+        mock_cosmos_service.reserve_spn_name.assert_awaited_once_with("New Name", "app-object-id-1")
+        mock_cosmos_service.release_spn_name.assert_awaited_once_with(SAMPLE_APP["displayName"], "app-object-id-1")
         mock_audit_service.log.assert_called_once()
+        mock_graph_service.list_owners.assert_awaited_once()
 
     async def test_duplicate_name_on_update(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
         mock_graph_service.check_duplicate_name.return_value = True
@@ -195,6 +278,38 @@ class TestUpdateSpn:
         body = json.loads(resp.get_body())
         assert body["error"]["code"] == "DUPLICATE_SPN_NAME"
 
+    async def test_failed_read_does_not_lock_new_name(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_graph_service.get_application.side_effect = GraphApiError("Graph unavailable", upstream_status=503)
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+
+        req = make_request(
+            "PATCH",
+            route_params={"spn_id": "app-object-id-1"},
+            body={"displayName": "New Name"},
+        )
+        resp = await update_spn(req)
+
+        assert resp.status_code >= 500
+        mock_cosmos_service.reserve_spn_name.assert_not_awaited()
+
+    async def test_failed_duplicate_check_releases_new_name(
+        self, mock_graph_service, mock_cosmos_service, mock_audit_service
+    ):
+        mock_graph_service.check_duplicate_name.side_effect = GraphApiError("Graph unavailable", upstream_status=503)
+        mock_graph_service.get_application.return_value = SAMPLE_APP
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+
+        req = make_request(
+            "PATCH",
+            route_params={"spn_id": "app-object-id-1"},
+            body={"displayName": "New Name"},
+        )
+        await update_spn(req)
+
+        mock_cosmos_service.release_spn_name.assert_awaited_once_with("New Name", "app-object-id-1")
+
     async def test_same_name_not_flagged_as_duplicate(
         self, mock_graph_service, mock_cosmos_service, mock_audit_service
     ):
@@ -258,6 +373,16 @@ class TestDeleteSpn:
         mock_cosmos_service.delete_spn_metadata.assert_called_once_with("app-object-id-1")
         mock_audit_service.log.assert_called_once()
 
+    async def test_releases_name(self, mock_graph_service, mock_cosmos_service, mock_audit_service):
+        mock_graph_service.list_owners.return_value = SAMPLE_OWNERS
+        mock_cosmos_service.get_spn_metadata.return_value = {"id": "app-object-id-1", "displayName": "Test SPN"}
+
+        req = make_request("DELETE", route_params={"spn_id": "app-object-id-1"})
+        resp = await delete_spn(req)
+
+        assert resp.status_code == 204
+        mock_cosmos_service.release_spn_name.assert_awaited_once_with("Test SPN", "app-object-id-1")
+
     async def test_cleans_up_keyvault_secrets(
         self,
         mock_graph_service,
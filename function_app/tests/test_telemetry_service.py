@@ -0,0 +1,68 @@
+"""Tests for the service metrics export."""
+
+import io
+import json
+import logging
+from unittest.mock import patch
+
+from opentelemetry import trace
+from opentelemetry.sdk.metrics.export import ConsoleMetricExporter
+
+from blueprints.health_blueprint import diagnostics
+from core.config import settings
+from services.telemetry_service import TelemetryService, flatten_stats, service_stats
+from tests.conftest import make_request
+
+
+class TestServiceStats:
+    def test_covers_every_service(self):
+        stats = service_stats()
+
+        assert set(stats) == {"auth", "tokens", "graph", "cosmos", "keyVault"}
+        assert "waiting" in stats["cosmos"]["bulkhead"]
+        assert "verifiedTokenCache" in stats["auth"]
+
+    def test_flatten_uses_dotted_names_and_drops_strings(self):
+        flat = flatten_stats({"graph": {"bulkhead": {"waiting": 2}, "circuitBreakers": {"users": {"state": "open"}}}})
+
+        assert flat == {"graph.bulkhead.waiting": 2.0}
+
+
+class TestExport:
+    def test_not_configured_without_connection_string(self, monkeypatch):
+        monkeypatch.setattr(settings, "APPINSIGHTS_CONNECTION", "")
+        with patch("azure.monitor.opentelemetry.exporter.AzureMonitorMetricExporter") as exporter:
+            TelemetryService().configure()
+        exporter.assert_not_called()
+
+    def test_exports_metrics_only(self, monkeypatch):
+        monkeypatch.setattr(settings, "APPINSIGHTS_CONNECTION", "InstrumentationKey=key")
+        tracer_provider = trace.get_tracer_provider()
+        handlers = list(logging.getLogger().handlers)
+        with patch(
+            "azure.monitor.opentelemetry.exporter.AzureMonitorMetricExporter",
+            return_value=ConsoleMetricExporter(out=io.StringIO()),
+        ) as exporter:
+            service = TelemetryService()
+            service.configure()
+
+        exporter.assert_called_once_with(connection_string="InstrumentationKey=key")
+        assert service._meter_provider is not None
+        assert trace.get_tracer_provider() is tracer_provider
+        assert logging.getLogger().handlers == handlers
+        service._meter_provider.shutdown()
+
+    def test_gauge_observes_flattened_stats(self):
+        observations = list(TelemetryService._observe(None))  # type: ignore[arg-type]
+
+        names = {o.attributes["stat"] for o in observations if o.attributes}
+        assert "tokens.hits" in names
+        assert "graph.bulkhead.waitSecondsMax" in names
+
+
+class TestDiagnosticsEndpoint:
+    async def test_returns_service_stats(self):
+        resp = await diagnostics(make_request("GET"))
+
+        assert resp.status_code == 200
+        assert set(json.loads(resp.get_body())) == {"auth", "tokens", "graph", "cosmos", "keyVault"}
@@ -0,0 +1,85 @@
+"""Tests for TokenService."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from azure.core.credentials import AccessToken
+
+from services.token_service import TokenService
+
+_SCOPE = "https://graph.microsoft.com/.default"
+
+
+@pytest.fixture
+def tokens():
+    """Create a TokenService with a mocked underlying credential."""
+    svc = TokenService()
+    svc._credential = MagicMock()
+    svc._credential.get_token = AsyncMock(return_value=AccessToken("tok-1", int(time.time()) + 3600))
+    return svc
+
+
+class TestGetToken:
+    async def test_caches_token_per_scope(self, tokens):
+        first = await tokens.get_token(_SCOPE)
+        second = await tokens.get_token(_SCOPE)
+
+        assert first.token == second.token == "tok-1"
+        tokens._credential.get_token.assert_called_once()
+        assert tokens.stats()["hits"] == 1
+        assert tokens.stats()["misses"] == 1
+
+    async def test_concurrent_misses_share_one_refresh(self, tokens):
+        async def slow_get_token(*scopes, **kwargs):
+            await asyncio.sleep(0.01)
+            return AccessToken("tok-1", int(time.time()) + 3600)
+
+        tokens._credential.get_token = AsyncMock(side_effect=slow_get_token)
+        results = await asyncio.gather(*(tokens.get_token(_SCOPE) for _ in range(10)))
+
+        assert {r.token for r in results} == {"tok-1"}
+        tokens._credential.get_token.assert_called_once()
+
+    async def test_refreshes_in_background_before_expiry(self, tokens):
+        tokens._tokens[(_SCOPE,)] = AccessToken("old", int(time.time()) + 60)
+        tokens._credential.get_token = AsyncMock(return_value=AccessToken("new", int(time.time()) + 3600))
+
+        served = await tokens.get_token(_SCOPE)
+        assert served.token == "old"
+
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert (await tokens.get_token(_SCOPE)).token == "new"
+        assert tokens.stats()["backgroundRefreshes"] == 1
+
+    async def test_expired_token_is_refetched(self, tokens):
+        tokens._tokens[(_SCOPE,)] = AccessToken("old", int(time.time()) - 1)
+        assert (await tokens.get_token(_SCOPE)).token == "tok-1"
+
+    async def test_claims_bypass_cache(self, tokens):
+        await tokens.get_token(_SCOPE)
+        await tokens.get_token(_SCOPE, claims='{"access_token":{}}')
+        assert tokens._credential.get_token.call_count == 2
+
+    async def test_refresh_failure_propagates_and_is_counted(self, tokens):
+        tokens._credential.get_token = AsyncMock(side_effect=RuntimeError("boom"))
+        with pytest.raises(RuntimeError):
+            await tokens.get_token(_SCOPE)
+        assert tokens.stats()["refreshFailures"] == 1
+
+    async def test_tenant_id_is_cached_per_tenant(self, tokens):
+        await tokens.get_token(_SCOPE, tenant_id="tenant-a")
+        await tokens.get_token(_SCOPE, tenant_id="tenant-a")
+        await tokens.get_token(_SCOPE, tenant_id="tenant-b")
+
+        assert tokens._credential.get_token.call_count == 2
+        tokens._credential.get_token.assert_any_call(_SCOPE, tenant_id="tenant-a")
+
+    async def test_options_are_part_of_the_cache_key(self, tokens):
+        await tokens.get_token(_SCOPE)
+        await tokens.get_token(_SCOPE, enable_cae=True)
+        await tokens.get_token(_SCOPE, enable_cae=True)
+
+        assert tokens._credential.get_token.call_count == 2
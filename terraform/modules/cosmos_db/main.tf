@@ -56,6 +56,46 @@ resource "azurerm_cosmosdb_sql_container" "spn_metadata" {
   partition_key_paths = ["/spnId"]
 }
 
+resource "azurerm_cosmosdb_sql_container" "directory_mirror" {
+  name                = "directory-mirror"
+  resource_group_name = var.resource_group_name
+  account_name        = azurerm_cosmosdb_account.this.name
+  database_name       = azurerm_cosmosdb_sql_database.this.name
+  partition_key_paths = ["/spnId"]
+}
+
+# One document per normalised display name (id = hash); creating it is the
+# atomic duplicate-name check
+resource "azurerm_cosmosdb_sql_container" "spn_names" {
+  name                = "spn-names"
+  resource_group_name = var.resource_group_name
+  account_name        = azurerm_cosmosdb_account.this.name
+  database_name       = azurerm_cosmosdb_sql_database.this.name
+  partition_key_paths = ["/id"]
+}
+
+# One document per (owner, application), written by the directory mirror when
+# OWNERSHIP_INDEX_ENABLED: ownership checks are point reads (id = spnId) and a
+# user's applications a single-partition query
+resource "azurerm_cosmosdb_sql_container" "spn_ownership" {
+  name                = "spn-ownership"
+  resource_group_name = var.resource_group_name
+  account_name        = azurerm_cosmosdb_account.this.name
+  database_name       = azurerm_cosmosdb_sql_database.this.name
+  partition_key_paths = ["/userOid"]
+}
+
+# Shared L2 cache entries (SHARED_CACHE_BACKEND=cosmos); each item carries its
+# own ttl, so expired entries are removed by Cosmos
+resource "azurerm_cosmosdb_sql_container" "shared_cache" {
+  name                = "shared-cache"
+  resource_group_name = var.resource_group_name
+  account_name        = azurerm_cosmosdb_account.this.name
+  database_name       = azurerm_cosmosdb_sql_database.this.name
+  partition_key_paths = ["/id"]
+  default_ttl         = -1
+}
+
 # ---------------------------------------------------------------------------
 # Private endpoint
 # ---------------------------------------------------------------------------
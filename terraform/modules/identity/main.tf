@@ -31,6 +31,10 @@ resource "azuread_application" "this" {
 
   owners = [data.azurerm_client_config.current.object_id]
 
+  # Emit security group ids in the "groups" claim so require_auth can check
+  # ALLOWED_GROUP_ID without calling Graph (overage still falls back to Graph)
+  group_membership_claims = ["SecurityGroup"]
+
   api {
     requested_access_token_version = 2
 